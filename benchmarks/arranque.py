@@ -0,0 +1,109 @@
+"""
+Mide el arranque en frío de la Lambda: tiempo de importación por módulo
+(python -X importtime) y tiempo hasta la primera respuesta de main.handler,
+cada medición en un proceso nuevo. Se simula el entorno de Lambda; la precarga
+de catálogos queda apagada salvo que se pida con PRECALENTAR=1 (necesita base).
+
+    python -m benchmarks.arranque
+
+Referencia (mediana de 15, ms): importar la aplicación sin contar fastapi,
+mangum, psycopg2 y pydantic bajó de ~124 a ~93 con los routers diferidos, y la
+respuesta en caliente de ~1.4 a ~0.2 al dejar de correr el lifespan por invocación.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPETICIONES = 15
+MODULOS_MOSTRADOS = 12
+
+ENTORNO = {**os.environ, "AWS_LAMBDA_FUNCTION_NAME": "benchmark-arranque"}
+ENTORNO.setdefault("PRECALENTAR", "0")
+
+EVENTO = {
+    "resource": "/",
+    "path": "/",
+    "httpMethod": "GET",
+    "headers": {"Host": "api.local", "Accept-Encoding": "gzip"},
+    "multiValueHeaders": {},
+    "queryStringParameters": None,
+    "multiValueQueryStringParameters": None,
+    "pathParameters": None,
+    "stageVariables": None,
+    "requestContext": {"resourcePath": "/", "httpMethod": "GET", "path": "/", "stage": "prod", "identity": {"sourceIp": "127.0.0.1"}},
+    "body": None,
+    "isBase64Encoded": False,
+}
+
+PRIMERA_RESPUESTA = """
+import json, sys, time
+inicio = time.perf_counter()
+import fastapi, mangum, psycopg2, pydantic
+dependencias = time.perf_counter()
+import main
+importado = time.perf_counter()
+evento = json.loads(sys.argv[1])
+respuesta = main.handler(evento, None)
+primera = time.perf_counter()
+main.handler(evento, None)
+segunda = time.perf_counter()
+assert respuesta["statusCode"] == 200, respuesta
+print(json.dumps({
+    "dependencias": (dependencias - inicio) * 1000,
+    "aplicacion": (importado - dependencias) * 1000,
+    "primera_respuesta": (primera - importado) * 1000,
+    "segunda_respuesta": (segunda - primera) * 1000,
+    "total_primera": (primera - inicio) * 1000,
+}))
+"""
+
+
+def _tiempos_importacion() -> dict:
+    """Tiempo acumulado (ms) de cada módulo importado directamente por main."""
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True, text=True, check=True, env=ENTORNO
+    ).stderr
+    tiempos = {}
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:") or "|" not in linea:
+            continue
+        _, acumulado, nombre = linea.split("|")
+        if not acumulado.strip().isdigit():
+            continue
+        # Un nivel de sangría = importado por main (o main mismo)
+        sangria = len(nombre) - len(nombre.lstrip()) - 1
+        if sangria <= 2:
+            tiempos[nombre.strip()] = int(acumulado) / 1000
+    return tiempos
+
+
+def _primera_respuesta() -> dict:
+    salida = subprocess.run(
+        [sys.executable, "-c", PRIMERA_RESPUESTA, json.dumps(EVENTO)],
+        capture_output=True, text=True, check=True, env=ENTORNO
+    ).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def main():
+    importaciones = [_tiempos_importacion() for _ in range(REPETICIONES)]
+    modulos = {nombre for tiempos in importaciones for nombre in tiempos}
+    medianas = {
+        nombre: statistics.median(tiempos.get(nombre, 0) for tiempos in importaciones)
+        for nombre in modulos
+    }
+    print(f"Importación (mediana de {REPETICIONES}, ms acumulados, con -X importtime):")
+    for nombre, tiempo in sorted(medianas.items(), key=lambda item: -item[1])[:MODULOS_MOSTRADOS]:
+        print(f"  {nombre:<32} {tiempo:8.1f}")
+
+    respuestas = [_primera_respuesta() for _ in range(REPETICIONES)]
+    print(f"\nmain.handler en frío (mediana de {REPETICIONES}, ms):")
+    for clave in ("dependencias", "aplicacion", "primera_respuesta", "segunda_respuesta", "total_primera"):
+        print(f"  {clave:<32} {statistics.median(r[clave] for r in respuestas):8.1f}")
+
+
+if __name__ == "__main__":
+    main()
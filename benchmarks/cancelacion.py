@@ -0,0 +1,170 @@
+"""
+Comprueba que una desconexión del cliente cancela la consulta en curso.
+
+1. Ninguna ruta de la app que use la base es `async def` (salvo las que pasan la
+   llamada bloqueante por run_in_threadpool): si no, la consulta corre en el event
+   loop y el middleware no llega a enterarse de la desconexión.
+2. Con DATABASE_URL: otra sesión toma un lock sobre horarios_disponibles, se pide
+   GET /turnos/disponibles a main.app y el cliente se desconecta a los 0,3 s; la
+   consulta tiene que terminar cancelada ("user request") antes del lock_timeout.
+   Sin DATABASE_URL se hace lo mismo con una conexión simulada que bloquea hasta
+   recibir cancel().
+
+    python -m benchmarks.cancelacion
+"""
+import asyncio
+import importlib
+import inspect
+import json
+import threading
+import time as reloj
+
+from fastapi.routing import APIRoute
+
+import database
+import main
+
+# Rutas async que ya mandan lo bloqueante al threadpool
+ASYNC_PERMITIDAS = {"importar_usuarios_endpoint", "stream_turnos_disponibles_endpoint"}
+
+DESCONEXION_SEGUNDOS = 0.3
+
+
+def _usa_base(dependant) -> bool:
+    if dependant.call in (database.get_db, database.get_db_lectura):
+        return True
+    return any(_usa_base(dependencia) for dependencia in dependant.dependencies)
+
+
+def revisar_rutas() -> list:
+    for modulo in main.ROUTERS_DIFERIDOS.values():
+        importlib.import_module(modulo)
+    rutas = [ruta for ruta in main.app.routes if isinstance(ruta, APIRoute)]
+    for modulo in main.ROUTERS_DIFERIDOS.values():
+        rutas += [ruta for ruta in importlib.import_module(modulo).router.routes if isinstance(ruta, APIRoute)]
+    return [
+        f"{sorted(ruta.methods)} {ruta.path} ({ruta.endpoint.__name__})"
+        for ruta in rutas
+        if inspect.iscoroutinefunction(ruta.endpoint)
+        and _usa_base(ruta.dependant)
+        and ruta.endpoint.__name__ not in ASYNC_PERMITIDAS
+    ]
+
+
+async def pedir_y_desconectar(app, path: str, query: str = "") -> tuple:
+    """Hace la petición, se desconecta a los DESCONEXION_SEGUNDOS y devuelve (segundos, status, cuerpo)."""
+    enviados = []
+    pedido = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if pedido:
+            return pedido.pop()
+        await asyncio.sleep(DESCONEXION_SEGUNDOS)
+        return {"type": "http.disconnect"}
+
+    async def send(mensaje):
+        enviados.append(mensaje)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [], "client": ("127.0.0.1", 50000), "server": ("test", 80),
+    }
+    inicio = reloj.perf_counter()
+    await app(scope, receive, send)
+    segundos = reloj.perf_counter() - inicio
+    status = next((m["status"] for m in enviados if m["type"] == "http.response.start"), None)
+    cuerpo = b"".join(m.get("body", b"") for m in enviados if m["type"] == "http.response.body")
+    return segundos, status, cuerpo.decode("utf-8", "replace")
+
+
+def con_base() -> tuple:
+    candado = database.nueva_conexion()
+    cursor = candado.cursor()
+    cursor.execute("LOCK TABLE horarios_disponibles IN ACCESS EXCLUSIVE MODE;")
+    try:
+        return asyncio.run(pedir_y_desconectar(main.app, "/turnos/disponibles", "fecha=2030-01-01"))
+    finally:
+        candado.rollback()
+        candado.close()
+
+
+class _ConexionBloqueante:
+    """Conexión simulada: execute espera hasta cancel() (o 5 s) y falla como Postgres."""
+
+    closed = False
+    autocommit = False
+    plazo = None
+
+    def __init__(self):
+        self.cancelada = threading.Event()
+        self.info = type("Info", (), {"transaction_status": database.TRANSACTION_STATUS_IDLE})()
+
+    def cursor(self):
+        conexion = self
+
+        class Cursor:
+            def execute(self, query, parametros=None):
+                if "pg_sleep" in query and conexion.cancelada.wait(5):
+                    raise database.psycopg2.errors.QueryCanceled("canceling statement due to user request")
+
+            def close(self):
+                pass
+
+        return Cursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def cancel(self):
+        self.cancelada.set()
+
+    def close(self):
+        self.closed = True
+
+
+def sin_base() -> tuple:
+    from fastapi import Depends, FastAPI
+    from exception_handlers import TIEMPOS_AGOTADOS, custom_exception_handler
+
+    app = FastAPI()
+    for error in TIEMPOS_AGOTADOS:
+        app.add_exception_handler(error, custom_exception_handler)
+
+    @app.get("/lenta")
+    def lenta(db=Depends(database.get_db)):
+        db.cursor().execute("SELECT pg_sleep(5);")
+        return {}
+
+    database.nueva_conexion = lambda *args, **kwargs: _ConexionBloqueante()
+    return asyncio.run(pedir_y_desconectar(database.ConexionesPorPeticionMiddleware(app), "/lenta"))
+
+
+def main_():
+    async_con_base = revisar_rutas()
+    if async_con_base:
+        print("Rutas async que bloquean el event loop con la base:")
+        for ruta in async_con_base:
+            print(f"  {ruta}")
+    else:
+        print("Ninguna ruta async usa la base directamente")
+
+    if database.DATABASE_URL:
+        segundos, status, cuerpo = con_base()
+    else:
+        print("Sin DATABASE_URL: se usa una conexión simulada")
+        segundos, status, cuerpo = sin_base()
+    detalle = json.loads(cuerpo).get("detail", "") if cuerpo.startswith("{") else cuerpo
+    cancelada = status == 504 and "user request" in detalle
+    print(f"Respuesta {status} a los {segundos:.2f} s: {detalle}")
+    print("Consulta cancelada por la desconexión" if cancelada else "La consulta NO se canceló")
+
+    if async_con_base or not cancelada:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main_()
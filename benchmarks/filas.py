@@ -0,0 +1,72 @@
+"""
+Micro-benchmark del mapeo de filas de utils.helpers contra la versión anterior
+de fetchall_to_dict, con filas como las de un día completo de horarios_disponibles.
+
+    python -m benchmarks.filas
+"""
+import timeit
+import uuid
+from datetime import date, time
+
+from psycopg2.extensions import Column
+
+from utils.helpers import fetchall_registros, fetchall_to_dict, fetchall_tuplas
+
+CANTIDAD_FILAS = 5000
+REPETICIONES = 20
+
+
+class CursorFalso:
+    """Imita el cursor de psycopg2 luego de un SELECT, sin base de datos."""
+
+    def __init__(self, columnas, filas):
+        self.description = tuple(Column(name=columna) for columna in columnas)
+        self.rowcount = len(filas)
+        self._filas = filas
+
+    def fetchall(self):
+        return self._filas
+
+
+def fetchall_to_dict_anterior(cursor):
+
+    if cursor.rowcount == 0:
+        return None
+
+    column_names = [desc[0] for desc in cursor.description]
+    objects = cursor.fetchall()
+
+    resultado = []
+    for object in objects:
+        object_dict = dict(zip(column_names, object))
+        resultado.append(object_dict)
+
+    return resultado
+
+
+def main():
+    columnas = ["fecha", "hora", "empleado_id", "nombre_empleado", "id_reserva", "disponible"]
+    empleado_id = uuid.uuid4()
+    filas = [
+        (date.today(), time(9 + i % 10, (i % 2) * 30), empleado_id, "Empleado", uuid.uuid4(), True)
+        for i in range(CANTIDAD_FILAS)
+    ]
+    cursor = CursorFalso(columnas, filas)
+
+    variantes = {
+        "fetchall_to_dict (anterior)": lambda: fetchall_to_dict_anterior(cursor),
+        "fetchall_to_dict": lambda: fetchall_to_dict(cursor),
+        "fetchall_registros": lambda: fetchall_registros(cursor),
+        "fetchall_tuplas": lambda: fetchall_tuplas(cursor),
+    }
+
+    base = None
+    print(f"{CANTIDAD_FILAS} filas, mejor de 5 x {REPETICIONES} repeticiones")
+    for nombre, funcion in variantes.items():
+        segundos = min(timeit.repeat(funcion, number=REPETICIONES, repeat=5)) / REPETICIONES
+        base = base or segundos
+        print(f"  {nombre:<30} {segundos * 1000:8.3f} ms   x{base / segundos:5.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Compara el costo por respuesta de una lista grande de turnos devuelta por el
+camino estándar de FastAPI (validación del response_model + JSONResponse) contra
+respuesta_confiable (proyección de campos + orjson).
+
+    python -m benchmarks.respuestas
+"""
+import time as reloj
+import uuid
+from datetime import date, time
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from schemas import TurnoResponse
+from utils.respuestas import RespuestaJSON, respuesta_confiable
+
+CANTIDAD_FILAS = 2000
+REPETICIONES = 30
+
+FILAS = [
+    {
+        "id": uuid.uuid4(),
+        "usuario_id": uuid.uuid4(),
+        "empleado_id": uuid.uuid4(),
+        "servicio_id": uuid.uuid4(),
+        "fecha": date.today(),
+        "hora": time(9 + i % 10, (i % 2) * 30),
+        "estado": "confirmado",
+    }
+    for i in range(CANTIDAD_FILAS)
+]
+
+app = FastAPI()
+
+
+@app.get("/estandar", response_model=list[TurnoResponse], response_class=JSONResponse)
+def estandar():
+    return FILAS
+
+
+@app.get("/orjson", response_model=list[TurnoResponse], response_class=RespuestaJSON)
+def solo_orjson():
+    return FILAS
+
+
+@app.get("/confiable", response_model=list[TurnoResponse])
+def confiable():
+    return respuesta_confiable(FILAS, TurnoResponse)
+
+
+def medir(cliente: TestClient, ruta: str) -> float:
+    cliente.get(ruta)  # calentamiento
+    mejor = float("inf")
+    for _ in range(5):
+        inicio = reloj.perf_counter()
+        for _ in range(REPETICIONES):
+            cliente.get(ruta)
+        mejor = min(mejor, (reloj.perf_counter() - inicio) / REPETICIONES)
+    return mejor
+
+
+def main():
+    cliente = TestClient(app)
+    assert cliente.get("/estandar").json() == cliente.get("/confiable").json()
+
+    print(f"{CANTIDAD_FILAS} turnos por respuesta, mejor de 5 x {REPETICIONES} requests")
+    base = None
+    for nombre, ruta in [
+        ("response_model + JSONResponse", "/estandar"),
+        ("response_model + orjson", "/orjson"),
+        ("respuesta_confiable", "/confiable"),
+    ]:
+        segundos = medir(cliente, ruta)
+        base = base or segundos
+        print(f"  {nombre:<32} {segundos * 1000:8.2f} ms   x{base / segundos:5.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Compara crear_turno y obtener_turnos_disponibles con y sin sentencias preparadas,
+sobre una misma conexión (como queda con el pool). Necesita DATABASE_URL con datos:
+un usuario, un servicio y un horario disponible desde hoy. crear_turno se ejecuta
+con una conexión cuyo commit hace rollback, así no deja turnos creados.
+
+    python -m benchmarks.sentencias
+
+Todavía no hay resultados contra una base real: hasta tenerlos las sentencias
+preparadas quedan apagadas por defecto (SENTENCIAS_PREPARADAS=0).
+"""
+import statistics
+import time as reloj
+
+import psycopg2
+
+import utils.sentencias
+from database import DATABASE_URL, Conexion
+from schemas import TurnoBase
+from services.turnos import crear_turno, obtener_turnos_disponibles
+
+REPETICIONES = 300
+
+
+class ConexionSinConfirmar(Conexion):
+    def commit(self):
+        self.rollback()
+
+
+def _datos_de_prueba(db):
+    cursor = db.cursor()
+    cursor.execute("SELECT id FROM usuarios LIMIT 1;")
+    usuario = cursor.fetchone()
+    cursor.execute("SELECT id FROM servicios LIMIT 1;")
+    servicio = cursor.fetchone()
+    cursor.execute(
+        """
+        SELECT fecha, hora, empleado_id FROM horarios_disponibles
+        WHERE disponible = TRUE AND fecha >= CURRENT_DATE
+        ORDER BY fecha, hora LIMIT 1;
+        """
+    )
+    horario = cursor.fetchone()
+    db.rollback()
+    if not (usuario and servicio and horario):
+        return None
+    fecha, hora, empleado_id = horario
+    turno = TurnoBase(usuario_id=usuario[0], empleado_id=empleado_id, servicio_id=servicio[0], fecha=fecha, hora=hora)
+    return turno
+
+
+def _medir(nombre: str, operacion, preparadas: bool) -> dict:
+    utils.sentencias.SENTENCIAS_PREPARADAS = preparadas
+    db = psycopg2.connect(DATABASE_URL, connection_factory=ConexionSinConfirmar)
+    try:
+        inicio = reloj.perf_counter()
+        operacion(db)
+        primera = (reloj.perf_counter() - inicio) * 1000
+        db.rollback()
+
+        tiempos = []
+        for _ in range(REPETICIONES):
+            inicio = reloj.perf_counter()
+            operacion(db)
+            tiempos.append((reloj.perf_counter() - inicio) * 1000)
+            db.rollback()
+    finally:
+        db.close()
+
+    return {
+        "nombre": nombre,
+        "preparadas": preparadas,
+        "primera_ms": primera,
+        "mediana_ms": statistics.median(tiempos),
+        "p95_ms": statistics.quantiles(tiempos, n=20)[-1],
+    }
+
+
+def main():
+    if not DATABASE_URL:
+        print("Falta DATABASE_URL")
+        return
+
+    db = psycopg2.connect(DATABASE_URL)
+    turno = _datos_de_prueba(db)
+    db.close()
+    if turno is None:
+        print("No hay usuario, servicio u horario disponible para probar")
+        return
+
+    operaciones = {
+        "crear_turno": lambda db: crear_turno(turno, db=db),
+        "obtener_turnos_disponibles": lambda db: obtener_turnos_disponibles(turno.fecha, None, db),
+    }
+
+    print(f"{'consulta':<28} {'preparadas':>10} {'1ra (ms)':>10} {'mediana':>10} {'p95':>10}")
+    for nombre, operacion in operaciones.items():
+        for preparadas in (False, True):
+            r = _medir(nombre, operacion, preparadas)
+            print(f"{r['nombre']:<28} {str(r['preparadas']):>10} {r['primera_ms']:>10.3f} {r['mediana_ms']:>10.3f} {r['p95_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,250 @@
+import asyncio
+import logging
 import psycopg2
 import os
+import re
+import threading
+from contextvars import ContextVar
+from typing import NamedTuple, Optional
 from dotenv import load_dotenv
+from fastapi import Request, Response
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Réplica de solo lectura; sin configurar, las lecturas van a la primaria
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+
+# Conexiones ociosas que se guardan por base para reusar entre peticiones (0 = sin pool)
+POOL_CONEXIONES = int(os.getenv("POOL_CONEXIONES", "10"))
+
+# Posición del WAL de la última escritura del cliente (read-your-writes)
+HEADER_LSN = "X-Consistencia-LSN"
+COOKIE_LSN = "consistencia_lsn"
+VIGENCIA_LSN_SEGUNDOS = int(os.getenv("VIGENCIA_LSN_SEGUNDOS", "60"))
+
+_FORMATO_LSN = re.compile(r"^[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}$")
+
+
+class Plazo(NamedTuple):
+    """Límites de Postgres para las consultas de una petición, en milisegundos."""
+    sentencia_ms: int  # statement_timeout
+    bloqueo_ms: int    # lock_timeout
+
+
+# Plazo de las rutas que no tienen uno propio (ver PLAZOS_RUTAS en main.py)
+PLAZO_DEFECTO = Plazo(
+    int(os.getenv("PLAZO_SENTENCIA_MS", "10000")),
+    int(os.getenv("PLAZO_BLOQUEO_MS", "3000"))
+)
+
+
+class Conexion(psycopg2.extensions.connection):
+    """
+    Conexión que recuerda qué sentencias ya preparó (ver utils/sentencias.py) y
+    qué plazo tiene fijado la sesión.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sentencias_preparadas = set()
+        self.plazo = None
+
+
+class _PoolConexiones:
+    def __init__(self, dsn: str, solo_lectura: bool = False):
+        self.dsn = dsn
+        self.solo_lectura = solo_lectura
+        self._libres = []
+        self._lock = threading.Lock()
+
+    def tomar(self):
+        with self._lock:
+            db = self._libres.pop() if self._libres else None
+        if db is None or db.closed:
+            db = nueva_conexion(self.dsn, self.solo_lectura)
+        return db
+
+    def devolver(self, db):
+        if db.closed:
+            return
+        try:
+            if db.info.transaction_status == TRANSACTION_STATUS_UNKNOWN or db.autocommit:
+                raise psycopg2.InterfaceError("conexión no reutilizable")
+            if db.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                db.rollback()
+        except psycopg2.Error:
+            db.close()
+            return
+        with self._lock:
+            if len(self._libres) < POOL_CONEXIONES:
+                self._libres.append(db)
+                return
+        db.close()
+
+
+_pool_primaria = _PoolConexiones(DATABASE_URL)
+_pool_replica = _PoolConexiones(DATABASE_REPLICA_URL, solo_lectura=True)
+
+# Conexiones tomadas del pool durante la petición en curso y plazo de su ruta
+_conexiones_peticion: ContextVar[Optional[list]] = ContextVar("conexiones_peticion", default=None)
+_plazo_peticion: ContextVar[Plazo] = ContextVar("plazo_peticion", default=PLAZO_DEFECTO)
+
+
+def nueva_conexion(dsn: str = DATABASE_URL, solo_lectura: bool = False):
+    """Conexión propia, fuera del pool: para hilos, tareas y sesiones con estado (locks, LISTEN)."""
+    db = psycopg2.connect(dsn, connection_factory=Conexion)
+    if solo_lectura:
+        db.set_session(readonly=True)
+    return db
+
+
+def aplicar_plazo(db, plazo: Plazo):
+    """Fija statement_timeout y lock_timeout en la sesión, si no los tenía ya."""
+    if getattr(db, "plazo", None) == plazo:
+        return
+    cursor = db.cursor()
+    cursor.execute(
+        "SELECT set_config('statement_timeout', %s, false), set_config('lock_timeout', %s, false);",
+        (f"{plazo.sentencia_ms}ms", f"{plazo.bloqueo_ms}ms")
+    )
+    cursor.close()
+    db.commit()  # un SET dentro de una transacción revertida no queda
+    db.plazo = plazo
+
+
+def _conexion(pool: _PoolConexiones):
+    conexiones = _conexiones_peticion.get()
+    if conexiones is None:
+        return nueva_conexion(pool.dsn, pool.solo_lectura)
+    db = pool.tomar()
+    conexiones.append((pool, db))
+    aplicar_plazo(db, _plazo_peticion.get())
+    return db
+
+
+def es_de_peticion(db) -> bool:
+    """Si `db` salió del pool para la petición en curso: la devuelve el middleware, no hay que cerrarla."""
+    conexiones = _conexiones_peticion.get()
+    return conexiones is not None and any(conexion is db for _, conexion in conexiones)
+
+
+def _cancelar(conexiones: list):
+    for _, db in conexiones:
+        if not db.closed:
+            db.cancel()
+
+
+class ConexionesPorPeticionMiddleware:
+    """
+    Fija el plazo de las consultas según la ruta, cancela las que estén corriendo si
+    el cliente se desconecta antes de recibir la respuesta y devuelve al pool las
+    conexiones que usó la petición cuando la respuesta terminó de enviarse (también
+    las de respuestas en streaming, como las exportaciones).
+
+    `plazos` asocia prefijos de ruta a su Plazo; gana el prefijo más largo.
+    """
+
+    def __init__(self, app: ASGIApp, plazos: dict = None):
+        self.app = app
+        self.plazos = sorted((plazos or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def plazo_ruta(self, path: str) -> Plazo:
+        for prefijo, plazo in self.plazos:
+            if path == prefijo or path.startswith(prefijo.rstrip("/") + "/"):
+                return plazo
+        return PLAZO_DEFECTO
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        conexiones = []
+        estado = {"respondida": False, "cancelada": False}
+        mensajes = asyncio.Queue()
+
+        # Lee los mensajes del cliente por adelantado: así el http.disconnect llega
+        # aunque el endpoint esté esperando una consulta en el threadpool
+        async def escuchar():
+            while True:
+                mensaje = await receive()
+                await mensajes.put(mensaje)
+                if mensaje["type"] == "http.disconnect":
+                    break
+            if not estado["respondida"] and conexiones:
+                estado["cancelada"] = True
+                logger.info("El cliente se desconectó: se cancelan las consultas de %s %s", scope["method"], scope["path"])
+                await run_in_threadpool(_cancelar, list(conexiones))
+
+        async def recibir() -> Message:
+            return await mensajes.get()
+
+        async def enviar(mensaje: Message):
+            if mensaje["type"] == "http.response.body" and not mensaje.get("more_body", False):
+                estado["respondida"] = True
+            await send(mensaje)
+
+        token_conexiones = _conexiones_peticion.set(conexiones)
+        token_plazo = _plazo_peticion.set(self.plazo_ruta(scope["path"]))
+        escucha = asyncio.create_task(escuchar())
+        try:
+            await self.app(scope, recibir, enviar)
+        finally:
+            _conexiones_peticion.reset(token_conexiones)
+            _plazo_peticion.reset(token_plazo)
+            if not escucha.done():
+                escucha.cancel()
+            for pool, db in conexiones:
+                # Tras un cancel la señal podría llegar tarde a la sesión: no se reusa
+                if estado["cancelada"]:
+                    db.close()
+                else:
+                    pool.devolver(db)
+
 
 def get_db():
-    return psycopg2.connect(DATABASE_URL)
+    return _conexion(_pool_primaria)
+
+
+def get_db_lectura(request: Request):
+    """
+    Conexión para las lecturas: la réplica, salvo que todavía no haya aplicado la
+    última escritura de este cliente (header o cookie con su LSN); en ese caso, o
+    si no hay réplica, la primaria.
+    """
+    if not DATABASE_REPLICA_URL:
+        return get_db()
+
+    lsn = request.headers.get(HEADER_LSN) or request.cookies.get(COOKIE_LSN)
+    db = _conexion(_pool_replica)
+    if lsn and _FORMATO_LSN.match(lsn):
+        cursor = db.cursor()
+        cursor.execute("SELECT pg_last_wal_replay_lsn() >= %s::pg_lsn;", (lsn,))
+        al_dia = cursor.fetchone()[0]
+        cursor.close()
+        db.rollback()
+        if not al_dia:
+            return get_db()
+    return db
+
+
+def marcar_escritura(response: Response, db) -> Optional[str]:
+    """Devuelve al cliente el LSN de la escritura recién confirmada, para que sus lecturas la vean."""
+    if not DATABASE_REPLICA_URL:
+        return None
+
+    cursor = db.cursor()
+    cursor.execute("SELECT pg_current_wal_lsn()::text;")
+    lsn = cursor.fetchone()[0]
+    cursor.close()
+    db.rollback()
+
+    response.headers[HEADER_LSN] = lsn
+    response.set_cookie(COOKIE_LSN, lsn, max_age=VIGENCIA_LSN_SEGUNDOS, httponly=True, samesite="lax")
+    return lsn
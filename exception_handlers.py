@@ -1,5 +1,12 @@
+import logging
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
+from psycopg2.errors import LockNotAvailable, QueryCanceled
+
+logger = logging.getLogger(__name__)
+
+# statement_timeout, lock_timeout y consultas canceladas porque el cliente se desconectó
+TIEMPOS_AGOTADOS = (QueryCanceled, LockNotAvailable)
 
 class AppException(Exception):
     """Excepción base para errores de la aplicación."""
@@ -17,19 +24,39 @@ class ValidationError(AppException):
         self.message = message
         super().__init__(self.message)
 
+class ConflictError(AppException):
+    """Excepción para solicitudes que chocan con otra en curso o ya procesada."""
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
 class OperationError(AppException):
     """Excepción para errores en operaciones (crear, actualizar, eliminar, etc.)."""
     def __init__(self, message: str):
         self.message = message
         super().__init__(message)
 
+class TiempoAgotadoError(AppException):
+    """Excepción para consultas que superaron el plazo de la ruta o esperaron demasiado un lock."""
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(message)
+
 
 async def custom_exception_handler(request: Request, exc: Exception):
     """Manejador global de excepciones."""
-    if isinstance(exc, NotFoundError):
+    if isinstance(exc, TIEMPOS_AGOTADOS):
+        exc = TiempoAgotadoError(str(exc).strip())
+    if isinstance(exc, TiempoAgotadoError):
+        # Se registran aparte de los errores de lógica para seguir la latencia de cola
+        logger.warning("Tiempo agotado en %s %s: %s", request.method, request.url.path, exc.message)
+        return JSONResponse(status_code=504, content={"detail": exc.message})
+    elif isinstance(exc, NotFoundError):
         return JSONResponse(status_code=404, content={"detail": exc.message})
     elif isinstance(exc, ValidationError):
         return JSONResponse(status_code=400, content={"detail": exc.message})
+    elif isinstance(exc, ConflictError):
+        return JSONResponse(status_code=409, content={"detail": exc.message})
     elif isinstance(exc, OperationError):
         return JSONResponse(status_code=500, content={"detail": exc.message})
     elif isinstance(exc, AppException):
@@ -55,6 +82,9 @@ def transactional(func):
             
             db.commit()  # Confirmamos la transacción
             return result
+        except TIEMPOS_AGOTADOS as e:
+            db.rollback()
+            raise TiempoAgotadoError(f"La operación superó el tiempo máximo: {str(e).strip()}")
         except Exception as e:
             db.rollback()  # Revertimos los cambios si hay error
             raise OperationError(f"Error en la transacción: {str(e)}")
@@ -79,6 +109,8 @@ def try_except_closeCursor(func):
 
         except AppException as ae:
             raise ae
+        except TIEMPOS_AGOTADOS as e:
+            raise TiempoAgotadoError(f"La consulta superó el tiempo máximo: {str(e).strip()}")
         except Exception as e:
             raise OperationError(f"Error interno: {str(e)}")
         finally:
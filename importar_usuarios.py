@@ -0,0 +1,30 @@
+import argparse
+import json
+
+from database import get_db
+from services.usuarios import importar_usuarios_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa clientes desde un CSV (nombre, telefono, email)")
+    parser.add_argument("archivo", help="Ruta al archivo CSV con encabezado")
+    args = parser.parse_args()
+
+    db = get_db()
+    try:
+        with open(args.archivo, encoding="utf-8-sig", newline="") as archivo:
+            resultado = importar_usuarios_csv(archivo, db)
+    finally:
+        db.close()
+
+    print(f"Filas leídas: {resultado['total']}")
+    print(f"Usuarios insertados: {resultado['insertados']}")
+    print(f"Duplicados u omitidos: {len(resultado['duplicados'])}")
+    for duplicado in resultado["duplicados"]:
+        print(json.dumps(duplicado, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
+
+# python importar_usuarios.py clientes.csv
@@ -1,22 +1,133 @@
+import logging
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from routes import empleados, horarios, servicios, turnos, usuarios
+from routes import empleados, servicios, turnos, usuarios
 from mangum import Mangum
-from exception_handlers import custom_exception_handler, NotFoundError, ValidationError, OperationError, AppException
+from database import HEADER_LSN, ConexionesPorPeticionMiddleware, Plazo, get_db, nueva_conexion
+from services.eventos import iniciar_escucha, estadisticas_escucha
+from services.disponibilidad_en_vivo import cantidad_suscriptores
+from services.notificaciones import estadisticas_notificaciones, iniciar_despachador
+from services.empleados import obtener_empleados_catalogo
+from services.servicios import obtener_servicios_catalogo
+from services.tareas import ejecutar_pendientes, ejecutar_tarea, iniciar_programador
+from utils.respuestas import RespuestaJSON
+from utils.admision import AdmisionMiddleware, Limite, estadisticas_admision, limite_de_entorno
+from utils.compresion import CompresionMiddleware
+from utils.routers_diferidos import RoutersDiferidosMiddleware
+from utils.enviadores import obtener_enviador
+from exception_handlers import custom_exception_handler, NotFoundError, ValidationError, ConflictError, OperationError, AppException, TiempoAgotadoError, TIEMPOS_AGOTADOS
 
-app = FastAPI(title="API de Peluquería", version="1.0")
+logger = logging.getLogger(__name__)
+
+EN_LAMBDA = "AWS_LAMBDA_FUNCTION_NAME" in os.environ
+
+# Escucha de cambios de otros procesos (LISTEN/NOTIFY) para invalidar los caches locales
+ESCUCHA_CAMBIOS = os.getenv("ESCUCHA_CAMBIOS", "1") == "1"
+
+# Tareas programadas en el proceso (uvicorn); en Lambda las dispara EventBridge vía handler_tareas
+PROGRAMADOR_TAREAS = os.getenv("PROGRAMADOR_TAREAS", "1") == "1"
+
+# Despacho del outbox de notificaciones en un hilo del proceso (en Lambda, vía handler_tareas).
+# Solo con ENVIADOR_NOTIFICACIONES: sin enviador las notificaciones quedan pendientes en el outbox
+DESPACHADOR_NOTIFICACIONES = os.getenv("DESPACHADOR_NOTIFICACIONES", "0" if EN_LAMBDA else "1") == "1"
+
+# Carga de los catálogos antes de la primera petición (en Lambda, durante el init)
+PRECALENTAR = os.getenv("PRECALENTAR", "1" if EN_LAMBDA else "0") == "1"
+
+# Routers de administración: se construyen con la primera petición a su prefijo
+ROUTERS_DIFERIDOS = {
+    "/horarios": "routes.horarios",
+    "/reportes": "routes.reportes",
+    "/sincronizacion": "routes.sincronizacion",
+    "/tareas": "routes.tareas",
+}
+
+# Plazo de las consultas por prefijo de ruta (statement_timeout, lock_timeout en ms);
+# el resto usa PLAZO_SENTENCIA_MS / PLAZO_BLOQUEO_MS
+PLAZOS_RUTAS = {
+    "/turnos/disponibles": Plazo(2000, 1000),
+    "/turnos": Plazo(5000, 2000),
+    "/turnos/exportar": Plazo(120000, 2000),
+    "/usuarios/importar": Plazo(60000, 5000),
+    "/horarios": Plazo(30000, 5000),
+    "/reportes": Plazo(15000, 2000),
+    "/sincronizacion": Plazo(30000, 2000),
+}
+
+# Límites por cliente (API key de API_KEYS, separadas por coma, o IP) por regla "METODO /prefijo" o "/prefijo".
+# Cada uno se puede cambiar con su variable: "por_segundo,rafaga"
+LIMITES_CLIENTES = {
+    "GET /turnos/disponibles": limite_de_entorno("LIMITE_TURNOS_DISPONIBLES", Limite(5, 20)),
+    "POST /turnos": limite_de_entorno("LIMITE_CREAR_TURNO", Limite(1, 5)),
+    "/turnos/exportar": limite_de_entorno("LIMITE_EXPORTAR_TURNOS", Limite(0.1, 2)),
+    "/": limite_de_entorno("LIMITE_GENERAL", Limite(20, 60)),
+}
+
+# Rutas que no ocupan un lugar de la concurrencia a la base
+RUTAS_SIN_BASE = ("/", "/estado", "/docs", "/redoc", "/openapi.json", "/turnos/disponibles/stream")
+
+
+def precalentar():
+    try:
+        obtener_empleados_catalogo(get_db)
+        obtener_servicios_catalogo(get_db)
+    except Exception:
+        logger.exception("No se pudieron precargar los catálogos")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    enviador = None
+    if DESPACHADOR_NOTIFICACIONES:
+        if os.getenv("ENVIADOR_NOTIFICACIONES"):
+            enviador = obtener_enviador()
+        else:
+            logger.warning("Sin ENVIADOR_NOTIFICACIONES no se despachan notificaciones: quedan pendientes en el outbox")
+    detener_escucha = iniciar_escucha(nueva_conexion) if ESCUCHA_CAMBIOS else None
+    detener_programador = iniciar_programador(nueva_conexion) if PROGRAMADOR_TAREAS else None
+    detener_despachador = iniciar_despachador(nueva_conexion, enviador) if enviador else None
+    if PRECALENTAR:
+        precalentar()
+    yield
+    if detener_escucha:
+        detener_escucha.set()
+    if detener_programador:
+        detener_programador.set()
+    if detener_despachador:
+        detener_despachador.set()
+
+
+app = FastAPI(title="API de Peluquería", version="1.0", lifespan=lifespan, default_response_class=RespuestaJSON)
 
 app.add_exception_handler(NotFoundError, custom_exception_handler)
 app.add_exception_handler(ValidationError, custom_exception_handler)
+app.add_exception_handler(ConflictError, custom_exception_handler)
 app.add_exception_handler(OperationError, custom_exception_handler)
+app.add_exception_handler(TiempoAgotadoError, custom_exception_handler)
 app.add_exception_handler(AppException, custom_exception_handler)
+for error_tiempo in TIEMPOS_AGOTADOS:
+    app.add_exception_handler(error_tiempo, custom_exception_handler)
 
 app.include_router(turnos.router)
 app.include_router(usuarios.router)
 app.include_router(empleados.router)
 app.include_router(servicios.router)
-app.include_router(horarios.router)
+app.add_middleware(RoutersDiferidosMiddleware, aplicacion=app, routers=ROUTERS_DIFERIDOS)
 
+# Límite por cliente y tope de peticiones simultáneas contra la base (429/503 si se supera)
+app.add_middleware(
+    AdmisionMiddleware,
+    limites=LIMITES_CLIENTES,
+    max_concurrencia=int(os.getenv("ADMISION_MAX_CONCURRENCIA", "20")),
+    max_cola=int(os.getenv("ADMISION_MAX_COLA", "50")),
+    espera_maxima=float(os.getenv("ADMISION_ESPERA_MAXIMA_SEGUNDOS", "2")),
+    rutas_sin_base=RUTAS_SIN_BASE,
+    claves_api=os.getenv("API_KEYS", "").split(",")
+)
 
 # Configurar CORS
 app.add_middleware(
@@ -25,14 +136,50 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Permitir todos los métodos (GET, POST, etc.)
     allow_headers=["*"],  # Permitir todos los headers
+    expose_headers=["X-Siguiente-Cursor", HEADER_LSN, "Retry-After"],  # Cursor de paginación, LSN de la última escritura y espera tras un 429/503
 )
 
-handler = Mangum(app)
+# Compresión gzip/brotli negociada; las respuestas chicas se envían sin comprimir
+app.add_middleware(CompresionMiddleware, tamano_minimo=int(os.getenv("COMPRESION_TAMANO_MINIMO", "1024")))
+
+# Plazo de las consultas por ruta, cancelación si el cliente se va y devolución
+# de las conexiones al pool cuando la respuesta terminó de enviarse
+app.add_middleware(ConexionesPorPeticionMiddleware, plazos=PLAZOS_RUTAS)
+
+# Mangum correría el lifespan en cada invocación: en Lambda el init es el import del módulo
+handler = Mangum(app, lifespan="off")
+
+if EN_LAMBDA:
+    if ESCUCHA_CAMBIOS:
+        iniciar_escucha(nueva_conexion)
+    if PRECALENTAR:
+        precalentar()
+
+
+def handler_tareas(event, context):
+    """
+    Punto de entrada para eventos programados (EventBridge), sin pasar por HTTP.
+    Con {"tarea": nombre} corre esa tarea; si no, las que correspondan a event["time"].
+    """
+    if event.get("tarea"):
+        return jsonable_encoder(ejecutar_tarea(event["tarea"], nueva_conexion))
+    momento = datetime.fromisoformat(event["time"].replace("Z", "+00:00")) if event.get("time") else datetime.now(timezone.utc)
+    return jsonable_encoder(ejecutar_pendientes(momento, nueva_conexion))
+
 
 @app.get("/")
 async def root():
     return {"message": "Bienvenido a la API de Peluquería"}
 
+@app.get("/estado")
+async def estado():
+    return {
+        "escucha_cambios": estadisticas_escucha(),
+        "suscriptores_disponibilidad": cantidad_suscriptores(),
+        "admision": estadisticas_admision(),
+        "notificaciones": estadisticas_notificaciones()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,13 @@
+-- Respuestas guardadas para reintentos con el header Idempotency-Key
+CREATE TABLE IF NOT EXISTS claves_idempotencia (
+    clave       VARCHAR(255) NOT NULL,
+    endpoint    VARCHAR(100) NOT NULL,
+    hash_cuerpo CHAR(64)     NOT NULL,
+    respuesta   JSONB,
+    creado_en   TIMESTAMPTZ  NOT NULL DEFAULT now(),
+    expira_en   TIMESTAMPTZ  NOT NULL,
+    PRIMARY KEY (clave, endpoint)
+);
+
+CREATE INDEX IF NOT EXISTS idx_claves_idempotencia_expira_en
+    ON claves_idempotencia (expira_en);
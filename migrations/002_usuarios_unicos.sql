@@ -0,0 +1,7 @@
+-- Restricciones únicas en las que se apoya crear_usuario (INSERT ... ON CONFLICT)
+CREATE UNIQUE INDEX IF NOT EXISTS usuarios_telefono_key
+    ON usuarios (telefono);
+
+CREATE UNIQUE INDEX IF NOT EXISTS usuarios_email_key
+    ON usuarios (email)
+    WHERE email IS NOT NULL;
@@ -0,0 +1,27 @@
+-- Normalización de teléfonos (debe coincidir con utils.helpers.normalizar_telefono)
+CREATE OR REPLACE FUNCTION normalizar_telefono(telefono TEXT) RETURNS TEXT
+LANGUAGE sql IMMUTABLE STRICT AS $$
+    SELECT ltrim(
+        regexp_replace(
+            regexp_replace(regexp_replace(telefono, '\D', '', 'g'), '^00', ''),
+            '^549?(\d{10})$', '\1'
+        ),
+        '0'
+    )
+$$;
+
+-- Normalizar los teléfonos ya cargados. Si dos usuarios quedan con el mismo
+-- número la migración falla por usuarios_telefono_key y hay que unificarlos a mano.
+UPDATE usuarios
+SET telefono = normalizar_telefono(telefono)
+WHERE telefono IS DISTINCT FROM normalizar_telefono(telefono);
+
+-- Búsqueda por prefijo de teléfono
+CREATE INDEX IF NOT EXISTS idx_usuarios_telefono_prefijo
+    ON usuarios (telefono text_pattern_ops);
+
+-- Búsqueda por nombre (ILIKE con trigramas)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_usuarios_nombre_trgm
+    ON usuarios USING gin (nombre gin_trgm_ops);
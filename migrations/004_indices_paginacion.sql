@@ -0,0 +1,7 @@
+-- Índices para la paginación por (fecha, hora, id)
+CREATE INDEX IF NOT EXISTS idx_turnos_usuario_fecha_hora
+    ON turnos (usuario_id, fecha, hora, id);
+
+CREATE INDEX IF NOT EXISTS idx_turnos_confirmados_fecha_hora
+    ON turnos (fecha, hora, id)
+    WHERE estado = 'confirmado';
@@ -0,0 +1,57 @@
+-- Marcas de modificación y registro de eliminaciones para GET /sincronizacion
+ALTER TABLE turnos ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE horarios_disponibles ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE bloqueos_horarios ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE empleados ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE servicios ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS idx_turnos_updated_at ON turnos (updated_at);
+CREATE INDEX IF NOT EXISTS idx_horarios_disponibles_updated_at ON horarios_disponibles (updated_at);
+CREATE INDEX IF NOT EXISTS idx_bloqueos_horarios_updated_at ON bloqueos_horarios (updated_at);
+CREATE INDEX IF NOT EXISTS idx_empleados_updated_at ON empleados (updated_at);
+CREATE INDEX IF NOT EXISTS idx_servicios_updated_at ON servicios (updated_at);
+
+CREATE OR REPLACE FUNCTION marcar_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Filas borradas: los clientes las reciben como eliminadas en la siguiente sincronización
+CREATE TABLE IF NOT EXISTS eliminaciones (
+    tabla        VARCHAR(50) NOT NULL,
+    id           UUID        NOT NULL,
+    eliminado_en TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_eliminaciones_eliminado_en
+    ON eliminaciones (eliminado_en);
+
+CREATE OR REPLACE FUNCTION registrar_eliminacion() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO eliminaciones (tabla, id) VALUES (TG_TABLE_NAME, OLD.id);
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+-- updated_at solo cambia si cambió algo de la fila (la generación semanal re-aplica bloqueos ya aplicados)
+DO $$
+DECLARE
+    tabla TEXT;
+BEGIN
+    FOREACH tabla IN ARRAY ARRAY['turnos', 'horarios_disponibles', 'bloqueos_horarios', 'empleados', 'servicios'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tabla || '_updated_at', tabla);
+        EXECUTE format(
+            'CREATE TRIGGER %I BEFORE UPDATE ON %I FOR EACH ROW
+             WHEN (OLD.* IS DISTINCT FROM NEW.*) EXECUTE FUNCTION marcar_updated_at()',
+            tabla || '_updated_at', tabla
+        );
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tabla || '_eliminacion', tabla);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER DELETE ON %I FOR EACH ROW EXECUTE FUNCTION registrar_eliminacion()',
+            tabla || '_eliminacion', tabla
+        );
+    END LOOP;
+END;
+$$;
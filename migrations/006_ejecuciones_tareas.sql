@@ -0,0 +1,18 @@
+-- Registro de las tareas programadas (generación de horarios, limpiezas)
+CREATE TABLE IF NOT EXISTS ejecuciones_tareas (
+    id              BIGSERIAL    PRIMARY KEY,
+    tarea           VARCHAR(100) NOT NULL,
+    programada_para TIMESTAMPTZ,             -- NULL en las ejecuciones manuales
+    iniciada_en     TIMESTAMPTZ  NOT NULL DEFAULT now(),
+    duracion_ms     INTEGER,
+    estado          VARCHAR(20)  NOT NULL DEFAULT 'en_curso',
+    resultado       JSONB,
+    error           TEXT
+);
+
+-- Cada horario programado se ejecuta una sola vez aunque haya varias instancias
+CREATE UNIQUE INDEX IF NOT EXISTS ejecuciones_tareas_programada_key
+    ON ejecuciones_tareas (tarea, programada_para);
+
+CREATE INDEX IF NOT EXISTS idx_ejecuciones_tareas_iniciada_en
+    ON ejecuciones_tareas (iniciada_en DESC);
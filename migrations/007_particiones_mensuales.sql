@@ -0,0 +1,179 @@
+-- Particionado mensual por fecha de horarios_disponibles y turnos (PostgreSQL 13+).
+-- Copia los datos: correr en una ventana sin tráfico. Las tablas originales quedan
+-- como <tabla>_anterior para verificar antes de borrarlas a mano.
+
+-- Crea (si falta) la partición del mes de `mes`; devuelve TRUE si la creó.
+-- generar_horarios y mantener_particiones pueden llamarla a la vez: si otra sesión
+-- la creó entre el to_regclass y el CREATE, cuenta como que ya existía
+CREATE OR REPLACE FUNCTION crear_particion_mensual(tabla TEXT, mes DATE) RETURNS BOOLEAN AS $$
+DECLARE
+    inicio DATE := date_trunc('month', mes)::date;
+    particion TEXT := tabla || '_' || to_char(inicio, 'YYYY_MM');
+BEGIN
+    IF to_regclass(particion) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+        particion, tabla, inicio, (inicio + INTERVAL '1 month')::date
+    );
+    RETURN TRUE;
+EXCEPTION
+    WHEN duplicate_table OR unique_violation THEN
+        RETURN FALSE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Particiones desde el mes actual hasta `meses_adelante` meses, en ambas tablas
+CREATE OR REPLACE FUNCTION asegurar_particiones(meses_adelante INTEGER) RETURNS INTEGER AS $$
+DECLARE
+    tabla TEXT;
+    desplazamiento INTEGER;
+    creadas INTEGER := 0;
+BEGIN
+    FOREACH tabla IN ARRAY ARRAY['horarios_disponibles', 'turnos'] LOOP
+        FOR desplazamiento IN 0..meses_adelante LOOP
+            IF crear_particion_mensual(tabla, (CURRENT_DATE + make_interval(months => desplazamiento))::date) THEN
+                creadas := creadas + 1;
+            END IF;
+        END LOOP;
+    END LOOP;
+    RETURN creadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Separa (sin borrar) las particiones que terminan antes de `meses_retencion` meses atrás.
+-- Solo para horarios_disponibles, que la compactación vacía: las de turnos son el
+-- historial de reservas (exportación, reportes) y no se separan
+CREATE OR REPLACE FUNCTION separar_particiones_antiguas(tabla TEXT, meses_retencion INTEGER) RETURNS TEXT[] AS $$
+DECLARE
+    limite DATE := (date_trunc('month', CURRENT_DATE) - make_interval(months => meses_retencion))::date;
+    particion RECORD;
+    separadas TEXT[] := ARRAY[]::TEXT[];
+BEGIN
+    IF tabla <> 'horarios_disponibles' THEN
+        RAISE EXCEPTION 'Solo se separan particiones de horarios_disponibles, no de %', tabla;
+    END IF;
+    FOR particion IN
+        SELECT hija.relname AS nombre
+        FROM pg_inherits
+        JOIN pg_class hija ON hija.oid = pg_inherits.inhrelid
+        JOIN pg_class padre ON padre.oid = pg_inherits.inhparent
+        WHERE padre.relname = tabla
+            AND hija.relname ~ '_\d{4}_\d{2}$'
+            AND to_date(right(hija.relname, 7), 'YYYY_MM') < limite
+        ORDER BY hija.relname
+    LOOP
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', tabla, particion.nombre);
+        separadas := separadas || particion.nombre::TEXT;
+    END LOOP;
+    RETURN separadas;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    tabla TEXT;
+    anterior TEXT;
+    restriccion RECORD;
+    mes DATE;
+BEGIN
+    FOREACH tabla IN ARRAY ARRAY['horarios_disponibles', 'turnos'] LOOP
+        IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = tabla::regclass) THEN
+            CONTINUE;
+        END IF;
+        anterior := tabla || '_anterior';
+
+        -- Una FK tiene que apuntar a una clave única y en la tabla particionada toda
+        -- clave única incluye fecha: las FK de otras tablas hacia <tabla>(id) no se
+        -- pueden recrear (quedarían apuntando a <tabla>_anterior), así que se borran
+        FOR restriccion IN
+            SELECT conrelid::regclass AS origen, conname
+            FROM pg_constraint
+            WHERE confrelid = tabla::regclass AND contype = 'f' AND conrelid <> tabla::regclass
+        LOOP
+            RAISE NOTICE 'Se borra la FK % de % hacia %', restriccion.conname, restriccion.origen, tabla;
+            EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', restriccion.origen, restriccion.conname);
+        END LOOP;
+
+        EXECUTE format('ALTER TABLE %I RENAME TO %I', tabla, anterior);
+        -- Los índices de la tabla anterior liberan su nombre para los de la nueva
+        FOR restriccion IN
+            SELECT indexname FROM pg_indexes WHERE tablename = anterior
+        LOOP
+            EXECUTE format('ALTER INDEX %I RENAME TO %I', restriccion.indexname, left(restriccion.indexname, 54) || '_anterior');
+        END LOOP;
+        EXECUTE format(
+            'CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED) PARTITION BY RANGE (fecha)',
+            tabla, anterior
+        );
+        -- La clave de partición tiene que formar parte de la clave primaria, y no se
+        -- puede tener un índice único sobre id solo: la base garantiza (id, fecha), no
+        -- id. Se acepta porque los ids los genera el DEFAULT de la columna (UUID
+        -- aleatorio) y la aplicación nunca los fija. Una búsqueda por id sin fecha
+        -- recorre todas las particiones; los servicios pasan la fecha cuando la tienen
+        EXECUTE format('ALTER TABLE %I ADD PRIMARY KEY (id, fecha)', tabla);
+
+        FOR restriccion IN
+            SELECT conname, pg_get_constraintdef(oid) AS definicion
+            FROM pg_constraint
+            WHERE conrelid = anterior::regclass AND contype = 'f'
+        LOOP
+            EXECUTE format('ALTER TABLE %I ADD %s', tabla, restriccion.definicion);
+        END LOOP;
+
+        -- Una partición por cada mes con datos, más los próximos meses
+        FOR mes IN EXECUTE format(
+            'SELECT DISTINCT date_trunc(''month'', fecha)::date FROM %I', anterior
+        ) LOOP
+            PERFORM crear_particion_mensual(tabla, mes);
+        END LOOP;
+        FOR mes IN SELECT generate_series(date_trunc('month', CURRENT_DATE), date_trunc('month', CURRENT_DATE) + INTERVAL '3 months', INTERVAL '1 month')::date LOOP
+            PERFORM crear_particion_mensual(tabla, mes);
+        END LOOP;
+
+        EXECUTE format('INSERT INTO %I SELECT * FROM %I', tabla, anterior);
+
+        -- Los triggers de 005 siguen en la tabla anterior: se crean en la nueva
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tabla || '_updated_at', anterior);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tabla || '_eliminacion', anterior);
+        EXECUTE format(
+            'CREATE TRIGGER %I BEFORE UPDATE ON %I FOR EACH ROW
+             WHEN (OLD.* IS DISTINCT FROM NEW.*) EXECUTE FUNCTION marcar_updated_at()',
+            tabla || '_updated_at', tabla
+        );
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER DELETE ON %I FOR EACH ROW EXECUTE FUNCTION registrar_eliminacion()',
+            tabla || '_eliminacion', tabla
+        );
+    END LOOP;
+END;
+$$;
+
+-- Índices en las tablas particionadas (se crean en cada partición, actual y futura)
+
+CREATE UNIQUE INDEX IF NOT EXISTS horarios_disponibles_empleado_fecha_hora_key
+    ON horarios_disponibles (empleado_id, fecha, hora);
+
+CREATE INDEX IF NOT EXISTS idx_horarios_disponibles_fecha_disponible
+    ON horarios_disponibles (fecha, empleado_id, hora)
+    WHERE disponible = TRUE;
+
+CREATE INDEX IF NOT EXISTS idx_horarios_disponibles_updated_at
+    ON horarios_disponibles (updated_at);
+
+CREATE INDEX IF NOT EXISTS idx_turnos_empleado_fecha_hora
+    ON turnos (empleado_id, fecha, hora);
+
+CREATE INDEX IF NOT EXISTS idx_turnos_usuario_fecha_hora
+    ON turnos (usuario_id, fecha, hora, id);
+
+CREATE INDEX IF NOT EXISTS idx_turnos_confirmados_fecha_hora
+    ON turnos (fecha, hora, id)
+    WHERE estado = 'confirmado';
+
+CREATE INDEX IF NOT EXISTS idx_turnos_updated_at
+    ON turnos (updated_at);
+
+ANALYZE horarios_disponibles;
+ANALYZE turnos;
@@ -0,0 +1,29 @@
+-- Resumen diario de ocupación por empleado, calculado antes de borrar los horarios pasados
+CREATE TABLE IF NOT EXISTS ocupacion_diaria (
+    fecha               DATE        NOT NULL,
+    empleado_id         UUID        NOT NULL,
+    horarios_totales    INTEGER     NOT NULL,
+    horarios_libres     INTEGER     NOT NULL,
+    horarios_ocupados   INTEGER     NOT NULL,
+    horarios_bloqueados INTEGER     NOT NULL,
+    creado_en           TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (fecha, empleado_id)
+);
+
+-- La compactación recorre y borra por fecha
+CREATE INDEX IF NOT EXISTS idx_horarios_disponibles_fecha
+    ON horarios_disponibles (fecha);
+
+CREATE INDEX IF NOT EXISTS idx_bloqueos_horarios_fecha
+    ON bloqueos_horarios (fecha);
+
+-- Lo que borra la retención (días pasados) no se informa como eliminación a los clientes
+CREATE OR REPLACE FUNCTION registrar_eliminacion() RETURNS trigger AS $$
+BEGIN
+    IF current_setting('peluqueria.retencion', true) = 'on' THEN
+        RETURN OLD;
+    END IF;
+    INSERT INTO eliminaciones (tabla, id) VALUES (TG_TABLE_NAME, OLD.id);
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,22 @@
+-- Resumen diario de turnos confirmados e ingresos por empleado y servicio, guardado
+-- por la compactación junto con ocupacion_diaria (con el precio vigente ese día)
+CREATE TABLE IF NOT EXISTS ingresos_diarios (
+    fecha       DATE          NOT NULL,
+    empleado_id UUID          NOT NULL,
+    servicio_id UUID          NOT NULL,
+    turnos      INTEGER       NOT NULL,
+    ingresos    NUMERIC(12,2) NOT NULL,
+    creado_en   TIMESTAMPTZ   NOT NULL DEFAULT now(),
+    PRIMARY KEY (fecha, empleado_id, servicio_id)
+);
+
+-- Los días que la compactación ya resumió antes de esta tabla: los turnos siguen en
+-- la base, así que se completan con el precio actual (el vigente ese día ya no está)
+INSERT INTO ingresos_diarios (fecha, empleado_id, servicio_id, turnos, ingresos)
+SELECT t.fecha, t.empleado_id, t.servicio_id, count(*), coalesce(sum(s.precio), 0)
+FROM turnos t
+JOIN servicios s ON s.id = t.servicio_id
+WHERE t.fecha IN (SELECT DISTINCT fecha FROM ocupacion_diaria)
+    AND t.estado = 'confirmado'
+GROUP BY t.fecha, t.empleado_id, t.servicio_id
+ON CONFLICT (fecha, empleado_id, servicio_id) DO NOTHING;
@@ -0,0 +1,27 @@
+-- Outbox de notificaciones a clientes: se escribe en la misma transacción que el
+-- turno y la envía después el despachador (services/notificaciones.py)
+CREATE TABLE IF NOT EXISTS notificaciones_salientes (
+    id            BIGSERIAL   PRIMARY KEY,
+    tipo          VARCHAR(20) NOT NULL,               -- confirmacion, cancelacion, modificacion, recordatorio
+    clave         TEXT,                               -- evita duplicados (recordatorios); NULL en el resto
+    turno_id      UUID        NOT NULL,
+    usuario_id    UUID        NOT NULL,
+    datos         JSONB       NOT NULL,               -- el turno tal como quedó al registrarse
+    estado        VARCHAR(20) NOT NULL DEFAULT 'pendiente',  -- pendiente, enviada, descartada, fallida
+    intentos      INTEGER     NOT NULL DEFAULT 0,
+    creada_en     TIMESTAMPTZ NOT NULL DEFAULT now(),
+    disponible_en TIMESTAMPTZ NOT NULL DEFAULT now(), -- próximo intento (backoff)
+    enviada_en    TIMESTAMPTZ,
+    ultimo_error  TEXT
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS notificaciones_salientes_clave_key
+    ON notificaciones_salientes (clave);
+
+-- El despachador solo recorre las pendientes
+CREATE INDEX IF NOT EXISTS idx_notificaciones_salientes_pendientes
+    ON notificaciones_salientes (disponible_en)
+    WHERE estado = 'pendiente';
+
+CREATE INDEX IF NOT EXISTS idx_notificaciones_salientes_creada_en
+    ON notificaciones_salientes (creada_en);
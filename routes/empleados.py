@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Response
+from typing import Optional
 from uuid import UUID
-from database import get_db
-from schemas import EmpleadoResponse, EmpleadoBase, EmpleadoUpdate
+from database import get_db, get_db_lectura
+from utils.campos import campos_solicitados
+from utils.catalogo import headers_validadores, no_modificado
+from utils.respuestas import respuesta_confiable
+from schemas import EmpleadoResponse, EmpleadoBase, EmpleadoUpdate, LoteIds
 from services.empleados import (
-    obtener_empleados,
+    obtener_empleados_catalogo,
+    obtener_empleados_por_ids,
     crear_empleado,
     actualizar_empleado,
     eliminar_empleado,
@@ -13,8 +18,24 @@ from services.empleados import (
 router = APIRouter(prefix="/empleados", tags=["Empleados"])
 
 @router.get("/", response_model=list[EmpleadoResponse])
-def obtener_empleados_endpoint(db=Depends(get_db)):
-    return obtener_empleados(db)   
+def obtener_empleados_endpoint(
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None)
+):
+    campos = campos_solicitados(fields, EmpleadoResponse) if fields else None
+    catalogo = obtener_empleados_catalogo(get_db).variante(campos)
+    if no_modificado(if_none_match, if_modified_since, catalogo):
+        return Response(status_code=304, headers=headers_validadores(catalogo))
+    return Response(content=catalogo.cuerpo, media_type="application/json", headers=headers_validadores(catalogo))
+
+@router.get("/lote")
+def obtener_empleados_lote_endpoint(ids: str):
+    return respuesta_confiable(obtener_empleados_por_ids(ids, get_db))
+
+@router.post("/lote")
+def obtener_empleados_lote_post_endpoint(lote: LoteIds):
+    return respuesta_confiable(obtener_empleados_por_ids(lote.ids, get_db))
 
 @router.post("/", response_model=EmpleadoResponse)
 def crear_empleado_endpoint(empleado: EmpleadoBase, db=Depends(get_db)):
@@ -29,5 +50,5 @@ def eliminar_empleado_endpoint(empleado_id: UUID, db=Depends(get_db)):
     return eliminar_empleado(empleado_id, db)
 
 @router.get("/{empleado_id}", response_model=EmpleadoResponse)
-def obtener_empleado_by_id_endpoint(empleado_id: UUID, db=Depends(get_db)):
+def obtener_empleado_by_id_endpoint(empleado_id: UUID, db=Depends(get_db_lectura)):
     return obtener_empleado_by_id(empleado_id, db)
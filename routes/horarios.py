@@ -2,9 +2,9 @@ from fastapi import APIRouter, Depends
 from uuid import UUID
 from datetime import date, time
 
-from database import get_db
+from database import get_db, get_db_lectura, nueva_conexion
+from services.tareas import ejecutar_tarea
 from services.horarios import (
-    generacion_horarios_semanales,
     crear_programacion_horarios,
     obtener_programacion_horarios,
     actualizar_programacion_horarios,
@@ -16,8 +16,11 @@ from services.horarios import (
 router = APIRouter(prefix="/horarios", tags=["Horarios"])
 
 @router.post("/generar_horarios")
-def generacion_horarios_semanales_endpoint(db=Depends(get_db)):
-    return generacion_horarios_semanales(db)
+def generacion_horarios_semanales_endpoint():
+    # Pasa por el lock de la tarea; la respuesta sigue siendo la de antes (los
+    # conteos quedan en ejecuciones_tareas y en POST /tareas/generar_horarios)
+    ejecutar_tarea("generar_horarios", nueva_conexion)
+    return {"message": "Horarios generados y bloqueos aplicados correctamente"}
 
 
 @router.post("/")
@@ -36,7 +39,7 @@ def crear_programacion_horarios_endpoint(
 def obtener_programacion_horarios_endpoint(
     empleado_id: UUID = None,
     dia: str = None,
-    db=Depends(get_db)
+    db=Depends(get_db_lectura)
 ):
     return obtener_programacion_horarios(db, empleado_id, dia)
 
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends, Query
+from uuid import UUID
+from datetime import date
+from typing import Literal, Optional
+from database import get_db_lectura
+from utils.respuestas import respuesta_confiable
+from services.reportes import obtener_reporte
+
+router = APIRouter(prefix="/reportes", tags=["Reportes"])
+
+@router.get("/")
+def obtener_reporte_endpoint(
+    desde: date,
+    hasta: date,
+    agrupar_por: list[Literal["empleado", "servicio", "dia", "semana", "mes"]] = Query(["empleado"]),
+    empleado_id: Optional[UUID] = None,
+    db=Depends(get_db_lectura)
+):
+    return respuesta_confiable(obtener_reporte(desde, hasta, agrupar_por, empleado_id, db))
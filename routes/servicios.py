@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Response
+from typing import Optional
 from uuid import UUID
-from database import get_db
-from schemas import ServicioBase, ServicioResponse, ServicioUpdate
+from database import get_db, get_db_lectura
+from utils.campos import campos_solicitados
+from utils.catalogo import headers_validadores, no_modificado
+from utils.respuestas import respuesta_confiable
+from schemas import ServicioBase, ServicioResponse, ServicioUpdate, LoteIds
 from services.servicios import (
-    obtener_servicios,
+    obtener_servicios_catalogo,
+    obtener_servicios_por_ids,
     crear_servicio,
     actualizar_servicio,
     eliminar_servicio,
@@ -13,8 +18,24 @@ from services.servicios import (
 router = APIRouter(prefix="/servicios", tags=["Servicios"])
 
 @router.get("/", response_model=list[ServicioResponse])
-def obtener_servicios_endpoint(db=Depends(get_db)):
-    return obtener_servicios(db)
+def obtener_servicios_endpoint(
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None)
+):
+    campos = campos_solicitados(fields, ServicioResponse) if fields else None
+    catalogo = obtener_servicios_catalogo(get_db).variante(campos)
+    if no_modificado(if_none_match, if_modified_since, catalogo):
+        return Response(status_code=304, headers=headers_validadores(catalogo))
+    return Response(content=catalogo.cuerpo, media_type="application/json", headers=headers_validadores(catalogo))
+
+@router.get("/lote")
+def obtener_servicios_lote_endpoint(ids: str):
+    return respuesta_confiable(obtener_servicios_por_ids(ids, get_db))
+
+@router.post("/lote")
+def obtener_servicios_lote_post_endpoint(lote: LoteIds):
+    return respuesta_confiable(obtener_servicios_por_ids(lote.ids, get_db))
 
 @router.post("/", response_model=ServicioResponse)
 def crear_servicio_endpoint(servicio: ServicioBase, db=Depends(get_db)):
@@ -29,5 +50,5 @@ def eliminar_servicio_endpoint(servicio_id: UUID, db=Depends(get_db)):
     return eliminar_servicio(servicio_id, db)
 
 @router.get("/{servicio_id}", response_model=ServicioResponse)
-def obtener_servicio_by_id_endpoint(servicio_id: UUID, db=Depends(get_db)):
+def obtener_servicio_by_id_endpoint(servicio_id: UUID, db=Depends(get_db_lectura)):
     return obtener_servicio_by_id(servicio_id, db)
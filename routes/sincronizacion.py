@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+from datetime import date, datetime
+from typing import Optional
+from database import get_db
+from utils.respuestas import respuesta_confiable
+from services.sincronizacion import obtener_cambios
+
+router = APIRouter(prefix="/sincronizacion", tags=["Sincronización"])
+
+@router.get("/")
+def obtener_cambios_endpoint(desde: Optional[datetime] = None, fecha: Optional[date] = None, db=Depends(get_db)):
+    return respuesta_confiable(obtener_cambios(desde, fecha, db))
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+from database import get_db_lectura, nueva_conexion
+from services.tareas import ejecutar_tarea, obtener_ejecuciones
+
+router = APIRouter(prefix="/tareas", tags=["Tareas"])
+
+@router.get("/ejecuciones")
+def obtener_ejecuciones_endpoint(
+    tarea: Optional[str] = None,
+    limite: int = Query(20, ge=1, le=200),
+    db=Depends(get_db_lectura)
+):
+    return obtener_ejecuciones(tarea, limite, db)
+
+
+@router.post("/{nombre}")
+def ejecutar_tarea_endpoint(nombre: str):
+    return ejecutar_tarea(nombre, nueva_conexion)
@@ -1,52 +1,137 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from uuid import UUID
 from datetime import date
-from typing import Optional
+from typing import Literal, Optional
 
-from database import get_db
-from schemas import TurnoBase, TurnoResponse
+from database import get_db, get_db_lectura, marcar_escritura
+from schemas import LoteIds, TurnoBase, TurnoResponse, TurnoDisponibleResponse, TurnoAgendadoResponse
+from services.idempotencia import ejecutar_idempotente
+from services.disponibilidad_en_vivo import stream_disponibilidad
+from utils.paginacion import TAMANO_PAGINA_DEFECTO, TAMANO_PAGINA_MAX, responder_pagina
+from utils.campos import campos_solicitados
+from utils.respuestas import respuesta_confiable
 from services.turnos import (
     crear_turno,
     obtener_turnos_disponibles,
+    obtener_turnos_disponibles_columnas,
     obtener_turno,
+    obtener_turnos_por_ids,
     cancelar_turno,
     modificar_turno,
     obtener_turnos_por_usuario,
-    obtener_turnos_agendados_por_fecha
+    obtener_turnos_agendados_por_fecha,
+    exportar_turnos
 )
 
 router = APIRouter(prefix="/turnos", tags=["Turnos"])
 
 @router.post("/", response_model=TurnoResponse)
-async def crear_turno_endpoint(turno: TurnoBase):
-    return crear_turno(turno)
+def crear_turno_endpoint(
+    turno: TurnoBase,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db=Depends(get_db)
+):
+    nuevo_turno = ejecutar_idempotente(idempotency_key, "POST /turnos/", turno, lambda: crear_turno(turno, db=db), db=db)
+    marcar_escritura(response, db)
+    return nuevo_turno
 
 
-@router.get("/disponibles")
-async def obtener_turnos_disponibles_endpoint(fecha: date, empleado_id: Optional[UUID] = None, db=Depends(get_db)):
-    return obtener_turnos_disponibles(fecha, empleado_id, db)
+@router.get("/disponibles", response_model=list[TurnoDisponibleResponse])
+def obtener_turnos_disponibles_endpoint(
+    fecha: date,
+    empleado_id: Optional[UUID] = None,
+    fields: Optional[str] = None,
+    formato: Literal["filas", "columnas"] = "filas",
+    db=Depends(get_db_lectura)
+):
+    if formato == "columnas":
+        return respuesta_confiable(obtener_turnos_disponibles_columnas(fecha, empleado_id, db))
+    campos = campos_solicitados(fields, TurnoDisponibleResponse)
+    return respuesta_confiable(obtener_turnos_disponibles(fecha, empleado_id, db, campos))
+
+
+@router.get("/disponibles/stream")
+async def stream_turnos_disponibles_endpoint(
+    request: Request,
+    fecha: list[date] = Query(...),
+    empleado_id: Optional[list[UUID]] = Query(None)
+):
+    return StreamingResponse(
+        stream_disponibilidad(fecha, empleado_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/exportar")
+def exportar_turnos_endpoint(desde: date, hasta: date, formato: str = "ndjson", db=Depends(get_db_lectura)):
+    contenido = exportar_turnos(desde, hasta, formato, db)
+    if formato == "csv":
+        return StreamingResponse(
+            contenido,
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="turnos_{desde}_{hasta}.csv"'}
+        )
+    return StreamingResponse(contenido, media_type="application/x-ndjson")
+
+
+@router.get("/lote")
+def obtener_turnos_lote_endpoint(ids: str, db=Depends(get_db_lectura)):
+    return respuesta_confiable(obtener_turnos_por_ids(ids, db))
+
+
+@router.post("/lote")
+def obtener_turnos_lote_post_endpoint(lote: LoteIds, db=Depends(get_db_lectura)):
+    return respuesta_confiable(obtener_turnos_por_ids(lote.ids, db))
 
 
 @router.get("/{turno_id}", response_model=TurnoResponse)
-async def obtener_turno(turno_id: UUID, db=Depends(get_db)):
-    return obtener_turno(turno_id, db)
+def obtener_turno_endpoint(turno_id: UUID, fecha: Optional[date] = None, db=Depends(get_db_lectura)):
+    return obtener_turno(turno_id, db, fecha)
 
 
 @router.delete("/{turno_id}")
-async def cancelar_turno_endpoint(turno_id: UUID, db=Depends(get_db)):
-    return cancelar_turno(turno_id, db)
+def cancelar_turno_endpoint(turno_id: UUID, response: Response, fecha: Optional[date] = None, db=Depends(get_db)):
+    resultado = cancelar_turno(turno_id, db=db, fecha=fecha)
+    marcar_escritura(response, db)
+    return resultado
 
 
 @router.put("/{turno_id}", response_model=TurnoResponse)
-async def modificar_turno_endpoint(turno_id: UUID, nuevo_turno: TurnoBase, db=Depends(get_db)):
-    return modificar_turno(turno_id, nuevo_turno, db)
+def modificar_turno_endpoint(
+    turno_id: UUID,
+    nuevo_turno: TurnoBase,
+    response: Response,
+    fecha: Optional[date] = None,
+    db=Depends(get_db)
+):
+    # `fecha` es la fecha actual del turno (opcional): la búsqueda va a una sola partición
+    turno_modificado = modificar_turno(turno_id, nuevo_turno, db=db, fecha=fecha)
+    marcar_escritura(response, db)
+    return turno_modificado
 
 
 @router.get("/user/{user_id}", response_model=list[TurnoResponse])
-def obtener_turnos_por_usuario_endpoint(user_id: UUID, db=Depends(get_db)):
-    return obtener_turnos_por_usuario(user_id, db)
+def obtener_turnos_por_usuario_endpoint(
+    user_id: UUID,
+    cursor: Optional[str] = None,
+    limite: int = Query(TAMANO_PAGINA_DEFECTO, ge=1, le=TAMANO_PAGINA_MAX),
+    fields: Optional[str] = None,
+    db=Depends(get_db_lectura)
+):
+    campos = campos_solicitados(fields, TurnoResponse)
+    return responder_pagina(obtener_turnos_por_usuario(user_id, db, cursor, limite, campos), campos)
 
 
-@router.get("/agendados/{fecha}")
-def obtener_turnos_agendados_por_fecha_endpoint(fecha: date, db=Depends(get_db)):
-    return obtener_turnos_agendados_por_fecha(fecha, db)
+@router.get("/agendados/{fecha}", response_model=list[TurnoAgendadoResponse])
+def obtener_turnos_agendados_por_fecha_endpoint(
+    fecha: date,
+    cursor: Optional[str] = None,
+    limite: int = Query(TAMANO_PAGINA_DEFECTO, ge=1, le=TAMANO_PAGINA_MAX),
+    fields: Optional[str] = None,
+    db=Depends(get_db_lectura)
+):
+    campos = campos_solicitados(fields, TurnoAgendadoResponse)
+    return responder_pagina(obtener_turnos_agendados_por_fecha(fecha, db, cursor, limite, campos), campos)
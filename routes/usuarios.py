@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends
+import io
+from fastapi import APIRouter, Depends, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from uuid import UUID
+from typing import Optional
 
-from database import get_db
-from schemas import UsuarioResponse, UsuarioBase, UsuarioUpdate
+from database import get_db, get_db_lectura, marcar_escritura
+from schemas import UsuarioResponse, UsuarioBase, UsuarioUpdate, HistorialTurnoResponse, LoteIds
+from services.idempotencia import ejecutar_idempotente
+from utils.paginacion import TAMANO_PAGINA_MAX, responder_pagina
+from utils.campos import campos_solicitados
+from utils.respuestas import respuesta_confiable
 from services.usuarios import (
     crear_usuario,
+    importar_usuarios_csv,
+    buscar_usuarios,
     obtener_usuario,
+    obtener_usuarios_por_ids,
     actualizar_usuario,
     obtener_usuario_por_telefono,
     obtener_historial_usuario
@@ -14,16 +24,51 @@ from services.usuarios import (
 router = APIRouter(prefix="/usuarios", tags=["Usuarios"])
 
 @router.post("/", response_model=UsuarioResponse)
-def crear_usuario_endpoint(usuario: UsuarioBase, db=Depends(get_db)):
-    return crear_usuario(usuario, db)
+def crear_usuario_endpoint(
+    usuario: UsuarioBase,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db=Depends(get_db)
+):
+    nuevo_usuario = ejecutar_idempotente(idempotency_key, "POST /usuarios/", usuario, lambda: crear_usuario(usuario, db), db=db)
+    marcar_escritura(response, db)
+    return nuevo_usuario
 
+@router.post("/importar")
+async def importar_usuarios_endpoint(request: Request, db=Depends(get_db)):
+    contenido = (await request.body()).decode("utf-8-sig")
+    # La importación (COPY + INSERT) bloquea: fuera del event loop
+    return await run_in_threadpool(importar_usuarios_csv, io.StringIO(contenido), db)
+
+@router.get("/buscar", response_model=list[UsuarioResponse])
+def buscar_usuarios_endpoint(
+    q: str,
+    limite: int = Query(10, ge=1, le=20),
+    fields: Optional[str] = None,
+    db=Depends(get_db_lectura)
+):
+    campos = campos_solicitados(fields, UsuarioResponse)
+    return respuesta_confiable(buscar_usuarios(q, limite, db, campos), campos)
+
+@router.get("/lote")
+def obtener_usuarios_lote_endpoint(ids: str, db=Depends(get_db_lectura)):
+    return respuesta_confiable(obtener_usuarios_por_ids(ids, db))
+
+@router.post("/lote")
+def obtener_usuarios_lote_post_endpoint(lote: LoteIds, db=Depends(get_db_lectura)):
+    return respuesta_confiable(obtener_usuarios_por_ids(lote.ids, db))
+
+# En la primaria, como los catálogos: lo leído llena _usuarios_cache y una réplica
+# atrasada dejaría cacheado el usuario anterior a la última escritura
 @router.get("/{user_id}", response_model=UsuarioResponse)
 def obtener_usuario_endpoint(user_id: UUID, db=Depends(get_db)):
     return obtener_usuario(user_id, db)
 
 @router.put("/", response_model=UsuarioResponse)
-def actualizar_usuario_endpoint(user_id: UUID,usuario_new: UsuarioUpdate, db=Depends(get_db)):
-    return actualizar_usuario(user_id, usuario_new, db)
+def actualizar_usuario_endpoint(user_id: UUID,usuario_new: UsuarioUpdate, response: Response, db=Depends(get_db)):
+    usuario_actualizado = actualizar_usuario(user_id, usuario_new, db)
+    marcar_escritura(response, db)
+    return usuario_actualizado
 
 
 @router.get("/telefono/{telefono}", response_model=UsuarioResponse)
@@ -31,6 +76,13 @@ def obtener_usuario_por_telefono_endpoint(telefono: str, db=Depends(get_db)):
     return obtener_usuario_por_telefono(telefono, db)
 
 
-@router.get("/historial/{user_id}")
-def obtener_historial_usuario_endpoint(user_id: UUID, db=Depends(get_db)):
-    return obtener_historial_usuario(user_id, db)
+@router.get("/historial/{user_id}", response_model=list[HistorialTurnoResponse])
+def obtener_historial_usuario_endpoint(
+    user_id: UUID,
+    cursor: Optional[str] = None,
+    limite: int = Query(6, ge=1, le=TAMANO_PAGINA_MAX),
+    fields: Optional[str] = None,
+    db=Depends(get_db_lectura)
+):
+    campos = campos_solicitados(fields, HistorialTurnoResponse)
+    return responder_pagina(obtener_historial_usuario(user_id, db, cursor, limite, campos), campos)
@@ -5,6 +5,11 @@ from decimal import Decimal
 from typing import Optional
 
 
+# ==== Lotes ====
+class LoteIds(BaseModel):
+    ids: list[UUID] = Field(..., min_length=1, max_length=200)
+
+
 # ==== Usuario (Cliente) ====
 class UsuarioBase(BaseModel):
     nombre: str
@@ -86,3 +91,35 @@ class HorarioDisponibleResponse(HorarioDisponible):
 
     class Config:
         from_attributes = True
+
+
+# ==== Listados de turnos ====
+class TurnoDisponibleResponse(BaseModel):
+    fecha: date
+    hora: time
+    empleado_id: UUID
+    nombre_empleado: str
+    id_reserva: UUID
+    disponible: bool
+
+class TurnoAgendadoResponse(BaseModel):
+    turno_id: UUID
+    usuario_id: UUID
+    telefono: Optional[str] = None
+    email: Optional[str] = None
+    fecha: date
+    hora: time
+    nombre_usuario: Optional[str] = None
+    servicio: Optional[str] = None
+    nombre_empleado: Optional[str] = None
+
+class HistorialTurnoResponse(BaseModel):
+    turno_id: UUID
+    fecha: date
+    hora: time
+    usuario_id: Optional[UUID] = None
+    usuario: Optional[str] = None
+    empleado_id: Optional[UUID] = None
+    empleado: Optional[str] = None
+    servicio_id: Optional[UUID] = None
+    servicio: Optional[str] = None
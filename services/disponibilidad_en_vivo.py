@@ -0,0 +1,126 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from datetime import date
+from typing import AsyncIterator, Optional
+from uuid import UUID
+from services.eventos import suscribir
+
+INTERVALO_HEARTBEAT = 15  # segundos sin eventos antes de mandar un ping
+MAX_EVENTOS_PENDIENTES = 100  # por suscriptor; si se llena se le pide resincronizar
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+# (fecha, empleado_id) -> suscriptores; empleado_id None = todos los empleados de esa fecha
+_suscriptores = defaultdict(set)
+
+
+class Suscripcion:
+    """Cola de eventos de un cliente conectado al stream de disponibilidad."""
+
+    def __init__(self, claves: list):
+        self.claves = claves
+        self.cola = asyncio.Queue(maxsize=MAX_EVENTOS_PENDIENTES)
+        self.desbordada = False
+
+    def encolar(self, evento: dict):
+        if self.desbordada:
+            return
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente lento: se descartan sus eventos y se le pide volver a consultar
+            self.desbordada = True
+
+
+def _formatear(evento: str, datos: dict) -> str:
+    return f"event: {evento}\ndata: {json.dumps(datos, separators=(',', ':'))}\n\n"
+
+
+def _difundir(clave: Optional[dict]):
+    if clave is None or not clave.get("fecha"):
+        destinatarios = set().union(*_suscriptores.values()) if _suscriptores else set()
+    else:
+        destinatarios = _suscriptores.get((clave["fecha"], None), set()) | _suscriptores.get(
+            (clave["fecha"], clave.get("empleado_id")), set()
+        )
+
+    if clave is None or "horas" not in clave:
+        evento = {"tipo": "resync", "fecha": clave.get("fecha") if clave else None}
+    else:
+        evento = {
+            "tipo": "liberado" if clave.get("disponible") else "ocupado",
+            "fecha": clave["fecha"],
+            "empleado_id": clave.get("empleado_id"),
+            "horas": clave["horas"],
+        }
+
+    for suscripcion in destinatarios:
+        suscripcion.encolar(evento)
+
+
+def _al_cambiar_horarios(clave: Optional[dict]):
+    # Llega desde el hilo de escucha: se pasa al loop de asyncio que atiende los streams
+    loop = _loop
+    if loop is not None and _suscriptores:
+        loop.call_soon_threadsafe(_difundir, clave)
+
+
+suscribir("horarios", _al_cambiar_horarios)
+
+
+def _registrar(fechas: list[date], empleados: Optional[list[UUID]]) -> Suscripcion:
+    global _loop
+    empleados_ids = [str(empleado_id) for empleado_id in empleados] if empleados else [None]
+    claves = [(fecha.isoformat(), empleado_id) for fecha in fechas for empleado_id in empleados_ids]
+
+    suscripcion = Suscripcion(claves)
+    with _lock:
+        _loop = asyncio.get_running_loop()
+        for clave in claves:
+            _suscriptores[clave].add(suscripcion)
+    return suscripcion
+
+
+def _desregistrar(suscripcion: Suscripcion):
+    with _lock:
+        for clave in suscripcion.claves:
+            suscriptores = _suscriptores.get(clave)
+            if suscriptores is not None:
+                suscriptores.discard(suscripcion)
+                if not suscriptores:
+                    del _suscriptores[clave]
+
+
+def cantidad_suscriptores() -> int:
+    return len(set().union(*_suscriptores.values())) if _suscriptores else 0
+
+
+async def stream_disponibilidad(fechas: list[date], empleados: Optional[list[UUID]], desconectado) -> AsyncIterator[str]:
+    """
+    Genera eventos Server-Sent Events con los horarios que se ocupan o liberan para
+    las fechas y empleados pedidos. `desconectado` es request.is_disconnected.
+    """
+    suscripcion = _registrar(fechas, empleados)
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            if suscripcion.desbordada:
+                while not suscripcion.cola.empty():
+                    suscripcion.cola.get_nowait()
+                suscripcion.desbordada = False
+                yield _formatear("resync", {"tipo": "resync", "fecha": None})
+                continue
+
+            try:
+                evento = await asyncio.wait_for(suscripcion.cola.get(), timeout=INTERVALO_HEARTBEAT)
+            except asyncio.TimeoutError:
+                if await desconectado():
+                    break
+                yield ": ping\n\n"
+                continue
+
+            yield _formatear(evento["tipo"], evento)
+    finally:
+        _desregistrar(suscripcion)
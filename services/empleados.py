@@ -1,13 +1,21 @@
 from uuid import UUID
-from schemas import EmpleadoBase, EmpleadoUpdate
+from database import es_de_peticion
+from schemas import EmpleadoBase, EmpleadoUpdate, EmpleadoResponse
 from exception_handlers import AppException, NotFoundError, ValidationError, OperationError, try_except_closeCursor
+from services.eventos import escucha_activa, publicar_cambio, suscribir
+from utils.catalogo import CatalogoCache, EntradaCatalogo, ultima_modificacion_tabla
 from utils.helpers import fetchall_to_dict, fetchone_to_dict
+from utils.lotes import ordenar_por_ids, validar_ids_lote
+from utils.respuestas import proyectar
+
+catalogo_empleados = CatalogoCache(ttl_respaldo=300, sincronizado=escucha_activa)
+suscribir("empleados", lambda clave: catalogo_empleados.invalidar())
 
 @try_except_closeCursor
 def obtener_empleados(db) -> list:
 
     cursor = db.cursor()
-    cursor.execute("SELECT * FROM empleados;")
+    cursor.execute("SELECT id, nombre, especialidad FROM empleados;")
     empleados = fetchall_to_dict(cursor)
     
     if not empleados:
@@ -15,6 +23,30 @@ def obtener_empleados(db) -> list:
 
     return empleados
     
+def obtener_empleados_catalogo(conectar) -> EntradaCatalogo:
+    """Devuelve el catálogo cacheado; solo abre una conexión con `conectar` si no está cargado."""
+
+    def cargar():
+        db = conectar()
+        try:
+            ultima_modificacion = ultima_modificacion_tabla(db, "empleados")
+            return proyectar(obtener_empleados(db), EmpleadoResponse), ultima_modificacion
+        finally:
+            # La de get_db en una petición vuelve al pool con el middleware
+            if not es_de_peticion(db):
+                db.close()
+
+    return catalogo_empleados.obtener(cargar)
+
+def obtener_empleados_por_ids(ids: list, conectar) -> dict:
+    """Resuelve el lote desde el catálogo cacheado, sin consultar la base si ya está cargado."""
+    ids = validar_ids_lote(ids)
+    try:
+        empleados = obtener_empleados_catalogo(conectar).datos
+    except NotFoundError:
+        empleados = []
+    return ordenar_por_ids(empleados, ids)
+
 @try_except_closeCursor
 def crear_empleado(empleado: EmpleadoBase, db) -> dict:
     
@@ -25,12 +57,14 @@ def crear_empleado(empleado: EmpleadoBase, db) -> dict:
         """
         INSERT INTO empleados (nombre, especialidad)
         VALUES (%s, %s)
-        RETURNING *;
+        RETURNING id, nombre, especialidad;
         """,
         (empleado.nombre, empleado.especialidad)
     )
     nuevo_empleado = fetchone_to_dict(cursor)
+    publicar_cambio(cursor, "empleados")
     db.commit()
+    catalogo_empleados.invalidar()
 
     if not nuevo_empleado:
         raise OperationError("Error al crear el nuevo empleado")
@@ -43,7 +77,7 @@ def actualizar_empleado(empleado_id: UUID, empleado: EmpleadoUpdate, db) -> dict
     empleado_id = str(empleado_id)
 
     cursor = db.cursor()
-    cursor.execute("SELECT * FROM empleados WHERE id = %s;", (empleado_id,))
+    cursor.execute("SELECT id, nombre, especialidad FROM empleados WHERE id = %s;", (empleado_id,))
     empleado_anterior = fetchone_to_dict(cursor)
 
     if not empleado_anterior:
@@ -58,13 +92,15 @@ def actualizar_empleado(empleado_id: UUID, empleado: EmpleadoUpdate, db) -> dict
         UPDATE empleados
         SET nombre = %s, especialidad = %s
         WHERE id = %s
-        RETURNING *;
+        RETURNING id, nombre, especialidad;
         """,
         (empleado.nombre, empleado.especialidad, empleado_id)
     )
 
     empleado_actualizado = fetchone_to_dict(cursor)
+    publicar_cambio(cursor, "empleados")
     db.commit()
+    catalogo_empleados.invalidar()
 
     if not empleado_actualizado:
         raise OperationError(f"Error al actualizar el empleado con id {empleado_id}")
@@ -81,7 +117,9 @@ def eliminar_empleado(empleado_id: UUID, db) -> dict:
     if filas_afectadas == 0:
         raise NotFoundError("Empleado no encontrado")
     
+    publicar_cambio(cursor, "empleados")
     db.commit()
+    catalogo_empleados.invalidar()
 
     return {"mensaje": "Empleado eliminado correctamente"}
 
@@ -89,7 +127,7 @@ def eliminar_empleado(empleado_id: UUID, db) -> dict:
 def obtener_empleado_by_id(empleado_id: UUID, db) -> dict:
     
     cursor = db.cursor()
-    cursor.execute("SELECT * FROM empleados WHERE id = %s;", (str(empleado_id),))
+    cursor.execute("SELECT id, nombre, especialidad FROM empleados WHERE id = %s;", (str(empleado_id),))
     empleado = fetchone_to_dict(cursor)
 
     if not empleado:
@@ -0,0 +1,127 @@
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+from typing import Callable
+from fastapi.encoders import jsonable_encoder
+
+logger = logging.getLogger(__name__)
+
+CANAL_CAMBIOS = "cambios_peluqueria"
+INTERVALO_LATIDO = 5  # segundos entre chequeos de la conexión de escucha
+
+_suscriptores = defaultdict(list)
+_estado = {
+    "conectado": False,
+    "ultimo_latido": 0.0,
+    "reconexiones": 0,
+    "eventos_recibidos": 0,
+    "demora_ultima_ms": None,
+    "demora_max_ms": 0.0,
+    "demora_total_ms": 0.0,
+}
+
+
+def suscribir(entidad: str, callback: Callable[[dict], None]):
+    """
+    Registra `callback(clave)` para los cambios de `entidad`. `clave` identifica lo
+    modificado (p. ej. fecha y empleado) o es None si hay que invalidar todo.
+    """
+    _suscriptores[entidad].append(callback)
+
+
+def publicar_cambio(cursor, entidad: str, clave: dict = None):
+    """
+    Publica un cambio con NOTIFY dentro de la transacción del cursor; Postgres lo
+    entrega a todos los procesos que escuchan recién cuando se confirma.
+    """
+    payload = json.dumps({"entidad": entidad, "clave": jsonable_encoder(clave), "ts": time.time()})
+    cursor.execute("SELECT pg_notify(%s, %s);", (CANAL_CAMBIOS, payload))
+
+
+def escucha_activa() -> bool:
+    """Indica si este proceso está recibiendo cambios; si no, los caches usan su TTL de respaldo."""
+    return _estado["conectado"] and time.monotonic() - _estado["ultimo_latido"] < 2 * INTERVALO_LATIDO
+
+
+def estadisticas_escucha() -> dict:
+    recibidos = _estado["eventos_recibidos"]
+    return {
+        "conectado": escucha_activa(),
+        "reconexiones": _estado["reconexiones"],
+        "eventos_recibidos": recibidos,
+        "demora_ultima_ms": _estado["demora_ultima_ms"],
+        "demora_max_ms": round(_estado["demora_max_ms"], 2),
+        "demora_promedio_ms": round(_estado["demora_total_ms"] / recibidos, 2) if recibidos else None,
+    }
+
+
+def _notificar(entidad: str, clave):
+    for callback in _suscriptores.get(entidad, []):
+        try:
+            callback(clave)
+        except Exception:
+            logger.exception("Error al procesar el cambio de %s", entidad)
+
+
+def _despachar(payload: str):
+    try:
+        evento = json.loads(payload)
+    except ValueError:
+        logger.warning("Evento de cambio inválido: %s", payload)
+        return
+
+    demora_ms = max(0.0, (time.time() - evento.get("ts", time.time())) * 1000)
+    _estado["eventos_recibidos"] += 1
+    _estado["demora_ultima_ms"] = round(demora_ms, 2)
+    _estado["demora_max_ms"] = max(_estado["demora_max_ms"], demora_ms)
+    _estado["demora_total_ms"] += demora_ms
+
+    _notificar(evento.get("entidad"), evento.get("clave"))
+
+
+def _escuchar(conectar, detener: threading.Event):
+    espera = 1
+    while not detener.is_set():
+        conn = None
+        try:
+            conn = conectar()
+            conn.set_session(autocommit=True)
+            cursor = conn.cursor()
+            cursor.execute(f"LISTEN {CANAL_CAMBIOS};")
+            _estado["conectado"] = True
+            _estado["ultimo_latido"] = time.monotonic()
+            espera = 1
+
+            # Mientras no hubo conexión se pudieron perder eventos: se invalida todo
+            for entidad in list(_suscriptores):
+                _notificar(entidad, None)
+
+            while not detener.is_set():
+                if select.select([conn], [], [], INTERVALO_LATIDO) == ([], [], []):
+                    cursor.execute("SELECT 1;")  # Detecta conexiones caídas
+                conn.poll()
+                while conn.notifies:
+                    _despachar(conn.notifies.pop(0).payload)
+                _estado["ultimo_latido"] = time.monotonic()
+        except Exception:
+            logger.exception("Se perdió la conexión de escucha de cambios, reintentando en %ss", espera)
+        finally:
+            _estado["conectado"] = False
+            if conn is not None and not conn.closed:
+                conn.close()
+
+        if detener.wait(espera):
+            break
+        espera = min(espera * 2, 60)
+        _estado["reconexiones"] += 1
+
+
+def iniciar_escucha(conectar) -> threading.Event:
+    """Lanza el hilo que escucha los cambios; devuelve el evento para detenerlo."""
+    detener = threading.Event()
+    hilo = threading.Thread(target=_escuchar, args=(conectar, detener), name="escucha-cambios", daemon=True)
+    hilo.start()
+    return detener
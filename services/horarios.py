@@ -1,7 +1,119 @@
 from uuid import UUID
 from datetime import date, datetime, timedelta, time
 from exception_handlers import AppException, NotFoundError, ValidationError, OperationError, try_except_closeCursor
-from utils.helpers import fetchall_to_dict, fetchone_to_dict
+from services.eventos import publicar_cambio
+from services.particiones import asegurar_particiones
+from utils.helpers import fetchall_registros, fetchall_to_dict, fetchone_to_dict
+from utils.sentencias import ejecutar_preparada
+
+# Día de la programación -> día ISO de la semana (lunes = 1)
+DIAS_SEMANA = {"L": 1, "M": 2, "X": 3, "J": 4, "V": 5, "S": 6, "D": 7}
+
+# Horarios que la programación vigente del empleado genera para cada fecha futura
+# ya generada de ese día de la semana
+_CTE_HORARIOS_PROGRAMADOS = """
+    WITH fechas AS (
+        SELECT DISTINCT fecha
+        FROM horarios_disponibles
+        WHERE fecha > CURRENT_DATE
+            AND EXTRACT(ISODOW FROM fecha) = %(dia_iso)s
+    ),
+    programados AS (
+        SELECT f.fecha, s.momento::time AS hora
+        FROM fechas f
+        CROSS JOIN programacion_horarios p
+        CROSS JOIN LATERAL generate_series(
+            f.fecha + p.hora_inicio,
+            f.fecha + p.hora_fin,
+            make_interval(mins => p.intervalo)
+        ) AS s(momento)
+        WHERE p.empleado_id = %(empleado_id)s
+            AND p.dia = %(dia)s
+            AND s.momento < f.fecha + p.hora_fin
+    )
+"""
+
+
+def _propagar_programacion(cursor, db, empleado_id, dia: str) -> dict:
+    """
+    Lleva los horarios ya generados del empleado para ese día de la semana a lo que
+    dice la programación: agrega los que faltan y borra los que sobran, sin tocar
+    el resto. Si algún horario a borrar tiene un turno confirmado no aplica nada.
+    """
+    parametros = {"empleado_id": str(empleado_id), "dia": dia, "dia_iso": DIAS_SEMANA[dia]}
+
+    # Bloquear antes del chequeo los horarios que se van a borrar: una reserva en
+    # curso sobre alguno termina antes (y el chequeo la ve) o espera y, borrado el
+    # horario, falla al reservarlo
+    cursor.execute(
+        _CTE_HORARIOS_PROGRAMADOS + """
+        SELECT h.id
+        FROM horarios_disponibles h
+        WHERE h.empleado_id = %(empleado_id)s
+            AND h.fecha IN (SELECT fecha FROM fechas)
+            AND NOT EXISTS (SELECT 1 FROM programados p WHERE p.fecha = h.fecha AND p.hora = h.hora)
+        FOR UPDATE OF h;
+        """, parametros
+    )
+
+    cursor.execute(
+        _CTE_HORARIOS_PROGRAMADOS + """
+        SELECT t.fecha, t.hora
+        FROM turnos t
+        WHERE t.empleado_id = %(empleado_id)s
+            AND t.estado = 'confirmado'
+            AND t.fecha IN (SELECT fecha FROM fechas)
+            AND NOT EXISTS (SELECT 1 FROM programados p WHERE p.fecha = t.fecha AND p.hora = t.hora)
+        ORDER BY t.fecha, t.hora;
+        """, parametros
+    )
+    huerfanos = fetchall_to_dict(cursor)
+    if huerfanos:
+        db.rollback()
+        turnos = ", ".join(f"{turno['fecha']} {turno['hora']}" for turno in huerfanos)
+        raise ValidationError(f"El cambio deja sin horario a turnos confirmados: {turnos}. Por favor cancelar o mover los turnos antes de modificar la programación")
+
+    cursor.execute(
+        _CTE_HORARIOS_PROGRAMADOS + """
+        , eliminados AS (
+            DELETE FROM horarios_disponibles h
+            WHERE h.empleado_id = %(empleado_id)s
+                AND h.fecha IN (SELECT fecha FROM fechas)
+                AND NOT EXISTS (SELECT 1 FROM programados p WHERE p.fecha = h.fecha AND p.hora = h.hora)
+            RETURNING h.fecha
+        ),
+        agregados AS (
+            INSERT INTO horarios_disponibles (fecha, hora, empleado_id, disponible)
+            SELECT p.fecha, p.hora, %(empleado_id)s, NOT EXISTS (
+                SELECT 1 FROM bloqueos_horarios bh
+                WHERE bh.empleado_id = %(empleado_id)s
+                    AND bh.fecha = p.fecha
+                    AND p.hora >= bh.hora_inicio
+                    AND p.hora < bh.hora_fin
+            )
+            FROM programados p
+            ON CONFLICT DO NOTHING
+            RETURNING fecha
+        )
+        SELECT fecha,
+            count(*) FILTER (WHERE agregado) AS agregados,
+            count(*) FILTER (WHERE NOT agregado) AS eliminados
+        FROM (
+            SELECT fecha, TRUE AS agregado FROM agregados
+            UNION ALL
+            SELECT fecha, FALSE FROM eliminados
+        ) cambios
+        GROUP BY fecha;
+        """, parametros
+    )
+    cambios = fetchall_registros(cursor)
+    for cambio in cambios:
+        publicar_cambio(cursor, "horarios", {"fecha": cambio.fecha, "empleado_id": empleado_id})
+
+    return {
+        "horarios_agregados": sum(cambio.agregados for cambio in cambios),
+        "horarios_eliminados": sum(cambio.eliminados for cambio in cambios)
+    }
 
 
 @try_except_closeCursor
@@ -9,42 +121,40 @@ def generacion_horarios_semanales(db) -> dict:
     semanas_plazo = 0
     dias_plazo = semanas_plazo * 7 + 1
 
-    desplazamiento_dias = {
-        "L": 1 + dias_plazo,
-        "M": 2 + dias_plazo,
-        "X": 3 + dias_plazo,
-        "J": 4 + dias_plazo,
-        "V": 5 + dias_plazo,
-        "S": 6 + dias_plazo,
-        "D": 7 + dias_plazo
-    }
+    inicio_plazo = date.today() + timedelta(days=1 + dias_plazo)
 
     cursor = db.cursor()
+    horarios_creados = 0
+    horarios_bloqueados = 0
+
+    # Paso 0: Las fechas a generar necesitan su partición mensual
+    asegurar_particiones(cursor)
+    db.commit()
 
     # Paso 1: Obtener la programación de horarios
-    cursor.execute("SELECT * FROM programacion_horarios")
-    programacion_horarios = fetchall_to_dict(cursor)
+    cursor.execute("SELECT empleado_id, dia, hora_inicio, hora_fin, intervalo FROM programacion_horarios")
+    programacion_horarios = fetchall_registros(cursor)
     if not programacion_horarios:
         raise NotFoundError("No se encontró la programación de horarios")
 
     # Paso 2: Para cada registro, generar los horarios disponibles
     for horario_prog in programacion_horarios:
-        dia_programado = horario_prog["dia"]
-        hora_inicio = horario_prog["hora_inicio"]
-        hora_fin = horario_prog["hora_fin"]
-        intervalo = horario_prog["intervalo"]  # en minutos
-        empleado_id = horario_prog["empleado_id"]
+        dia_programado = horario_prog.dia
+        hora_inicio = horario_prog.hora_inicio
+        hora_fin = horario_prog.hora_fin
+        intervalo = horario_prog.intervalo  # en minutos
+        empleado_id = horario_prog.empleado_id
 
-        if dia_programado not in desplazamiento_dias:
+        if dia_programado not in DIAS_SEMANA:
             continue
 
-        # Calcular la fecha destino según el día programado
-        fecha = date.today() + timedelta(days=desplazamiento_dias[dia_programado])
+        # Calcular la fecha destino: ese día de la semana dentro de los 7 días del plazo
+        fecha = inicio_plazo + timedelta(days=(DIAS_SEMANA[dia_programado] - inicio_plazo.isoweekday()) % 7)
         current_datetime = datetime.combine(fecha, hora_inicio)
         end_datetime = datetime.combine(fecha, hora_fin)
 
         while current_datetime < end_datetime:
-            cursor.execute(
+            ejecutar_preparada(cursor,
                 """
                 INSERT INTO horarios_disponibles (fecha, hora, empleado_id, disponible)
                 VALUES (%s, %s, %s, TRUE)
@@ -52,9 +162,11 @@ def generacion_horarios_semanales(db) -> dict:
                 """,
                 (fecha, current_datetime.time(), empleado_id)
             )
+            horarios_creados += cursor.rowcount
             current_datetime += timedelta(minutes=intervalo)
 
-        # Paso 3: Actualizar horarios que deban bloquearse según la tabla de bloqueos
+        # Paso 3: Bloquear los horarios recién generados que caen en un bloqueo
+        # (los ya existentes los bloquea bloquear_horarios al crear el bloqueo)
         cursor.execute(
             """
             UPDATE horarios_disponibles
@@ -65,11 +177,22 @@ def generacion_horarios_semanales(db) -> dict:
                 AND horarios_disponibles.fecha = bh.fecha
                 AND horarios_disponibles.hora >= bh.hora_inicio
                 AND horarios_disponibles.hora < bh.hora_fin
-            """
+                AND horarios_disponibles.disponible = TRUE
+                AND horarios_disponibles.empleado_id = %s
+                AND horarios_disponibles.fecha = %s
+            """, (empleado_id, fecha)
         )
+        horarios_bloqueados += cursor.rowcount
         db.commit()
 
-    return {"message": "Horarios generados y bloqueos aplicados correctamente"}
+    publicar_cambio(cursor, "horarios")
+    db.commit()
+
+    return {
+        "message": "Horarios generados y bloqueos aplicados correctamente",
+        "horarios_creados": horarios_creados,
+        "horarios_bloqueados": horarios_bloqueados
+    }
 
 
 
@@ -79,7 +202,7 @@ def crear_programacion_horarios(empleado_id: UUID, dia: str, hora_inicio: time,
     cursor = db.cursor()
 
     # Validar que el empleado exista
-    cursor.execute("SELECT * FROM empleados WHERE id = %s;", (str(empleado_id),))
+    cursor.execute("SELECT id FROM empleados WHERE id = %s;", (str(empleado_id),))
     if not fetchone_to_dict(cursor):
         raise NotFoundError("No se encontró al empleado")
     
@@ -95,7 +218,7 @@ def crear_programacion_horarios(empleado_id: UUID, dia: str, hora_inicio: time,
     # Validar que no se choque con horarios ya programados
     cursor.execute(
         """
-        SELECT * 
+        SELECT id 
         FROM programacion_horarios 
         WHERE 
             empleado_id = %s
@@ -113,10 +236,11 @@ def crear_programacion_horarios(empleado_id: UUID, dia: str, hora_inicio: time,
         """
         INSERT INTO programacion_horarios (empleado_id, dia, hora_inicio, hora_fin, intervalo)
         VALUES (%s, %s, %s, %s, %s)
-        RETURNING *;
+        RETURNING id, empleado_id, dia, hora_inicio, hora_fin, intervalo;
         """, (str(empleado_id), dia, hora_inicio, hora_fin, intervalo)
     )
     programacion_horarios = fetchone_to_dict(cursor)
+    programacion_horarios["propagacion"] = _propagar_programacion(cursor, db, empleado_id, dia)
     db.commit()
 
     return programacion_horarios
@@ -144,7 +268,7 @@ def obtener_programacion_horarios(db, empleado_id: UUID = None, dia: str = None)
     
     if empleado_id:
 
-        cursor.execute("SELECT * FROM empleados WHERE id = %s;", (str(empleado_id),))
+        cursor.execute("SELECT id FROM empleados WHERE id = %s;", (str(empleado_id),))
         if not fetchone_to_dict(cursor):
             raise NotFoundError(f"No se encontró al empleado con id: {empleado_id}")
         
@@ -188,7 +312,7 @@ def actualizar_programacion_horarios(id: UUID, hora_inicio: time = None, hora_fi
     
     cursor = db.cursor()
 
-    cursor.execute("SELECT * FROM programacion_horarios WHERE id = %s;", (str(id),))
+    cursor.execute("SELECT id, empleado_id, dia, hora_inicio, hora_fin, intervalo FROM programacion_horarios WHERE id = %s;", (str(id),))
     programacion = fetchone_to_dict(cursor)
 
     if not programacion:
@@ -208,7 +332,7 @@ def actualizar_programacion_horarios(id: UUID, hora_inicio: time = None, hora_fi
 
     cursor.execute(
         """
-        SELECT * 
+        SELECT id 
         FROM programacion_horarios 
         WHERE 
             id != %s
@@ -226,10 +350,11 @@ def actualizar_programacion_horarios(id: UUID, hora_inicio: time = None, hora_fi
         UPDATE programacion_horarios
         SET hora_inicio = %s, hora_fin = %s, intervalo = %s
         WHERE id = %s
-        RETURNING *;
+        RETURNING id, empleado_id, dia, hora_inicio, hora_fin, intervalo;
         """, (hora_inicio, hora_fin, intervalo, str(id))
     )
     programacion_actualizada = fetchone_to_dict(cursor)
+    programacion_actualizada["propagacion"] = _propagar_programacion(cursor, db, programacion["empleado_id"], programacion["dia"])
     db.commit()
     
     return programacion_actualizada
@@ -239,20 +364,21 @@ def actualizar_programacion_horarios(id: UUID, hora_inicio: time = None, hora_fi
 def eliminar_programacion_horarios(id: UUID, db) -> dict:
         
     cursor = db.cursor()
-    cursor.execute("DELETE FROM programacion_horarios WHERE id = %s RETURNING *;", (str(id),))
+    cursor.execute("DELETE FROM programacion_horarios WHERE id = %s RETURNING id, empleado_id, dia;", (str(id),))
     resultado = fetchone_to_dict(cursor)
-    if resultado == "DELETE 0":
+    if not resultado:
         cursor.close()
         raise NotFoundError("Programación de horario no encontrada")
+    propagacion = _propagar_programacion(cursor, db, resultado["empleado_id"], resultado["dia"])
     db.commit()
-    return {"mensaje": "Programación de horario eliminada correctamente"}
+    return {"mensaje": "Programación de horario eliminada correctamente", "propagacion": propagacion}
 
 
 @try_except_closeCursor
 def bloquear_horarios(empleado_id: UUID, fecha: date, hora_inicio: time, hora_fin: time, db) -> dict:
         
     cursor = db.cursor()
-    cursor.execute("SELECT * FROM empleados WHERE id = %s;", (str(empleado_id),))
+    cursor.execute("SELECT id FROM empleados WHERE id = %s;", (str(empleado_id),))
     if not fetchone_to_dict(cursor):
         raise NotFoundError(f"No se encontró el empleado con id {empleado_id}")
     
@@ -262,7 +388,7 @@ def bloquear_horarios(empleado_id: UUID, fecha: date, hora_inicio: time, hora_fi
     if fecha < date.today():
         raise ValidationError("La fecha no puede ser anterior a la fecha actual")
     
-    cursor.execute("SELECT * FROM horarios_disponibles WHERE empleado_id = %s AND fecha = %s;", (str(empleado_id), fecha))
+    cursor.execute("SELECT hora, disponible FROM horarios_disponibles WHERE empleado_id = %s AND fecha = %s;", (str(empleado_id), fecha))
     horarios = fetchall_to_dict(cursor)
     if not horarios:
         cursor.execute(
@@ -271,16 +397,17 @@ def bloquear_horarios(empleado_id: UUID, fecha: date, hora_inicio: time, hora_fi
             VALUES (%s, %s, %s, %s);
             """, (str(empleado_id), fecha, hora_inicio, hora_fin)
         )
+        publicar_cambio(cursor, "horarios", {"fecha": fecha, "empleado_id": empleado_id})
         db.commit()
         return {"mensaje": "bloqueo de horarios guardados correctamente"}
     
     horarios_con_turno = []
     for horario in horarios:
         if not horario["disponible"]:
-            cursor.execute(
+            ejecutar_preparada(cursor,
                 """
-                SELECT * FROM turnos 
-                WHERE empleado_id = $1 AND fecha = $2 AND hora = $3 AND estado = 'confirmado';
+                SELECT id FROM turnos 
+                WHERE empleado_id = %s AND fecha = %s AND hora = %s AND estado = 'confirmado';
                 """, (str(empleado_id), fecha, horario["hora"])
             )
             turno = fetchone_to_dict(cursor)
@@ -298,9 +425,17 @@ def bloquear_horarios(empleado_id: UUID, fecha: date, hora_inicio: time, hora_fi
             empleado_id = %s
             AND fecha = %s
             AND hora >= %s
-            AND hora < %s;
+            AND hora < %s
+        RETURNING hora;
         """, (str(empleado_id), fecha, hora_inicio, hora_fin)
     )
+    horas_bloqueadas = [horario.hora for horario in fetchall_registros(cursor)]
+    publicar_cambio(cursor, "horarios", {
+        "fecha": fecha,
+        "empleado_id": empleado_id,
+        "horas": horas_bloqueadas,
+        "disponible": False
+    })
     db.commit()
 
     return {"mensaje": "Horarios bloqueados correctamente"}
@@ -310,7 +445,7 @@ def bloquear_horarios(empleado_id: UUID, fecha: date, hora_inicio: time, hora_fi
 def desbloquear_horarios(empleado_id: UUID, fecha: date, hora_inicio: time, hora_fin: time, db) -> dict:
 
     cursor = db.cursor()
-    cursor.execute("SELECT * FROM empleados WHERE id = %s;", (str(empleado_id),))
+    cursor.execute("SELECT id FROM empleados WHERE id = %s;", (str(empleado_id),))
     empleado = fetchone_to_dict(cursor)
     if not empleado:
         raise NotFoundError(f"No se encontró el empleado con id {empleado_id}")
@@ -320,7 +455,7 @@ def desbloquear_horarios(empleado_id: UUID, fecha: date, hora_inicio: time, hora
     
     cursor.execute(
         """
-        SELECT * FROM horarios_disponibles 
+        SELECT hora FROM horarios_disponibles 
         WHERE 
             empleado_id = %s 
             AND fecha = %s 
@@ -335,12 +470,12 @@ def desbloquear_horarios(empleado_id: UUID, fecha: date, hora_inicio: time, hora
 
         cursor.execute(
             """
-            SELECT * FROM bloqueos_horarios 
+            SELECT id FROM bloqueos_horarios 
             WHERE 
                 empleado_id = %s 
                 AND fecha = %s
-                AND hora >= %s
-                AND hora < %s;
+                AND hora_inicio >= %s
+                AND hora_fin <= %s;
             """, (str(empleado_id), fecha, hora_inicio, hora_fin)
         )
         bloqueos = fetchall_to_dict(cursor)
@@ -352,6 +487,7 @@ def desbloquear_horarios(empleado_id: UUID, fecha: date, hora_inicio: time, hora
                     WHERE id = %s;
                     """, (bloqueo["id"],)
                 )
+            publicar_cambio(cursor, "horarios", {"fecha": fecha, "empleado_id": empleado_id})
             db.commit()
             return {"mensaje": "Horarios desbloqueados correctamente"}
         else:
@@ -359,9 +495,9 @@ def desbloquear_horarios(empleado_id: UUID, fecha: date, hora_inicio: time, hora
     
     horarios_con_turno = []
     for horario in horarios_bloqueados:
-        cursor.execute(
+        ejecutar_preparada(cursor,
             """
-            SELECT * FROM turnos 
+            SELECT id FROM turnos 
             WHERE 
                 empleado_id = %s
                 AND fecha = %s 
@@ -373,7 +509,7 @@ def desbloquear_horarios(empleado_id: UUID, fecha: date, hora_inicio: time, hora
         if turno:
             horarios_con_turno.append(horario["hora"])
     
-    db.execute(
+    cursor.execute(
         """
         UPDATE horarios_disponibles
         SET disponible = TRUE
@@ -385,9 +521,17 @@ def desbloquear_horarios(empleado_id: UUID, fecha: date, hora_inicio: time, hora
             AND hora NOT IN (
                 SELECT hora FROM turnos 
                 WHERE empleado_id = %s AND fecha = %s AND estado = 'confirmado'
-            );
+            )
+        RETURNING hora;
         """, (str(empleado_id), fecha, hora_inicio, hora_fin, str(empleado_id), fecha)
     )
+    horas_liberadas = [horario.hora for horario in fetchall_registros(cursor)]
+    publicar_cambio(cursor, "horarios", {
+        "fecha": fecha,
+        "empleado_id": empleado_id,
+        "horas": horas_liberadas,
+        "disponible": True
+    })
     db.commit()
     
     if horarios_con_turno:
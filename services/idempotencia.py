@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+from typing import Callable, Optional
+from fastapi.encoders import jsonable_encoder
+from psycopg2.extras import Json
+from exception_handlers import ConflictError, ValidationError, try_except_closeCursor
+from utils.cache import CacheTTL
+from utils.helpers import fetchone_to_dict
+
+TTL_IDEMPOTENCIA_HORAS = 24
+
+# Una clave reservada sin respuesta se puede volver a tomar pasado este lapso (el
+# proceso que la reservó murió o no pudo liberarla). Tiene que superar el plazo de
+# las rutas que la usan (ver PLAZOS_RUTAS en main.py).
+LEASE_IDEMPOTENCIA_SEGUNDOS = int(os.getenv("LEASE_IDEMPOTENCIA_SEGUNDOS", "60"))
+
+# Respuestas ya confirmadas en la base, para no consultarla en cada reintento
+_respuestas_cache = CacheTTL(max_entradas=2048, ttl_segundos=TTL_IDEMPOTENCIA_HORAS * 3600)
+
+
+def _hash_cuerpo(payload) -> str:
+    cuerpo = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(cuerpo.encode("utf-8")).hexdigest()
+
+
+@try_except_closeCursor
+def ejecutar_idempotente(clave: Optional[str], endpoint: str, payload, operacion: Callable[[], dict], db):
+    """
+    Ejecuta `operacion` una sola vez por (clave, endpoint). Los reintentos con la
+    misma clave devuelven la respuesta guardada sin volver a ejecutarla.
+    """
+    if not clave:
+        return operacion()
+
+    clave = clave.strip()
+    if not clave or len(clave) > 255:
+        raise ValidationError("El header Idempotency-Key debe tener entre 1 y 255 caracteres")
+
+    hash_cuerpo = _hash_cuerpo(payload)
+
+    # Paso 1: Buscar en el cache del proceso
+    guardada = _respuestas_cache.obtener((endpoint, clave))
+    if guardada:
+        if guardada["hash_cuerpo"] != hash_cuerpo:
+            raise ValidationError("La clave de idempotencia ya fue usada con otro contenido")
+        return guardada["respuesta"]
+
+    # Paso 2: Reservar la clave; si ya existe y no expiró (ni venció su reserva sin
+    # respuesta), no se vuelve a ejecutar
+    cursor = db.cursor()
+    cursor.execute(
+        """
+        INSERT INTO claves_idempotencia (clave, endpoint, hash_cuerpo, expira_en)
+        VALUES (%s, %s, %s, now() + make_interval(hours => %s))
+        ON CONFLICT (clave, endpoint) DO UPDATE
+            SET hash_cuerpo = EXCLUDED.hash_cuerpo,
+                respuesta = NULL,
+                creado_en = now(),
+                expira_en = EXCLUDED.expira_en
+            WHERE claves_idempotencia.expira_en <= now()
+                OR (
+                    claves_idempotencia.respuesta IS NULL
+                    AND claves_idempotencia.creado_en < now() - make_interval(secs => %s)
+                )
+        RETURNING clave;
+        """, (clave, endpoint, hash_cuerpo, TTL_IDEMPOTENCIA_HORAS, LEASE_IDEMPOTENCIA_SEGUNDOS)
+    )
+    reservada = fetchone_to_dict(cursor)
+    db.commit()
+
+    if not reservada:
+        cursor.execute(
+            """
+            SELECT hash_cuerpo, respuesta
+            FROM claves_idempotencia
+            WHERE clave = %s AND endpoint = %s;
+            """, (clave, endpoint)
+        )
+        existente = fetchone_to_dict(cursor)
+        if not existente:
+            raise ConflictError("La solicitud con esta clave de idempotencia no pudo resolverse, reintente")
+        if existente["hash_cuerpo"] != hash_cuerpo:
+            raise ValidationError("La clave de idempotencia ya fue usada con otro contenido")
+        if existente["respuesta"] is None:
+            raise ConflictError(f"Ya hay una solicitud en curso con esta clave de idempotencia; si no termina, puede reintentarse en {LEASE_IDEMPOTENCIA_SEGUNDOS} segundos")
+        _respuestas_cache.guardar((endpoint, clave), existente)
+        return existente["respuesta"]
+
+    # Paso 3: Ejecutar la operación; si falla se libera la clave para permitir reintentos
+    try:
+        resultado = operacion()
+    except Exception:
+        db.rollback()
+        cursor.execute(
+            "DELETE FROM claves_idempotencia WHERE clave = %s AND endpoint = %s;",
+            (clave, endpoint)
+        )
+        db.commit()
+        raise
+
+    # Paso 4: Guardar la respuesta para los reintentos
+    respuesta = jsonable_encoder(resultado)
+    cursor.execute(
+        """
+        UPDATE claves_idempotencia
+        SET respuesta = %s
+        WHERE clave = %s AND endpoint = %s;
+        """, (Json(respuesta), clave, endpoint)
+    )
+    db.commit()
+    _respuestas_cache.guardar((endpoint, clave), {"hash_cuerpo": hash_cuerpo, "respuesta": respuesta})
+
+    return respuesta
+
+
+@try_except_closeCursor
+def eliminar_claves_expiradas(db) -> dict:
+
+    cursor = db.cursor()
+    cursor.execute("DELETE FROM claves_idempotencia WHERE expira_en <= now();")
+    eliminadas = cursor.rowcount
+    db.commit()
+
+    return {"eliminadas": eliminadas}
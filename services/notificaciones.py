@@ -0,0 +1,276 @@
+import logging
+import os
+import threading
+import time
+from fastapi.encoders import jsonable_encoder
+from psycopg2.extras import Json
+from exception_handlers import try_except_closeCursor
+from utils.enviadores import Enviador, NotificacionDescartada, obtener_enviador
+from utils.helpers import fetchall_to_dict
+from utils.sentencias import ejecutar_preparada
+
+logger = logging.getLogger(__name__)
+
+# Notificaciones tomadas por transacción del despachador
+TAMANO_LOTE_NOTIFICACIONES = int(os.getenv("TAMANO_LOTE_NOTIFICACIONES", "50"))
+
+# Reintentos con espera exponencial: base * 2^intentos, hasta el máximo
+MAX_INTENTOS_NOTIFICACION = int(os.getenv("MAX_INTENTOS_NOTIFICACION", "8"))
+ESPERA_BASE_REINTENTO_SEGUNDOS = int(os.getenv("ESPERA_BASE_REINTENTO_SEGUNDOS", "30"))
+ESPERA_MAXIMA_REINTENTO_SEGUNDOS = int(os.getenv("ESPERA_MAXIMA_REINTENTO_SEGUNDOS", "3600"))
+
+# Tiempo máximo por corrida del despachador y espera entre corridas del hilo
+TIEMPO_MAXIMO_DESPACHO_SEGUNDOS = int(os.getenv("TIEMPO_MAXIMO_DESPACHO_SEGUNDOS", "50"))
+INTERVALO_DESPACHO_SEGUNDOS = int(os.getenv("INTERVALO_DESPACHO_SEGUNDOS", "5"))
+
+_estado = {
+    "enviadas": 0,
+    "reintentos": 0,
+    "descartadas": 0,
+    "fallidas": 0,
+    "por_segundo": None,
+    "demora_ultima_ms": None,
+    "demora_max_ms": 0.0,
+    "ultima_corrida": None,
+}
+
+
+def registrar_notificacion(cursor, tipo: str, turno: dict, datos: dict = None, clave: str = None):
+    """
+    Agrega la notificación al outbox con el cursor de la transacción del turno: se
+    envía solo si esa transacción se confirma, y el envío no demora la respuesta.
+    """
+    ejecutar_preparada(cursor,
+        """
+        INSERT INTO notificaciones_salientes (tipo, clave, turno_id, usuario_id, datos)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (clave) DO NOTHING;
+        """, (tipo, clave, str(turno["id"]), str(turno["usuario_id"]), Json(jsonable_encoder(datos or turno)))
+    )
+
+
+def estadisticas_notificaciones() -> dict:
+    return {
+        "enviadas": _estado["enviadas"],
+        "reintentos": _estado["reintentos"],
+        "descartadas": _estado["descartadas"],
+        "fallidas": _estado["fallidas"],
+        "por_segundo": _estado["por_segundo"],
+        "demora_ultima_ms": _estado["demora_ultima_ms"],
+        "demora_max_ms": round(_estado["demora_max_ms"], 2),
+        "ultima_corrida": _estado["ultima_corrida"],
+    }
+
+
+def _espera_reintento(intentos: int) -> int:
+    return min(ESPERA_BASE_REINTENTO_SEGUNDOS * 2 ** (intentos - 1), ESPERA_MAXIMA_REINTENTO_SEGUNDOS)
+
+
+def _despachar_lote(db, cursor, enviador: Enviador) -> dict:
+    # Las filas tomadas quedan bloqueadas hasta el commit: otras instancias las saltean
+    cursor.execute(
+        """
+        WITH lote AS (
+            SELECT id
+            FROM notificaciones_salientes
+            WHERE estado = 'pendiente'
+                AND disponible_en <= now()
+            ORDER BY disponible_en
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        SELECT
+            n.id, n.tipo, n.turno_id, n.datos, n.intentos,
+            extract(epoch FROM now() - n.creada_en) * 1000 AS demora_ms,
+            t.estado AS estado_turno,
+            u.nombre AS nombre_usuario, u.email, u.telefono,
+            e.nombre AS nombre_empleado,
+            s.nombre AS servicio
+        FROM notificaciones_salientes n
+        JOIN lote USING (id)
+        LEFT JOIN turnos t ON t.id = n.turno_id AND t.fecha = (n.datos->>'fecha')::date
+        LEFT JOIN usuarios u ON u.id = n.usuario_id
+        LEFT JOIN empleados e ON e.id = (n.datos->>'empleado_id')::uuid
+        LEFT JOIN servicios s ON s.id = (n.datos->>'servicio_id')::uuid
+        ORDER BY n.id;
+        """, (TAMANO_LOTE_NOTIFICACIONES,)
+    )
+    notificaciones = fetchall_to_dict(cursor)
+    if not notificaciones:
+        db.commit()
+        return {"tomadas": 0}
+
+    # Un recordatorio de un turno que ya no está confirmado no se envía
+    errores = {}
+    a_enviar = []
+    for notificacion in notificaciones:
+        if notificacion["tipo"] == "recordatorio" and notificacion["estado_turno"] != "confirmado":
+            errores[notificacion["id"]] = NotificacionDescartada("El turno ya no está confirmado")
+        else:
+            a_enviar.append(notificacion)
+    if a_enviar:
+        try:
+            errores.update(enviador.enviar_lote(a_enviar))
+        except Exception as e:
+            logger.exception("Falló el envío del lote de notificaciones")
+            errores.update({notificacion["id"]: e for notificacion in a_enviar})
+
+    enviadas = [n for n in notificaciones if n["id"] not in errores]
+    descartadas = [n for n in notificaciones if isinstance(errores.get(n["id"]), NotificacionDescartada)]
+    reintentos = [n for n in notificaciones if n["id"] in errores and n not in descartadas]
+
+    if enviadas:
+        cursor.execute(
+            """
+            UPDATE notificaciones_salientes
+            SET estado = 'enviada', enviada_en = now(), intentos = intentos + 1, ultimo_error = NULL
+            WHERE id = ANY(%s);
+            """, ([n["id"] for n in enviadas],)
+        )
+    if descartadas:
+        cursor.execute(
+            """
+            UPDATE notificaciones_salientes n
+            SET estado = 'descartada', ultimo_error = d.error
+            FROM unnest(%s::bigint[], %s::text[]) AS d(id, error)
+            WHERE n.id = d.id;
+            """, ([n["id"] for n in descartadas], [str(errores[n["id"]]) for n in descartadas])
+        )
+    if reintentos:
+        cursor.execute(
+            """
+            UPDATE notificaciones_salientes n
+            SET intentos = n.intentos + 1,
+                estado = CASE WHEN n.intentos + 1 >= %s THEN 'fallida' ELSE 'pendiente' END,
+                disponible_en = now() + make_interval(secs => r.espera),
+                ultimo_error = r.error
+            FROM unnest(%s::bigint[], %s::int[], %s::text[]) AS r(id, espera, error)
+            WHERE n.id = r.id;
+            """, (
+                MAX_INTENTOS_NOTIFICACION,
+                [n["id"] for n in reintentos],
+                [_espera_reintento(n["intentos"] + 1) for n in reintentos],
+                [str(errores[n["id"]]) for n in reintentos]
+            )
+        )
+    db.commit()
+
+    demoras = [float(n["demora_ms"]) for n in enviadas]
+    return {
+        "tomadas": len(notificaciones),
+        "enviadas": len(enviadas),
+        "descartadas": len(descartadas),
+        "reintentos": len([n for n in reintentos if n["intentos"] + 1 < MAX_INTENTOS_NOTIFICACION]),
+        "fallidas": len([n for n in reintentos if n["intentos"] + 1 >= MAX_INTENTOS_NOTIFICACION]),
+        "demora_max_ms": max(demoras, default=None),
+    }
+
+
+@try_except_closeCursor
+def despachar_notificaciones(db, enviador: Enviador = None) -> dict:
+    """
+    Envía las notificaciones pendientes en lotes (FOR UPDATE SKIP LOCKED, así varias
+    instancias pueden despachar a la vez sin repetir) hasta vaciar la cola o pasar
+    TIEMPO_MAXIMO_DESPACHO_SEGUNDOS. Las que fallan se reintentan con espera
+    exponencial; las descartadas y las que agotan los intentos quedan registradas.
+    """
+    enviador = enviador or obtener_enviador()
+    inicio = time.monotonic()
+    cursor = db.cursor()
+    totales = {"lotes": 0, "enviadas": 0, "descartadas": 0, "reintentos": 0, "fallidas": 0}
+    demora_max_ms = None
+
+    while time.monotonic() - inicio < TIEMPO_MAXIMO_DESPACHO_SEGUNDOS:
+        lote = _despachar_lote(db, cursor, enviador)
+        if not lote["tomadas"]:
+            break
+        totales["lotes"] += 1
+        for clave in ("enviadas", "descartadas", "reintentos", "fallidas"):
+            totales[clave] += lote[clave]
+        if lote["demora_max_ms"] is not None:
+            demora_max_ms = max(demora_max_ms or 0.0, lote["demora_max_ms"])
+            _estado["demora_ultima_ms"] = round(lote["demora_max_ms"], 2)
+            _estado["demora_max_ms"] = max(_estado["demora_max_ms"], lote["demora_max_ms"])
+        if lote["tomadas"] < TAMANO_LOTE_NOTIFICACIONES:
+            break
+
+    # Atraso de la cola: lo que sigue pendiente y ya debería haberse enviado
+    cursor.execute(
+        """
+        SELECT count(*), extract(epoch FROM now() - min(creada_en))
+        FROM notificaciones_salientes
+        WHERE estado = 'pendiente'
+            AND disponible_en <= now();
+        """
+    )
+    pendientes, atraso_segundos = cursor.fetchone()
+    db.commit()
+
+    duracion = time.monotonic() - inicio
+    por_segundo = round(totales["enviadas"] / duracion, 2) if totales["enviadas"] else 0.0
+    for clave in ("enviadas", "descartadas", "reintentos", "fallidas"):
+        _estado[clave] += totales[clave]
+    if totales["lotes"]:
+        _estado["por_segundo"] = por_segundo
+    _estado["ultima_corrida"] = time.time()
+
+    return {
+        **totales,
+        "por_segundo": por_segundo,
+        "demora_max_ms": round(demora_max_ms, 2) if demora_max_ms is not None else None,
+        "pendientes": pendientes,
+        "atraso_pendientes_segundos": round(float(atraso_segundos), 1) if atraso_segundos is not None else None,
+        "duracion_ms": round(duracion * 1000)
+    }
+
+
+@try_except_closeCursor
+def encolar_recordatorios(db) -> dict:
+    """Agrega al outbox el recordatorio de cada turno confirmado de mañana (una vez por turno)."""
+    cursor = db.cursor()
+    cursor.execute(
+        """
+        INSERT INTO notificaciones_salientes (tipo, clave, turno_id, usuario_id, datos)
+        SELECT
+            'recordatorio',
+            'recordatorio:' || t.id,
+            t.id,
+            t.usuario_id,
+            jsonb_build_object(
+                'id', t.id, 'usuario_id', t.usuario_id, 'empleado_id', t.empleado_id,
+                'servicio_id', t.servicio_id, 'fecha', t.fecha, 'hora', t.hora, 'estado', t.estado
+            )
+        FROM turnos t
+        WHERE t.fecha = CURRENT_DATE + 1
+            AND t.estado = 'confirmado'
+        ON CONFLICT (clave) DO NOTHING;
+        """
+    )
+    encolados = cursor.rowcount
+    db.commit()
+    return {"recordatorios_encolados": encolados}
+
+
+def iniciar_despachador(conectar, enviador: Enviador) -> threading.Event:
+    """Lanza el hilo que despacha el outbox cada INTERVALO_DESPACHO_SEGUNDOS; devuelve el evento para detenerlo."""
+    detener = threading.Event()
+    hilo = threading.Thread(target=_despachar, args=(conectar, enviador, detener), name="despachador-notificaciones", daemon=True)
+    hilo.start()
+    return detener
+
+
+def _despachar(conectar, enviador: Enviador, detener: threading.Event):
+    db = None
+    while not detener.is_set():
+        try:
+            if db is None or db.closed:
+                db = conectar()
+            despachar_notificaciones(db, enviador)
+        except Exception:
+            logger.exception("Falló el despacho de notificaciones")
+            if db is not None and not db.closed:
+                db.close()
+            db = None
+        detener.wait(INTERVALO_DESPACHO_SEGUNDOS)
+    if db is not None and not db.closed:
+        db.close()
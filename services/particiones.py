@@ -0,0 +1,33 @@
+import os
+from exception_handlers import try_except_closeCursor
+
+# Meses hacia adelante con partición ya creada (horarios_disponibles y turnos)
+PARTICIONES_MESES_ADELANTE = int(os.getenv("PARTICIONES_MESES_ADELANTE", "3"))
+
+# Meses que horarios_disponibles mantiene adjuntos; las particiones más viejas se
+# separan (la compactación ya las vació). Las de turnos quedan siempre adjuntas: son
+# el historial que usan la exportación y los reportes
+RETENCION_HORARIOS_MESES = int(os.getenv("RETENCION_HORARIOS_MESES", "3"))
+
+
+def asegurar_particiones(cursor, meses_adelante: int = PARTICIONES_MESES_ADELANTE) -> int:
+    """Crea las particiones mensuales que falten hasta `meses_adelante`; devuelve cuántas creó."""
+    cursor.execute("SELECT asegurar_particiones(%s);", (meses_adelante,))
+    return cursor.fetchone()[0]
+
+
+@try_except_closeCursor
+def mantener_particiones(db) -> dict:
+    """
+    Crea las particiones futuras y separa (sin borrar) las de horarios_disponibles
+    que quedaron fuera de la retención, para que las consultas y los índices solo
+    cubran los meses vigentes.
+    """
+    cursor = db.cursor()
+    creadas = asegurar_particiones(cursor)
+
+    cursor.execute("SELECT separar_particiones_antiguas('horarios_disponibles', %s);", (RETENCION_HORARIOS_MESES,))
+    separadas = cursor.fetchone()[0]
+    db.commit()
+
+    return {"particiones_creadas": creadas, "particiones_separadas": separadas}
@@ -0,0 +1,159 @@
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+from uuid import UUID
+from exception_handlers import ValidationError, try_except_closeCursor
+from utils.helpers import fetchall_to_dict
+
+# Agrupación por período -> expresión sobre la fecha
+PERIODOS = {
+    "dia": "fecha",
+    "semana": "date_trunc('week', fecha)::date",
+    "mes": "date_trunc('month', fecha)::date",
+}
+
+# Días compactados: ocupacion_diaria / ingresos_diarios; el resto se calcula de las tablas vivas
+_CTE_HORARIOS = """
+    horarios AS (
+        SELECT fecha, empleado_id, horarios_totales - horarios_bloqueados AS ofrecidos, horarios_ocupados AS ocupados
+        FROM ocupacion_diaria
+        WHERE fecha BETWEEN %(desde)s AND %(hasta)s {filtro}
+        UNION ALL
+        SELECT h.fecha, h.empleado_id,
+            count(*) FILTER (WHERE h.disponible OR t.id IS NOT NULL),
+            count(t.id) FILTER (WHERE NOT h.disponible)
+        FROM horarios_disponibles h
+        LEFT JOIN turnos t
+            ON t.empleado_id = h.empleado_id
+            AND t.fecha = h.fecha
+            AND t.hora = h.hora
+            AND t.estado = 'confirmado'
+        WHERE h.fecha BETWEEN %(desde)s AND %(hasta)s {filtro_h}
+            AND NOT EXISTS (
+                SELECT 1 FROM ocupacion_diaria o
+                WHERE o.fecha = h.fecha AND o.empleado_id = h.empleado_id
+            )
+        GROUP BY h.fecha, h.empleado_id
+    )
+"""
+
+_CTE_VENTAS = """
+    ventas AS (
+        SELECT fecha, empleado_id, servicio_id, turnos, ingresos
+        FROM ingresos_diarios
+        WHERE fecha BETWEEN %(desde)s AND %(hasta)s {filtro}
+        UNION ALL
+        SELECT t.fecha, t.empleado_id, t.servicio_id, 1, s.precio
+        FROM turnos t
+        JOIN servicios s ON s.id = t.servicio_id
+        WHERE t.fecha BETWEEN %(desde)s AND %(hasta)s {filtro_t}
+            AND t.estado = 'confirmado'
+            AND NOT EXISTS (SELECT 1 FROM ingresos_diarios i WHERE i.fecha = t.fecha)
+    )
+"""
+
+
+@try_except_closeCursor
+def obtener_reporte(desde: date, hasta: date, agrupar_por: list, empleado_id: Optional[UUID], db) -> dict:
+    """
+    Ocupación (horarios ocupados sobre ofrecidos, sin contar los bloqueados) e
+    ingresos de los turnos confirmados entre `desde` y `hasta`, agrupados por
+    empleado, servicio y/o un período (dia, semana o mes), en una sola consulta.
+    Los horarios no pertenecen a un servicio: agrupando por servicio la ocupación
+    queda en null.
+    """
+    if desde > hasta:
+        raise ValidationError("La fecha desde debe ser anterior o igual a la fecha hasta")
+
+    agrupar_por = list(dict.fromkeys(agrupar_por))
+    periodos = [agrupacion for agrupacion in agrupar_por if agrupacion in PERIODOS]
+    if len(periodos) > 1:
+        raise ValidationError("Solo se puede agrupar por un período: dia, semana o mes")
+
+    claves = []  # (alias, expresión)
+    if periodos:
+        claves.append(("periodo", PERIODOS[periodos[0]]))
+    if "empleado" in agrupar_por:
+        claves.append(("empleado_id", "empleado_id"))
+    por_servicio = "servicio" in agrupar_por
+    if por_servicio:
+        claves.append(("servicio_id", "servicio_id"))
+
+    parametros = {"desde": desde, "hasta": hasta, "empleado_id": str(empleado_id) if empleado_id else None}
+    filtros = {"filtro": "", "filtro_h": "", "filtro_t": ""}
+    if empleado_id:
+        filtros = {
+            "filtro": "AND empleado_id = %(empleado_id)s",
+            "filtro_h": "AND h.empleado_id = %(empleado_id)s",
+            "filtro_t": "AND t.empleado_id = %(empleado_id)s",
+        }
+
+    columnas = "".join(f"{expresion} AS {alias}, " for alias, expresion in claves)
+    grupo = ("GROUP BY " + ", ".join(alias for alias, _ in claves)) if claves else ""
+    ingresos = f"""
+        ingresos AS (
+            SELECT {columnas}sum(turnos) AS turnos, sum(ingresos) AS ingresos
+            FROM ventas {grupo}
+        )
+    """
+
+    if por_servicio:
+        query = "WITH " + _CTE_VENTAS.format(filtro=filtros["filtro"], filtro_t=filtros["filtro_t"]) + "," + ingresos + """
+            , reporte AS (
+                SELECT i.*, NULL::bigint AS horarios_ofrecidos, NULL::bigint AS horarios_ocupados
+                FROM ingresos i
+            )
+        """
+    else:
+        union = " AND ".join(f"o.{alias} = i.{alias}" for alias, _ in claves)
+        seleccion = "".join(f"coalesce(o.{alias}, i.{alias}) AS {alias}, " for alias, _ in claves)
+        query = "WITH " + _CTE_HORARIOS.format(filtro=filtros["filtro"], filtro_h=filtros["filtro_h"]) + "," \
+            + _CTE_VENTAS.format(filtro=filtros["filtro"], filtro_t=filtros["filtro_t"]) + "," + ingresos + f"""
+            , ocupacion AS (
+                SELECT {columnas}sum(ofrecidos) AS horarios_ofrecidos, sum(ocupados) AS horarios_ocupados
+                FROM horarios {grupo}
+            ),
+            reporte AS (
+                SELECT {seleccion}i.turnos, i.ingresos, o.horarios_ofrecidos, o.horarios_ocupados
+                FROM ocupacion o
+                {"FULL JOIN ingresos i ON " + union if claves else "CROSS JOIN ingresos i"}
+            )
+        """
+
+    query += f"""
+        SELECT
+            {"".join(f"r.{alias}, " for alias, _ in claves)}
+            {"e.nombre AS nombre_empleado," if "empleado" in agrupar_por else ""}
+            {"s.nombre AS servicio," if por_servicio else ""}
+            coalesce(r.horarios_ofrecidos, 0) AS horarios_ofrecidos,
+            coalesce(r.horarios_ocupados, 0) AS horarios_ocupados,
+            round(100.0 * r.horarios_ocupados / nullif(r.horarios_ofrecidos, 0), 1)::float8 AS ocupacion_pct,
+            coalesce(r.turnos, 0) AS turnos,
+            coalesce(r.ingresos, 0) AS ingresos
+        FROM reporte r
+        {"LEFT JOIN empleados e ON e.id = r.empleado_id" if "empleado" in agrupar_por else ""}
+        {"LEFT JOIN servicios s ON s.id = r.servicio_id" if por_servicio else ""}
+        {("ORDER BY " + ", ".join(f"r.{alias}" for alias, _ in claves)) if claves else ""};
+    """
+
+    cursor = db.cursor()
+    cursor.execute("SET TRANSACTION READ ONLY;")
+    cursor.execute(query, parametros)
+    filas = fetchall_to_dict(cursor)
+    db.rollback()
+
+    if por_servicio:
+        for fila in filas:
+            fila["horarios_ofrecidos"] = fila["horarios_ocupados"] = None
+
+    ofrecidos = sum(fila["horarios_ofrecidos"] or 0 for fila in filas)
+    ocupados = sum(fila["horarios_ocupados"] or 0 for fila in filas)
+    totales = {
+        "horarios_ofrecidos": None if por_servicio else ofrecidos,
+        "horarios_ocupados": None if por_servicio else ocupados,
+        "ocupacion_pct": round(100 * ocupados / ofrecidos, 1) if ofrecidos and not por_servicio else None,
+        "turnos": sum(fila["turnos"] for fila in filas),
+        "ingresos": sum((fila["ingresos"] for fila in filas), Decimal(0)),
+    }
+
+    return {"desde": desde, "hasta": hasta, "agrupar_por": agrupar_por, "filas": filas, "totales": totales}
@@ -0,0 +1,151 @@
+import os
+import time
+from exception_handlers import try_except_closeCursor
+
+# Filas por DELETE: cada lote se confirma aparte para no sostener locks largos
+TAMANO_LOTE_RETENCION = int(os.getenv("TAMANO_LOTE_RETENCION", "2000"))
+
+# Tiempo máximo por corrida; lo que quede se sigue en la próxima
+TIEMPO_MAXIMO_RETENCION_SEGUNDOS = int(os.getenv("TIEMPO_MAXIMO_RETENCION_SEGUNDOS", "120"))
+
+# Días que se conservan las eliminaciones para GET /sincronizacion
+RETENCION_ELIMINACIONES_DIAS = int(os.getenv("RETENCION_ELIMINACIONES_DIAS", "30"))
+
+# Días que se conservan las notificaciones ya enviadas, descartadas o fallidas
+RETENCION_NOTIFICACIONES_DIAS = int(os.getenv("RETENCION_NOTIFICACIONES_DIAS", "30"))
+
+# Guardar el resumen diario de ocupación e ingresos antes de borrar los horarios de cada día
+RESUMEN_OCUPACION = os.getenv("RESUMEN_OCUPACION", "1") == "1"
+
+
+def _borrar_en_lotes(db, cursor, query: str, parametros: tuple, limite: float) -> tuple:
+    """Repite el DELETE por lotes hasta agotarlo o pasar `limite`; devuelve (borradas, terminado)."""
+    borradas = 0
+    while True:
+        cursor.execute(query, parametros + (TAMANO_LOTE_RETENCION,))
+        borradas += cursor.rowcount
+        db.commit()
+        if cursor.rowcount < TAMANO_LOTE_RETENCION:
+            return borradas, True
+        if time.monotonic() >= limite:
+            return borradas, False
+
+
+@try_except_closeCursor
+def compactar_horarios_pasados(db) -> dict:
+    """
+    Borra los horarios disponibles de días pasados, los bloqueos vencidos y las
+    eliminaciones y notificaciones fuera de retención, en lotes chicos. Antes de
+    borrar un día guarda su resumen en ocupacion_diaria e ingresos_diarios.
+    """
+    inicio = time.monotonic()
+    limite = inicio + TIEMPO_MAXIMO_RETENCION_SEGUNDOS
+    cursor = db.cursor()
+    # Los días pasados no se registran en eliminaciones (ver 008_ocupacion_diaria.sql)
+    cursor.execute("SELECT set_config('peluqueria.retencion', 'on', false);")
+    dias_resumidos = 0
+    horarios_eliminados = 0
+    terminado = True
+
+    cursor.execute("SELECT DISTINCT fecha FROM horarios_disponibles WHERE fecha < CURRENT_DATE ORDER BY fecha;")
+    fechas = [fila[0] for fila in cursor.fetchall()]
+    db.commit()
+
+    for fecha in fechas:
+        if RESUMEN_OCUPACION:
+            cursor.execute(
+                """
+                INSERT INTO ocupacion_diaria (fecha, empleado_id, horarios_totales, horarios_libres, horarios_ocupados, horarios_bloqueados)
+                SELECT
+                    h.fecha,
+                    h.empleado_id,
+                    count(*),
+                    count(*) FILTER (WHERE h.disponible),
+                    count(*) FILTER (WHERE NOT h.disponible AND t.id IS NOT NULL),
+                    count(*) FILTER (WHERE NOT h.disponible AND t.id IS NULL)
+                FROM horarios_disponibles h
+                LEFT JOIN turnos t
+                    ON t.empleado_id = h.empleado_id
+                    AND t.fecha = h.fecha
+                    AND t.hora = h.hora
+                    AND t.estado = 'confirmado'
+                WHERE h.fecha = %s
+                GROUP BY h.fecha, h.empleado_id
+                ON CONFLICT (fecha, empleado_id) DO NOTHING;
+                """, (fecha,)
+            )
+            dias_resumidos += 1 if cursor.rowcount else 0
+            cursor.execute(
+                """
+                INSERT INTO ingresos_diarios (fecha, empleado_id, servicio_id, turnos, ingresos)
+                SELECT t.fecha, t.empleado_id, t.servicio_id, count(*), coalesce(sum(s.precio), 0)
+                FROM turnos t
+                JOIN servicios s ON s.id = t.servicio_id
+                WHERE t.fecha = %s
+                    AND t.estado = 'confirmado'
+                GROUP BY t.fecha, t.empleado_id, t.servicio_id
+                ON CONFLICT (fecha, empleado_id, servicio_id) DO NOTHING;
+                """, (fecha,)
+            )
+            db.commit()
+
+        borradas, terminado = _borrar_en_lotes(
+            db, cursor,
+            """
+            DELETE FROM horarios_disponibles
+            WHERE fecha = %s
+                AND id IN (SELECT id FROM horarios_disponibles WHERE fecha = %s LIMIT %s);
+            """, (fecha, fecha), limite
+        )
+        horarios_eliminados += borradas
+        if not terminado:
+            break
+
+    bloqueos_eliminados = 0
+    if terminado:
+        bloqueos_eliminados, terminado = _borrar_en_lotes(
+            db, cursor,
+            """
+            DELETE FROM bloqueos_horarios
+            WHERE id IN (SELECT id FROM bloqueos_horarios WHERE fecha < CURRENT_DATE LIMIT %s);
+            """, (), limite
+        )
+
+    eliminaciones_depuradas = 0
+    if terminado:
+        eliminaciones_depuradas, terminado = _borrar_en_lotes(
+            db, cursor,
+            """
+            DELETE FROM eliminaciones
+            WHERE ctid IN (
+                SELECT ctid FROM eliminaciones
+                WHERE eliminado_en < now() - make_interval(days => %s)
+                LIMIT %s
+            );
+            """, (RETENCION_ELIMINACIONES_DIAS,), limite
+        )
+
+    notificaciones_depuradas = 0
+    if terminado:
+        notificaciones_depuradas, terminado = _borrar_en_lotes(
+            db, cursor,
+            """
+            DELETE FROM notificaciones_salientes
+            WHERE id IN (
+                SELECT id FROM notificaciones_salientes
+                WHERE estado <> 'pendiente'
+                    AND creada_en < now() - make_interval(days => %s)
+                LIMIT %s
+            );
+            """, (RETENCION_NOTIFICACIONES_DIAS,), limite
+        )
+
+    return {
+        "dias_resumidos": dias_resumidos,
+        "horarios_eliminados": horarios_eliminados,
+        "bloqueos_eliminados": bloqueos_eliminados,
+        "eliminaciones_depuradas": eliminaciones_depuradas,
+        "notificaciones_depuradas": notificaciones_depuradas,
+        "pendiente": not terminado,
+        "duracion_ms": round((time.monotonic() - inicio) * 1000)
+    }
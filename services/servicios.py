@@ -1,13 +1,21 @@
 from uuid import UUID
-from schemas import ServicioBase, ServicioUpdate
+from database import es_de_peticion
+from schemas import ServicioBase, ServicioUpdate, ServicioResponse
 from exception_handlers import AppException, NotFoundError, ValidationError, OperationError, try_except_closeCursor
+from services.eventos import escucha_activa, publicar_cambio, suscribir
+from utils.catalogo import CatalogoCache, EntradaCatalogo, ultima_modificacion_tabla
 from utils.helpers import fetchall_to_dict, fetchone_to_dict
+from utils.lotes import ordenar_por_ids, validar_ids_lote
+from utils.respuestas import proyectar
+
+catalogo_servicios = CatalogoCache(ttl_respaldo=300, sincronizado=escucha_activa)
+suscribir("servicios", lambda clave: catalogo_servicios.invalidar())
 
 @try_except_closeCursor
 def obtener_servicios(db) -> list:
 
     cursor = db.cursor()
-    cursor.execute("SELECT * FROM servicios;") # Where estado =...
+    cursor.execute("SELECT id, nombre, duracion_minutos, precio FROM servicios;") # Where estado =...
     servicios = fetchall_to_dict(cursor)
 
     if not servicios:
@@ -15,6 +23,30 @@ def obtener_servicios(db) -> list:
     
     return servicios
 
+def obtener_servicios_catalogo(conectar) -> EntradaCatalogo:
+    """Devuelve el catálogo cacheado; solo abre una conexión con `conectar` si no está cargado."""
+
+    def cargar():
+        db = conectar()
+        try:
+            ultima_modificacion = ultima_modificacion_tabla(db, "servicios")
+            return proyectar(obtener_servicios(db), ServicioResponse), ultima_modificacion
+        finally:
+            # La de get_db en una petición vuelve al pool con el middleware
+            if not es_de_peticion(db):
+                db.close()
+
+    return catalogo_servicios.obtener(cargar)
+
+def obtener_servicios_por_ids(ids: list, conectar) -> dict:
+    """Resuelve el lote desde el catálogo cacheado, sin consultar la base si ya está cargado."""
+    ids = validar_ids_lote(ids)
+    try:
+        servicios = obtener_servicios_catalogo(conectar).datos
+    except NotFoundError:
+        servicios = []
+    return ordenar_por_ids(servicios, ids)
+
 @try_except_closeCursor
 def crear_servicio(servicio: ServicioBase, db) -> dict:
 
@@ -23,11 +55,13 @@ def crear_servicio(servicio: ServicioBase, db) -> dict:
         """
         INSERT INTO servicios (nombre, duracion_minutos, precio)
         VALUES (%s, %s, %s)
-        RETURNING *;
+        RETURNING id, nombre, duracion_minutos, precio;
         """, (servicio.nombre, servicio.duracion_minutos, servicio.precio)
     )
     nuevo_servicio = fetchone_to_dict(cursor)
+    publicar_cambio(cursor, "servicios")
     db.commit()
+    catalogo_servicios.invalidar()
 
     if not nuevo_servicio:
         raise OperationError("Error al crear el nuevo servicio")
@@ -39,7 +73,7 @@ def crear_servicio(servicio: ServicioBase, db) -> dict:
 def actualizar_servicio(servicio_id: UUID, servicio: ServicioUpdate, db) -> dict:
         
     cursor = db.cursor()
-    cursor.execute("SELECT * FROM servicios WHERE id = %s;", (str(servicio_id),))
+    cursor.execute("SELECT id, nombre, duracion_minutos, precio FROM servicios WHERE id = %s;", (str(servicio_id),))
     servicio_anterior = fetchone_to_dict(cursor)
     if not servicio_anterior:
         raise NotFoundError(f"No se encontró al servicio con id {servicio_id}")
@@ -57,7 +91,7 @@ def actualizar_servicio(servicio_id: UUID, servicio: ServicioUpdate, db) -> dict
         UPDATE servicios
         SET nombre = %s, duracion_minutos = %s, precio = %s
         WHERE id = %s
-        RETURNING *;
+        RETURNING id, nombre, duracion_minutos, precio;
         """, (servicio.nombre, servicio.duracion_minutos, servicio.precio, str(servicio_id))
     )
     servicio_actualizado = fetchone_to_dict(cursor)
@@ -65,7 +99,9 @@ def actualizar_servicio(servicio_id: UUID, servicio: ServicioUpdate, db) -> dict
     if not servicio_actualizado:
         raise OperationError(f"Error al actualizar el servicio con id {servicio_id}")
     
+    publicar_cambio(cursor, "servicios")
     db.commit()
+    catalogo_servicios.invalidar()
     return servicio_actualizado
 
 
@@ -79,7 +115,9 @@ def eliminar_servicio(servicio_id: UUID, db) -> dict:
     if filas_afectadas == 0:
         raise NotFoundError("Servicio no encontrado")
     
+    publicar_cambio(cursor, "servicios")
     db.commit()
+    catalogo_servicios.invalidar()
 
     return {"mensaje": "Servicio eliminado correctamente"}
 
@@ -88,7 +126,7 @@ def eliminar_servicio(servicio_id: UUID, db) -> dict:
 def obtener_servicio_by_id(servicio_id: UUID, db) -> dict:
 
     cursor = db.cursor()
-    cursor.execute("SELECT * FROM servicios WHERE id = %s;", (str(servicio_id),))
+    cursor.execute("SELECT id, nombre, duracion_minutos, precio FROM servicios WHERE id = %s;", (str(servicio_id),))
     servicio = fetchone_to_dict(cursor)
 
     if not servicio:
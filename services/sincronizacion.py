@@ -0,0 +1,72 @@
+import os
+from datetime import date, datetime
+from typing import Optional
+from exception_handlers import ValidationError, try_except_closeCursor
+from services.retencion import RETENCION_ELIMINACIONES_DIAS
+from utils.helpers import fetchall_to_dict
+
+# La marca devuelta se atrasa este margen: una transacción que empezó antes pero
+# confirmó después de la consulta queda dentro de la siguiente sincronización.
+# Por eso una fila puede llegar dos veces; el cliente la aplica como upsert.
+MARGEN_SINCRONIZACION_SEGUNDOS = int(os.getenv("MARGEN_SINCRONIZACION_SEGUNDOS", "60"))
+
+# tabla -> (columnas, se filtra por fecha)
+TABLAS_SINCRONIZACION = {
+    "turnos": ("id, usuario_id, empleado_id, servicio_id, fecha, hora, estado, updated_at", True),
+    "horarios_disponibles": ("id, empleado_id, fecha, hora, disponible, updated_at", True),
+    "bloqueos_horarios": ("id, empleado_id, fecha, hora_inicio, hora_fin, updated_at", True),
+    "empleados": ("id, nombre, especialidad, updated_at", False),
+    "servicios": ("id, nombre, duracion_minutos, precio, updated_at", False),
+}
+
+
+@try_except_closeCursor
+def obtener_cambios(desde: Optional[datetime], fecha: Optional[date], db) -> dict:
+    """
+    Filas modificadas después de `desde` (la marca de la sincronización anterior) y
+    las eliminadas en ese lapso. Sin `desde` devuelve la carga completa de la fecha.
+    Los turnos cancelados llegan como filas con estado 'cancelado'.
+    """
+    if desde is None and fecha is None:
+        raise ValidationError("Debe indicar desde (marca de la sincronización anterior) o una fecha para la carga inicial")
+
+    cursor = db.cursor()
+    # Todas las lecturas sobre la misma foto de la base
+    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY;")
+    cursor.execute(
+        "SELECT now() - make_interval(secs => %s), %s::timestamptz < now() - make_interval(days => %s);",
+        (MARGEN_SINCRONIZACION_SEGUNDOS, desde, RETENCION_ELIMINACIONES_DIAS)
+    )
+    marca, marca_vencida = cursor.fetchone()
+    if marca_vencida:
+        db.rollback()
+        raise ValidationError(f"La marca es anterior a {RETENCION_ELIMINACIONES_DIAS} días; hay que hacer una carga completa con fecha")
+
+    cambios = {"desde": desde, "marca": marca}
+    for tabla, (columnas, por_fecha) in TABLAS_SINCRONIZACION.items():
+        filtros = []
+        parametros = ()
+        if desde:
+            filtros.append("updated_at > %s")
+            parametros += (desde,)
+        if fecha and por_fecha:
+            filtros.append("fecha = %s")
+            parametros += (fecha,)
+
+        query = f"SELECT {columnas} FROM {tabla}"
+        if filtros:
+            query += " WHERE " + " AND ".join(filtros)
+        cursor.execute(query + " ORDER BY updated_at;", parametros)
+        cambios[tabla] = fetchall_to_dict(cursor)
+
+    if desde:
+        cursor.execute(
+            "SELECT tabla, id FROM eliminaciones WHERE eliminado_en > %s ORDER BY eliminado_en;",
+            (desde,)
+        )
+        cambios["eliminados"] = fetchall_to_dict(cursor)
+    else:
+        cambios["eliminados"] = []
+
+    db.rollback()  # solo lectura: cierra la transacción
+    return cambios
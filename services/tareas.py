@@ -0,0 +1,143 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from fastapi.encoders import jsonable_encoder
+from psycopg2.extras import Json
+from exception_handlers import ConflictError, NotFoundError, try_except_closeCursor
+from services.horarios import generacion_horarios_semanales
+from services.idempotencia import eliminar_claves_expiradas
+from services.notificaciones import despachar_notificaciones, encolar_recordatorios
+from services.particiones import mantener_particiones
+from services.retencion import compactar_horarios_pasados
+from utils.cron import coincide
+from utils.helpers import fetchall_to_dict, fetchone_to_dict
+
+logger = logging.getLogger(__name__)
+
+# nombre -> (expresión cron en UTC, función que recibe la conexión y devuelve los conteos).
+# Sin cron la tarea solo corre a pedido (POST /tareas/{nombre} o handler_tareas).
+TAREAS = {
+    "generar_horarios": (os.getenv("CRON_GENERAR_HORARIOS", "0 6 * * *"), generacion_horarios_semanales),
+    "limpiar_claves_idempotencia": (os.getenv("CRON_LIMPIAR_CLAVES", "15 * * * *"), eliminar_claves_expiradas),
+    "mantener_particiones": (os.getenv("CRON_MANTENER_PARTICIONES", "30 5 * * *"), mantener_particiones),
+    "compactar_horarios": (os.getenv("CRON_COMPACTAR_HORARIOS", "0 5 * * *"), compactar_horarios_pasados),
+    "encolar_recordatorios": (os.getenv("CRON_RECORDATORIOS", "0 12 * * *"), encolar_recordatorios),
+    # En uvicorn la despacha el hilo de main.py; en Lambda, una regla de EventBridge por minuto
+    "despachar_notificaciones": (os.getenv("CRON_DESPACHAR_NOTIFICACIONES"), despachar_notificaciones),
+}
+
+# Plazo de cada consulta de una tarea y espera máxima de sus locks, en milisegundos
+PLAZO_TAREAS_SENTENCIA_MS = int(os.getenv("PLAZO_TAREAS_SENTENCIA_MS", "300000"))
+PLAZO_TAREAS_BLOQUEO_MS = int(os.getenv("PLAZO_TAREAS_BLOQUEO_MS", "10000"))
+
+
+def ejecutar_tarea(nombre: str, conectar, programada_para: datetime = None) -> dict:
+    """
+    Corre la tarea si ninguna otra instancia la está corriendo (advisory lock de
+    sesión en una conexión aparte) y la registra en ejecuciones_tareas. Con
+    `programada_para` se ejecuta a lo sumo una vez por ese horario.
+    """
+    if nombre not in TAREAS:
+        raise NotFoundError(f"No existe la tarea {nombre}")
+    _, funcion = TAREAS[nombre]
+
+    candado = conectar()
+    try:
+        candado.set_session(autocommit=True)
+        cursor = candado.cursor()
+        cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s));", (f"tarea:{nombre}",))
+        if not cursor.fetchone()[0]:
+            raise ConflictError(f"La tarea {nombre} ya se está ejecutando")
+
+        cursor.execute(
+            """
+            INSERT INTO ejecuciones_tareas (tarea, programada_para)
+            VALUES (%s, %s)
+            ON CONFLICT (tarea, programada_para) DO NOTHING
+            RETURNING id;
+            """, (nombre, programada_para)
+        )
+        ejecucion = fetchone_to_dict(cursor)
+        if not ejecucion:
+            return {"tarea": nombre, "estado": "omitida", "programada_para": programada_para}
+
+        inicio = time.perf_counter()
+        db = conectar()
+        try:
+            cursor_tarea = db.cursor()
+            cursor_tarea.execute(
+                "SELECT set_config('statement_timeout', %s, false), set_config('lock_timeout', %s, false);",
+                (f"{PLAZO_TAREAS_SENTENCIA_MS}ms", f"{PLAZO_TAREAS_BLOQUEO_MS}ms")
+            )
+            db.commit()
+            resultado = funcion(db)
+            estado, error = "ok", None
+        except Exception as e:
+            resultado, estado, error = None, "error", e
+        finally:
+            db.close()
+        duracion_ms = round((time.perf_counter() - inicio) * 1000)
+
+        cursor.execute(
+            """
+            UPDATE ejecuciones_tareas
+            SET duracion_ms = %s, estado = %s, resultado = %s, error = %s
+            WHERE id = %s;
+            """, (duracion_ms, estado, Json(jsonable_encoder(resultado)), str(error) if error else None, ejecucion["id"])
+        )
+        if error:
+            raise error
+
+        return {"tarea": nombre, "estado": estado, "duracion_ms": duracion_ms, "resultado": resultado}
+    finally:
+        candado.close()  # cerrar la sesión libera el advisory lock
+
+
+def ejecutar_pendientes(momento: datetime, conectar) -> list:
+    """Corre las tareas cuyo cron coincide con `momento` (UTC, redondeado al minuto)."""
+    momento = momento.astimezone(timezone.utc).replace(second=0, microsecond=0)
+    resultados = []
+    for nombre, (cron, _) in TAREAS.items():
+        if not cron or not coincide(cron, momento):
+            continue
+        try:
+            resultados.append(ejecutar_tarea(nombre, conectar, programada_para=momento))
+        except ConflictError:
+            logger.info("La tarea %s ya se está ejecutando en otra instancia", nombre)
+        except Exception:
+            logger.exception("Falló la tarea programada %s", nombre)
+    return resultados
+
+
+def iniciar_programador(conectar) -> threading.Event:
+    """Lanza el hilo que revisa el cron de las tareas cada minuto; devuelve el evento para detenerlo."""
+    detener = threading.Event()
+    hilo = threading.Thread(target=_programar, args=(conectar, detener), name="programador-tareas", daemon=True)
+    hilo.start()
+    return detener
+
+
+def _programar(conectar, detener: threading.Event):
+    while True:
+        ahora = datetime.now(timezone.utc)
+        if detener.wait(60 - ahora.second - ahora.microsecond / 1_000_000):
+            break
+        ejecutar_pendientes(datetime.now(timezone.utc), conectar)
+
+
+@try_except_closeCursor
+def obtener_ejecuciones(tarea: str, limite: int, db) -> list:
+
+    cursor = db.cursor()
+    query = """
+        SELECT id, tarea, programada_para, iniciada_en, duracion_ms, estado, resultado, error
+        FROM ejecuciones_tareas
+        """
+    parametros = ()
+    if tarea:
+        query += " WHERE tarea = %s"
+        parametros += (tarea,)
+    cursor.execute(query + " ORDER BY iniciada_en DESC LIMIT %s;", parametros + (limite,))
+    return fetchall_to_dict(cursor)
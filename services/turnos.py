@@ -1,12 +1,21 @@
+import csv
+import io
+import json
 from datetime import date
 from uuid import UUID
-from typing import Optional
+from typing import Iterator, Optional
 from schemas import TurnoBase
 from exception_handlers import transactional, NotFoundError, ValidationError, OperationError, AppException, try_except_closeCursor
+from services.eventos import publicar_cambio
+from services.notificaciones import registrar_notificacion
+from utils.campos import columnas_sql
 from utils.helpers import fetchall_to_dict, fetchone_to_dict
+from utils.lotes import ordenar_por_ids, validar_ids_lote
+from utils.paginacion import TAMANO_PAGINA_DEFECTO, decodificar_cursor, paginar, validar_limite
+from utils.sentencias import ejecutar_preparada
 
 @transactional
-def crear_turno(turno: TurnoBase, db) -> dict:
+def crear_turno(turno: TurnoBase, db, notificar: bool = True) -> dict:
   
     cursor = db.cursor()
 
@@ -15,22 +24,22 @@ def crear_turno(turno: TurnoBase, db) -> dict:
         raise ValidationError("La fecha del turno no puede ser menor a la actual")
 
     # Verificar existencia de usuario, empleado y servicio
-    cursor.execute("SELECT id FROM usuarios WHERE id = %s", (str(turno.usuario_id),))
+    ejecutar_preparada(cursor, "SELECT id FROM usuarios WHERE id = %s", (str(turno.usuario_id),))
     if not fetchone_to_dict(cursor):
         raise NotFoundError("Usuario no encontrado")
 
-    cursor.execute("SELECT id FROM empleados WHERE id = %s", (str(turno.empleado_id),))
+    ejecutar_preparada(cursor, "SELECT id FROM empleados WHERE id = %s", (str(turno.empleado_id),))
     if not fetchone_to_dict(cursor):
         raise NotFoundError("Empleado no encontrado")
 
-    cursor.execute("SELECT id FROM servicios WHERE id = %s", (str(turno.servicio_id),))
+    ejecutar_preparada(cursor, "SELECT id FROM servicios WHERE id = %s", (str(turno.servicio_id),))
     if not fetchone_to_dict(cursor):
         raise NotFoundError("Servicio no encontrado") 
 
     # Verificar disponibilidad del horario
-    cursor.execute(
+    ejecutar_preparada(cursor,
         """
-        SELECT * FROM horarios_disponibles 
+        SELECT id FROM horarios_disponibles 
         WHERE fecha = %s 
             AND hora = %s 
             AND empleado_id = %s 
@@ -43,7 +52,7 @@ def crear_turno(turno: TurnoBase, db) -> dict:
         raise ValidationError("El horario seleccionado no está disponible")
 
     # Insertar el nuevo turno
-    cursor.execute(
+    ejecutar_preparada(cursor,
         """
         INSERT INTO turnos (usuario_id, empleado_id, servicio_id, fecha, hora, estado)
         VALUES (%s, %s, %s, %s, %s, 'confirmado')
@@ -55,7 +64,7 @@ def crear_turno(turno: TurnoBase, db) -> dict:
         raise OperationError("Error al crear el turno")
     
     # Actualizar el horario a no disponible
-    cursor.execute(
+    ejecutar_preparada(cursor,
         """
         UPDATE horarios_disponibles 
         SET disponible = FALSE 
@@ -68,55 +77,75 @@ def crear_turno(turno: TurnoBase, db) -> dict:
     horario_actualizado = fetchone_to_dict(cursor)
     if not horario_actualizado:
         raise OperationError("No se pudo reservar el horario seleccionado")
-    
+
+    publicar_cambio(cursor, "horarios", {
+        "fecha": turno.fecha,
+        "empleado_id": turno.empleado_id,
+        "horas": [turno.hora],
+        "disponible": False
+    })
+
+    if notificar:
+        registrar_notificacion(cursor, "confirmacion", nuevo_turno)
+
     return nuevo_turno
 
 
+# Expresión SQL de cada campo que se puede pedir con `fields` en los listados
+COLUMNAS_DISPONIBLES = {
+    "fecha": "horarios_disponibles.fecha",
+    "hora": "horarios_disponibles.hora",
+    "empleado_id": "horarios_disponibles.empleado_id",
+    "nombre_empleado": "e.nombre",
+    "id_reserva": "horarios_disponibles.id",
+    "disponible": "horarios_disponibles.disponible",
+}
+
+COLUMNAS_TURNO = {
+    "id": "id",
+    "usuario_id": "usuario_id",
+    "empleado_id": "empleado_id",
+    "servicio_id": "servicio_id",
+    "fecha": "fecha",
+    "hora": "hora",
+    "estado": "estado",
+}
+
+COLUMNAS_AGENDADOS = {
+    "turno_id": "turnos.id",
+    "usuario_id": "turnos.usuario_id",
+    "telefono": "u.telefono",
+    "email": "u.email",
+    "fecha": "turnos.fecha",
+    "hora": "turnos.hora",
+    "nombre_usuario": "u.nombre",
+    "servicio": "s.nombre",
+    "nombre_empleado": "e.nombre",
+}
+
+
 @try_except_closeCursor
-def obtener_turnos_disponibles(fecha: date, empleado_id: Optional[UUID], db) -> list:
+def obtener_turnos_disponibles(fecha: date, empleado_id: Optional[UUID], db, campos: tuple = None) -> list:
         
     if fecha < date.today():
         raise ValidationError("No se pueden consultar fechas pasadas")
 
     cursor = db.cursor()
+    query = f"""
+        SELECT {columnas_sql(campos or tuple(COLUMNAS_DISPONIBLES), COLUMNAS_DISPONIBLES)}
+        FROM horarios_disponibles
+        INNER JOIN empleados e ON horarios_disponibles.empleado_id = e.id
+        WHERE horarios_disponibles.disponible = TRUE
+            AND horarios_disponibles.fecha = %s
+        """
 
     if empleado_id:
-        cursor.execute(
-            """
-            SELECT 
-                fecha,
-                hora,
-                empleado_id,
-                e.nombre as nombre_empleado,
-                horarios_disponibles.id as id_reserva,
-                disponible
-            FROM horarios_disponibles
-            INNER JOIN empleados e ON horarios_disponibles.empleado_id = e.id
-            WHERE 
-                empleado_id = %s
-                AND disponible = TRUE 
-                AND fecha = %s;
-            """, (str(empleado_id), fecha)
-        )
+        ejecutar_preparada(cursor, query + " AND horarios_disponibles.empleado_id = %s ORDER BY horarios_disponibles.hora;", (fecha, str(empleado_id)))
         turnos = fetchall_to_dict(cursor)
         if not turnos:
             raise NotFoundError(f"No se encontraron turnos disponibles para el {fecha} con este empleado")
     else:
-        cursor.execute(
-            """
-            SELECT 
-                fecha,
-                hora,
-                empleado_id,
-                e.nombre as nombre_empleado,
-                horarios_disponibles.id as id_reserva,
-                disponible
-            FROM horarios_disponibles
-            INNER JOIN empleados e ON horarios_disponibles.empleado_id = e.id
-            WHERE disponible = TRUE 
-                AND fecha = %s;
-            """, (fecha,)
-        )
+        ejecutar_preparada(cursor, query + " ORDER BY horarios_disponibles.empleado_id, horarios_disponibles.hora;", (fecha,))
         turnos = fetchall_to_dict(cursor)
         if not turnos:
             raise NotFoundError(f"No se encontraron turnos disponibles para el {fecha}")
@@ -124,24 +153,69 @@ def obtener_turnos_disponibles(fecha: date, empleado_id: Optional[UUID], db) ->
     return turnos
 
 
+def obtener_turnos_disponibles_columnas(fecha: date, empleado_id: Optional[UUID], db) -> dict:
+    """
+    Forma compacta (columnar) de los turnos disponibles: un objeto por empleado con
+    las horas y los id de reserva en arreglos paralelos, sin repetir nombres de campo.
+    """
+    turnos = obtener_turnos_disponibles(fecha, empleado_id, db, ("hora", "empleado_id", "nombre_empleado", "id_reserva"))
+    empleados = {}
+    for turno in turnos:
+        grupo = empleados.get(turno["empleado_id"])
+        if grupo is None:
+            grupo = empleados[turno["empleado_id"]] = {
+                "empleado_id": turno["empleado_id"],
+                "nombre_empleado": turno["nombre_empleado"],
+                "horas": [],
+                "id_reserva": []
+            }
+        grupo["horas"].append(turno["hora"])
+        grupo["id_reserva"].append(turno["id_reserva"])
+    return {"fecha": fecha, "empleados": list(empleados.values())}
+
+
+def _condicion_por_id(turno_id: UUID, fecha: Optional[date]) -> tuple:
+    """WHERE por id; con la fecha la consulta va a una sola partición mensual de turnos."""
+    if fecha is None:
+        return "id = %s", (str(turno_id),)
+    return "id = %s AND fecha = %s", (str(turno_id), fecha)
+
+
 @try_except_closeCursor
-def obtener_turno(turno_id: UUID, db) -> dict:
+def obtener_turno(turno_id: UUID, db, fecha: Optional[date] = None) -> dict:
 
     cursor = db.cursor()
-    cursor.execute("SELECT * FROM turnos WHERE id = %s", (str(turno_id),))
+    condicion, parametros = _condicion_por_id(turno_id, fecha)
+    cursor.execute(f"SELECT id, usuario_id, empleado_id, servicio_id, fecha, hora, estado FROM turnos WHERE {condicion}", parametros)
     turno = fetchone_to_dict(cursor)    
     if not turno:
         raise NotFoundError("Turno no encontrado")
     return turno
 
 
+@try_except_closeCursor
+def obtener_turnos_por_ids(ids: list, db) -> dict:
+
+    ids = validar_ids_lote(ids)
+    cursor = db.cursor()
+    cursor.execute(
+        """
+        SELECT id, usuario_id, empleado_id, servicio_id, fecha, hora, estado
+        FROM turnos
+        WHERE id = ANY(%s::uuid[]);
+        """, ([str(id) for id in ids],)
+    )
+    return ordenar_por_ids(fetchall_to_dict(cursor), ids)
+
+
 @transactional
-def cancelar_turno(turno_id: UUID, db) -> any:
+def cancelar_turno(turno_id: UUID, db, notificar: bool = True, fecha: Optional[date] = None) -> any:
 
     cursor = db.cursor()
 
     # Verificar si el turno existe y su estado
-    cursor.execute("SELECT * FROM turnos WHERE id = %s;", (str(turno_id),))
+    condicion, parametros = _condicion_por_id(turno_id, fecha)
+    cursor.execute(f"SELECT id, empleado_id, fecha, hora, estado FROM turnos WHERE {condicion};", parametros)
     turno = fetchone_to_dict(cursor)
     if not turno:
         raise NotFoundError("Turno no encontrado")
@@ -153,8 +227,10 @@ def cancelar_turno(turno_id: UUID, db) -> any:
         """
         UPDATE turnos
         SET estado = 'cancelado'
-        WHERE id = %s;
-        """, (str(turno_id),)
+        WHERE id = %s
+            AND fecha = %s
+        RETURNING id, usuario_id, empleado_id, servicio_id, fecha, hora, estado;
+        """, (str(turno_id), turno["fecha"])
     )
     deleted_turno = fetchone_to_dict(cursor)
     if not deleted_turno:
@@ -171,41 +247,58 @@ def cancelar_turno(turno_id: UUID, db) -> any:
         """, (turno["fecha"], turno["hora"], str(turno["empleado_id"]))
     )
 
+    publicar_cambio(cursor, "horarios", {
+        "fecha": turno["fecha"],
+        "empleado_id": turno["empleado_id"],
+        "horas": [turno["hora"]],
+        "disponible": True
+    })
+
+    if notificar:
+        registrar_notificacion(cursor, "cancelacion", deleted_turno)
+
     return deleted_turno
 
 
 @transactional
-def modificar_turno(turno_id: UUID, nuevo_turno: TurnoBase, db) -> dict:
+def modificar_turno(turno_id: UUID, nuevo_turno: TurnoBase, db, fecha: Optional[date] = None) -> dict:
 
     cursor = db.cursor()
 
     # Validar que el turno a editar exista y esté confirmado
+    condicion, parametros = _condicion_por_id(turno_id, fecha)
     cursor.execute(
-        """
+        f"""
         SELECT empleado_id, fecha, hora 
         FROM turnos 
-        WHERE id = %s
+        WHERE {condicion}
             AND estado = 'confirmado';
-        """, (str(turno_id),)
+        """, parametros
     )
     turno_anterior = fetchone_to_dict(cursor)
     if not turno_anterior:
         raise NotFoundError("Turno no encontrado")
 
-    # Crear el nuevo turno
-    nuevo_turno = crear_turno(nuevo_turno, db)
+    # Crear el nuevo turno y cancelar el anterior sin sus decoradores: todo queda en
+    # la transacción de modificar_turno, con una sola notificación
+    nuevo_turno = crear_turno.__wrapped__(nuevo_turno, db=db, notificar=False)
     if not nuevo_turno:
         raise OperationError("Error al asignar el nuevo turno")
 
     # Cancelar el turno anterior
-    cancelar_turno(turno_id, db)
+    cancelar_turno.__wrapped__(turno_id, db=db, notificar=False, fecha=turno_anterior["fecha"])
+
+    registrar_notificacion(cursor, "modificacion", nuevo_turno, {**nuevo_turno, "anterior": turno_anterior})
 
     return nuevo_turno
 
 
 @try_except_closeCursor
-def obtener_turnos_por_usuario(user_id: UUID, db) -> list:
-        
+def obtener_turnos_por_usuario(user_id: UUID, db, cursor_pagina: str = None, limite: int = TAMANO_PAGINA_DEFECTO, campos: tuple = None) -> dict:
+
+    validar_limite(limite)
+    desde = decodificar_cursor(cursor_pagina)
+
     cursor = db.cursor()
 
     # Verificar que el usuario exista
@@ -214,48 +307,143 @@ def obtener_turnos_por_usuario(user_id: UUID, db) -> list:
     if not usuario:
         raise NotFoundError("Usuario no encontrado")
     
-    # Obtener turnos del usuario
-    cursor.execute(
-        """
-        SELECT * FROM turnos 
+    # Obtener turnos del usuario (fecha, hora e id siempre, para el cursor de paginación)
+    campos = tuple(dict.fromkeys((campos or tuple(COLUMNAS_TURNO)) + ("fecha", "hora", "id")))
+    query = f"""
+        SELECT {columnas_sql(campos, COLUMNAS_TURNO)} FROM turnos 
         WHERE usuario_id = %s 
             AND fecha >= CURRENT_DATE
-            AND estado <> 'cancelado';
-        """, (str(user_id),)
-    )
+            AND estado <> 'cancelado'
+        """
+    parametros = (str(user_id),)
+
+    if desde:
+        query += " AND (fecha, hora, id) > (%s, %s, %s)"
+        parametros += (desde[0], desde[1], str(desde[2]))
+
+    query += " ORDER BY fecha, hora, id LIMIT %s;"
+    parametros += (limite + 1,)
+
+    cursor.execute(query, parametros)
     turnos = fetchall_to_dict(cursor)
-    if not turnos:
+    if not turnos and not desde:
         raise NotFoundError("No se encontraron turnos para este usuario")
 
-    return turnos
+    return paginar(turnos, limite)
 
 
 @try_except_closeCursor
-def obtener_turnos_agendados_por_fecha(fecha: date, db) -> list:
+def obtener_turnos_agendados_por_fecha(fecha: date, db, cursor_pagina: str = None, limite: int = TAMANO_PAGINA_DEFECTO, campos: tuple = None) -> dict:
     if fecha < date.today():
         raise ValidationError("No se pueden consultar fechas pasadas")
 
+    validar_limite(limite)
+    desde = decodificar_cursor(cursor_pagina)
+
+    # fecha, hora y turno_id siempre, para el cursor de paginación
+    campos = tuple(dict.fromkeys((campos or tuple(COLUMNAS_AGENDADOS)) + ("fecha", "hora", "turno_id")))
+
     cursor = db.cursor()
-    cursor.execute(
-        """
-        SELECT 
-            usuario_id, 
-            u.telefono,
-            u.email,
-            hora,
-            u.nombre as nombre_usuario,
-            s.nombre as servicio,
-            e.nombre as nombre_empleado
+    query = f"""
+        SELECT {columnas_sql(campos, COLUMNAS_AGENDADOS)}
         FROM turnos
         LEFT JOIN usuarios u ON turnos.usuario_id = u.id 
         LEFT JOIN servicios s ON turnos.servicio_id = s.id
         LEFT JOIN empleados e ON turnos.empleado_id = e.id
-        WHERE fecha = %s
-            AND estado = 'confirmado'
-        ORDER BY hora;
-        """, (fecha,)
-    )
+        WHERE turnos.fecha = %s
+            AND turnos.estado = 'confirmado'
+        """
+    parametros = (fecha,)
+
+    if desde:
+        query += " AND (turnos.fecha, turnos.hora, turnos.id) > (%s, %s, %s)"
+        parametros += (desde[0], desde[1], str(desde[2]))
+
+    query += " ORDER BY turnos.fecha, turnos.hora, turnos.id LIMIT %s;"
+    parametros += (limite + 1,)
+
+    cursor.execute(query, parametros)
     turnos = fetchall_to_dict(cursor)
-    if not turnos:
+    if not turnos and not desde:
         raise NotFoundError(f"No se encontraron turnos agendados para el {fecha}")
-    return turnos
+    return paginar(turnos, limite, campo_id="turno_id")
+
+
+TAMANO_LOTE_EXPORTACION = 2000
+
+COLUMNAS_EXPORTACION = [
+    "turno_id", "fecha", "hora", "estado",
+    "usuario_id", "nombre_usuario", "telefono", "email",
+    "servicio_id", "servicio", "precio", "duracion_minutos",
+    "empleado_id", "nombre_empleado",
+]
+
+
+def exportar_turnos(desde: date, hasta: date, formato: str, db) -> Iterator[str]:
+    """
+    Devuelve un generador con los turnos del rango en NDJSON o CSV. Usa un cursor
+    del lado del servidor y lee por lotes, así la memoria no depende de la cantidad de filas.
+    """
+    if desde > hasta:
+        raise ValidationError("La fecha desde no puede ser mayor a la fecha hasta")
+    if formato not in ("ndjson", "csv"):
+        raise ValidationError("El formato debe ser ndjson o csv")
+
+    return _generar_exportacion(desde, hasta, formato, db)
+
+
+def _generar_exportacion(desde: date, hasta: date, formato: str, db) -> Iterator[str]:
+    cursor = db.cursor(name="exportacion_turnos")
+    cursor.itersize = TAMANO_LOTE_EXPORTACION
+    try:
+        cursor.execute(
+            """
+            SELECT
+                turnos.id           as turno_id,
+                turnos.fecha        as fecha,
+                turnos.hora         as hora,
+                turnos.estado       as estado,
+                u.id                as usuario_id,
+                u.nombre            as nombre_usuario,
+                u.telefono          as telefono,
+                u.email             as email,
+                s.id                as servicio_id,
+                s.nombre            as servicio,
+                s.precio            as precio,
+                s.duracion_minutos  as duracion_minutos,
+                e.id                as empleado_id,
+                e.nombre            as nombre_empleado
+            FROM turnos
+            LEFT JOIN usuarios u ON turnos.usuario_id = u.id
+            LEFT JOIN servicios s ON turnos.servicio_id = s.id
+            LEFT JOIN empleados e ON turnos.empleado_id = e.id
+            WHERE turnos.fecha BETWEEN %s AND %s
+            ORDER BY turnos.fecha, turnos.hora, turnos.id;
+            """, (desde, hasta)
+        )
+
+        if formato == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(COLUMNAS_EXPORTACION)
+            yield buffer.getvalue()
+
+        while True:
+            filas = cursor.fetchmany(TAMANO_LOTE_EXPORTACION)
+            if not filas:
+                break
+
+            if formato == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(filas)
+                yield buffer.getvalue()
+            else:
+                yield "".join(
+                    json.dumps(dict(zip(COLUMNAS_EXPORTACION, fila)), default=str, ensure_ascii=False) + "\n"
+                    for fila in filas
+                )
+    finally:
+        cursor.close()
+        db.rollback()
+
@@ -1,78 +1,227 @@
+import re
 from uuid import UUID
 from schemas import UsuarioBase, UsuarioUpdate
-from exception_handlers import NotFoundError, ValidationError, OperationError, AppException, try_except_closeCursor
-from utils.helpers import fetchall_to_dict, fetchone_to_dict
+from exception_handlers import NotFoundError, ValidationError, OperationError, AppException, TIEMPOS_AGOTADOS, try_except_closeCursor
+from services.eventos import publicar_cambio, suscribir
+from utils.cache import CacheTTL
+from utils.campos import columnas_sql
+from utils.helpers import fetchall_to_dict, fetchone_to_dict, normalizar_email, normalizar_telefono
+from utils.lotes import ordenar_por_ids, validar_ids_lote
+from utils.paginacion import decodificar_cursor, paginar, validar_limite
+
+LIMITE_BUSQUEDA_MAX = 20
+
+# Expresión SQL de cada campo que se puede pedir con `fields` en los listados
+COLUMNAS_USUARIO = {
+    "id": "id",
+    "nombre": "nombre",
+    "telefono": "telefono",
+    "email": "email",
+}
+
+COLUMNAS_HISTORIAL = {
+    "turno_id": "turnos.id",
+    "fecha": "turnos.fecha",
+    "hora": "turnos.hora",
+    "usuario_id": "u.id",
+    "usuario": "u.nombre",
+    "empleado_id": "e.id",
+    "empleado": "e.nombre",
+    "servicio_id": "s.id",
+    "servicio": "s.nombre",
+}
+
+# Clientes consultados recientemente por id o teléfono (p. ej. desde la recepción)
+_usuarios_cache = CacheTTL(max_entradas=256, ttl_segundos=300)
+
+
+def _invalidar_usuario_cache(usuario: dict):
+    if usuario is None:
+        _usuarios_cache.limpiar()
+        return
+    _usuarios_cache.invalidar(("id", str(usuario["id"])))
+    _usuarios_cache.invalidar(("telefono", usuario["telefono"]))
+
+
+suscribir("usuarios", _invalidar_usuario_cache)
+
 
 @try_except_closeCursor
 def crear_usuario(usuario: UsuarioBase, db) -> dict:
-        
-    # Verificar que no exista un usuario con el mismo número de teléfono
+
+    # Igual que importar_usuarios_csv, para que la unicidad del email no dependa de mayúsculas
+    usuario.email = normalizar_email(usuario.email)  # None si no se provee email válido
+
+    usuario.telefono = normalizar_telefono(usuario.telefono)
+    if not usuario.telefono:
+        raise ValidationError("El número de teléfono no es válido")
+
+    # Crear el usuario apoyándose en las restricciones únicas de telefono y email.
+    # Si no se insertó, la consulta informa qué campo generó el conflicto.
     cursor = db.cursor()
     cursor.execute(
         """
-        SELECT * FROM usuarios 
-        WHERE telefono = %s;
-        """, (usuario.telefono,)
-    )
-    existe_telefono = fetchone_to_dict(cursor)
-    if existe_telefono:
-        raise ValidationError("Ya existe un usuario con ese número de teléfono")
-    
-    # Verificar que no exista un usuario con el mismo email
-    if usuario.email and usuario.email.strip() and usuario.email != "":
-        cursor.execute(
-            """
-            SELECT * FROM usuarios 
-            WHERE email = %s;
-            """, (usuario.email,)
+        WITH nuevo AS (
+            INSERT INTO usuarios (nombre, telefono, email)
+            VALUES (%s, %s, %s)
+            ON CONFLICT DO NOTHING
+            RETURNING id, nombre, telefono, email
         )
-        existe_mail = fetchone_to_dict(cursor)
-        if existe_mail:
-            raise ValidationError("Ya existe un usuario con ese email")
-    else:
-        usuario.email = None  # Se asigna None si no se provee email válido
-    
-    # Crear el usuario
-    cursor.execute(
-        """
-        INSERT INTO usuarios (nombre, telefono, email)
-        VALUES (%s, %s, %s)
-        RETURNING id, nombre, telefono, email;
-        """, (usuario.nombre, usuario.telefono, usuario.email)
+        SELECT id, nombre, telefono, email, NULL AS conflicto
+        FROM nuevo
+        UNION ALL
+        SELECT NULL, NULL, NULL, NULL,
+            CASE
+                WHEN EXISTS (SELECT 1 FROM usuarios WHERE telefono = %s) THEN 'telefono'
+                WHEN EXISTS (SELECT 1 FROM usuarios WHERE email = %s) THEN 'email'
+            END
+        WHERE NOT EXISTS (SELECT 1 FROM nuevo);
+        """, (usuario.nombre, usuario.telefono, usuario.email, usuario.telefono, usuario.email)
     )
     result = fetchone_to_dict(cursor)
-    
+
     db.commit()
-    
+
     if not result:
         raise OperationError("Error al crear el usuario")
-        
+
+    conflicto = result.pop("conflicto")
+    if result["id"] is None:
+        if conflicto == "email":
+            raise ValidationError("Ya existe un usuario con ese email")
+        raise ValidationError("Ya existe un usuario con ese número de teléfono")
+
     return result
 
 
+@try_except_closeCursor
+def importar_usuarios_csv(archivo, db) -> dict:
+    """
+    Importa clientes desde un CSV con encabezado (nombre, telefono, email).
+    Las filas se cargan con COPY en una tabla temporal y se insertan en un solo
+    INSERT ... ON CONFLICT DO NOTHING; las que no se insertan se informan como duplicadas.
+    """
+    cursor = db.cursor()
+    cursor.execute(
+        """
+        CREATE TEMP TABLE usuarios_staging (
+            fila     BIGINT GENERATED ALWAYS AS IDENTITY,
+            nombre   TEXT,
+            telefono TEXT,
+            email    TEXT
+        ) ON COMMIT DROP;
+        """
+    )
+    try:
+        cursor.copy_expert(
+            "COPY usuarios_staging (nombre, telefono, email) FROM STDIN WITH (FORMAT csv, HEADER true)",
+            archivo
+        )
+    except TIEMPOS_AGOTADOS:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise ValidationError(f"El archivo CSV no es válido: {str(e).strip()}")
+
+    cursor.execute(
+        """
+        UPDATE usuarios_staging
+        SET nombre = NULLIF(btrim(nombre), ''),
+            telefono = NULLIF(normalizar_telefono(telefono), ''),
+            email = NULLIF(lower(btrim(email)), '');
+        """
+    )
+    total = cursor.rowcount
+
+    cursor.execute(
+        """
+        WITH candidatos AS (
+            SELECT DISTINCT ON (telefono) fila, nombre, telefono, email
+            FROM usuarios_staging
+            WHERE nombre IS NOT NULL AND telefono IS NOT NULL
+            ORDER BY telefono, fila
+        ),
+        insertados AS (
+            INSERT INTO usuarios (nombre, telefono, email)
+            SELECT nombre, telefono, email
+            FROM candidatos
+            ORDER BY fila
+            ON CONFLICT DO NOTHING
+            RETURNING telefono
+        )
+        SELECT
+            s.fila,
+            s.nombre,
+            s.telefono,
+            s.email,
+            CASE
+                WHEN s.nombre IS NULL OR s.telefono IS NULL THEN 'datos incompletos'
+                WHEN EXISTS (SELECT 1 FROM usuarios u WHERE u.telefono = s.telefono) THEN 'telefono existente'
+                WHEN EXISTS (SELECT 1 FROM usuarios u WHERE u.email = s.email) THEN 'email existente'
+                ELSE 'repetido en el archivo'
+            END AS motivo
+        FROM usuarios_staging s
+        WHERE NOT EXISTS (
+            SELECT 1
+            FROM insertados i
+            INNER JOIN candidatos c ON c.telefono = i.telefono
+            WHERE c.fila = s.fila
+        )
+        ORDER BY s.fila;
+        """
+    )
+    duplicados = fetchall_to_dict(cursor)
+    db.commit()
+
+    return {
+        "total": total,
+        "insertados": total - len(duplicados),
+        "duplicados": duplicados
+    }
+
+
 @try_except_closeCursor
 def obtener_usuario(user_id: UUID, db) -> dict:
-        
+
+    user = _usuarios_cache.obtener(("id", str(user_id)))
+    if user:
+        return user
+
     cursor = db.cursor()
-    cursor.execute("SELECT * FROM usuarios WHERE id = %s;", (str(user_id),))
+    cursor.execute("SELECT id, nombre, telefono, email FROM usuarios WHERE id = %s;", (str(user_id),))
     user = fetchone_to_dict(cursor)
 
     if not user:
         raise NotFoundError("Usuario no encontrado")
+
+    _usuarios_cache.guardar(("id", str(user_id)), user)
     return user
 
 
+@try_except_closeCursor
+def obtener_usuarios_por_ids(ids: list, db) -> dict:
+
+    ids = validar_ids_lote(ids)
+    cursor = db.cursor()
+    cursor.execute(
+        "SELECT id, nombre, telefono, email FROM usuarios WHERE id = ANY(%s::uuid[]);",
+        ([str(id) for id in ids],)
+    )
+    return ordenar_por_ids(fetchall_to_dict(cursor), ids)
+
+
 @try_except_closeCursor
 def actualizar_usuario(user_id: UUID, usuario_new: UsuarioUpdate, db) -> dict:
         
     # Buscar el usuario a actualizar
     cursor = db.cursor()
-    cursor.execute("SELECT * FROM usuarios WHERE id = %s;", (str(user_id),))
+    cursor.execute("SELECT id, nombre, telefono, email FROM usuarios WHERE id = %s;", (str(user_id),))
     usuario = fetchone_to_dict(cursor)
     
     if not usuario:
         raise NotFoundError(f"No existe usuario con el id ({user_id})")
     
+    usuario_new.email = normalizar_email(usuario_new.email)
     if not usuario_new.nombre and not usuario_new.email:
         raise ValidationError("Debe enviar al menos un campo para actualizar")
     
@@ -104,7 +253,7 @@ def actualizar_usuario(user_id: UUID, usuario_new: UsuarioUpdate, db) -> dict:
         UPDATE usuarios 
         SET nombre = %s, email = %s
         WHERE id = %s
-        RETURNING *;
+        RETURNING id, nombre, telefono, email;
         """, (usuario_new.nombre, usuario_new.email, str(user_id))
     )
     result = fetchone_to_dict(cursor)
@@ -113,46 +262,100 @@ def actualizar_usuario(user_id: UUID, usuario_new: UsuarioUpdate, db) -> dict:
         cursor.close()
         raise OperationError("Error al actualizar el usuario")
     
+    publicar_cambio(cursor, "usuarios", {"id": result["id"], "telefono": result["telefono"]})
     db.commit()
+    _invalidar_usuario_cache(result)
 
     return result
 
 
 @try_except_closeCursor
 def obtener_usuario_por_telefono(telefono: str, db) -> dict:
-        
+
+    telefono = normalizar_telefono(telefono)
+    user = _usuarios_cache.obtener(("telefono", telefono))
+    if user:
+        return user
+
     cursor = db.cursor()
-    cursor.execute("SELECT * FROM usuarios WHERE telefono = %s;", (telefono,))
+    cursor.execute("SELECT id, nombre, telefono, email FROM usuarios WHERE telefono = %s;", (telefono,))
     user = fetchone_to_dict(cursor)
 
     if not user:
         raise NotFoundError("Usuario no encontrado")
-    
+
+    _usuarios_cache.guardar(("telefono", telefono), user)
     return user
 
+
+@try_except_closeCursor
+def buscar_usuarios(texto: str, limite: int, db, campos: tuple = None) -> list:
+    """
+    Búsqueda incremental para la recepción: si el texto es un teléfono busca por
+    prefijo del número normalizado, si no por nombre (índice de trigramas).
+    """
+    texto = (texto or "").strip()
+    if limite <= 0 or limite > LIMITE_BUSQUEDA_MAX:
+        raise ValidationError(f"El límite debe estar entre 1 y {LIMITE_BUSQUEDA_MAX}")
+
+    columnas = columnas_sql(campos or tuple(COLUMNAS_USUARIO), COLUMNAS_USUARIO)
+    cursor = db.cursor()
+
+    if texto and not re.search(r"[^\d\s+().-]", texto):
+        prefijo = normalizar_telefono(texto)
+        if texto.startswith(("+", "00")):
+            # Número internacional a medio escribir: se quita el código de país
+            prefijo = re.sub(r"^549?", "", prefijo)
+        if len(prefijo) < 3:
+            raise ValidationError("Ingrese al menos 3 dígitos del teléfono")
+        cursor.execute(
+            f"""
+            SELECT {columnas}
+            FROM usuarios
+            WHERE telefono LIKE %s
+            ORDER BY telefono
+            LIMIT %s;
+            """, (prefijo + "%", limite)
+        )
+    else:
+        if len(texto) < 2:
+            raise ValidationError("Ingrese al menos 2 letras del nombre")
+        patron = "%" + texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        cursor.execute(
+            f"""
+            SELECT {columnas}
+            FROM usuarios
+            WHERE nombre ILIKE %s
+            ORDER BY
+                nombre ILIKE %s DESC,
+                similarity(nombre, %s) DESC,
+                nombre
+            LIMIT %s;
+            """, (patron, patron[1:], texto, limite)
+        )
+
+    return fetchall_to_dict(cursor)
+
+
 @try_except_closeCursor
-def obtener_historial_usuario(user_id: UUID, db) -> list:
+def obtener_historial_usuario(user_id: UUID, db, cursor_pagina: str = None, limite: int = 6, campos: tuple = None) -> dict:
+
+    validar_limite(limite)
+    hasta = decodificar_cursor(cursor_pagina)
 
     cursor = db.cursor()
     
     # Validar que el usuario exista
-    cursor.execute("SELECT * FROM usuarios WHERE id = %s;", (str(user_id),))
+    cursor.execute("SELECT id FROM usuarios WHERE id = %s;", (str(user_id),))
     result = fetchone_to_dict(cursor)
 
     if result is None:
         raise NotFoundError("Usuario no encontrado")
     
-    query = """
-        SELECT
-            turnos.id       as turno_id,
-            turnos.fecha    as fecha,
-            turnos.hora     as hora,
-            u.id            as usuario_id,
-            u.nombre        as usuario,
-            e.id            as empleado_id,
-            e.nombre        as empleado,
-            s.id            as servicio_id,
-            s.nombre        as servicio
+    # fecha, hora y turno_id siempre, para el cursor de paginación
+    campos = tuple(dict.fromkeys((campos or tuple(COLUMNAS_HISTORIAL)) + ("fecha", "hora", "turno_id")))
+    query = f"""
+        SELECT {columnas_sql(campos, COLUMNAS_HISTORIAL)}
         FROM turnos 
         LEFT JOIN usuarios u ON turnos.usuario_id = u.id
         LEFT JOIN servicios s ON turnos.servicio_id = s.id 
@@ -161,14 +364,20 @@ def obtener_historial_usuario(user_id: UUID, db) -> list:
             turnos.usuario_id = %s
             AND turnos.estado <> 'cancelado'
             AND turnos.fecha < CURRENT_DATE
-        ORDER BY turnos.fecha DESC
-        LIMIT 6;
     """
-    
-    cursor.execute(query, (str(user_id),))
+    parametros = (str(user_id),)
+
+    if hasta:
+        query += " AND (turnos.fecha, turnos.hora, turnos.id) < (%s, %s, %s)"
+        parametros += (hasta[0], hasta[1], str(hasta[2]))
+
+    query += " ORDER BY turnos.fecha DESC, turnos.hora DESC, turnos.id DESC LIMIT %s;"
+    parametros += (limite + 1,)
+
+    cursor.execute(query, parametros)
     historial_turnos = fetchall_to_dict(cursor)
 
-    if not historial_turnos:
+    if not historial_turnos and not hasta:
         raise NotFoundError("El usuario no tiene turnos anteriores")
     
-    return historial_turnos
+    return paginar(historial_turnos, limite, campo_id="turno_id")
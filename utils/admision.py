@@ -0,0 +1,212 @@
+import asyncio
+import hashlib
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import NamedTuple
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Buckets que se guardan como máximo; se descartan primero los de uso más viejo
+MAX_BUCKETS = 10000
+
+_metricas = {
+    "admitidas": 0,
+    "encoladas": 0,
+    "rechazadas_limite": 0,
+    "rechazadas_saturacion": 0,
+    "en_curso": 0,
+    "en_cola": 0,
+    "espera_max_ms": 0.0,
+    "espera_total_ms": 0.0,
+}
+
+
+class Limite(NamedTuple):
+    """Token bucket por cliente: peticiones por segundo sostenidas y ráfaga permitida."""
+    por_segundo: float
+    rafaga: int
+
+
+def limite_de_entorno(variable: str, por_defecto: Limite) -> Limite:
+    """Limite de la variable de entorno `variable` ("por_segundo,rafaga", p. ej. "5,20") o `por_defecto`."""
+    valor = os.getenv(variable)
+    if not valor:
+        return por_defecto
+    por_segundo, _, rafaga = valor.partition(",")
+    try:
+        return Limite(float(por_segundo), int(rafaga))
+    except ValueError:
+        raise ValueError(f"{variable} debe tener la forma por_segundo,rafaga: {valor}") from None
+
+
+def estadisticas_admision() -> dict:
+    encoladas = _metricas["encoladas"]
+    return {
+        "admitidas": _metricas["admitidas"],
+        "encoladas": encoladas,
+        "rechazadas_limite": _metricas["rechazadas_limite"],
+        "rechazadas_saturacion": _metricas["rechazadas_saturacion"],
+        "en_curso": _metricas["en_curso"],
+        "en_cola": _metricas["en_cola"],
+        "espera_max_ms": round(_metricas["espera_max_ms"], 2),
+        "espera_promedio_ms": round(_metricas["espera_total_ms"] / encoladas, 2) if encoladas else None,
+    }
+
+
+def _digesto(clave: str) -> str:
+    return hashlib.sha256(clave.encode("utf-8")).hexdigest()
+
+
+def _coincide(ruta: str, prefijo: str) -> bool:
+    return ruta == prefijo or ruta.startswith(prefijo.rstrip("/") + "/")
+
+
+class AdmisionMiddleware:
+    """
+    Control de admisión antes de llegar a la base:
+    - `limites` asocia reglas ("METODO /prefijo" o "/prefijo") a un Limite por
+      cliente; gana la regla más específica. Sin tokens se responde 429 con
+      Retry-After. El cliente es la API key del header X-API-Key solo si está en
+      `claves_api`; si no, la IP (una key inventada no da un bucket nuevo).
+    - Como máximo `max_concurrencia` peticiones a la vez usan la base; las demás
+      esperan en una cola de `max_cola` hasta `espera_maxima` segundos y si no
+      entran (o la cola está llena) se responde 503 enseguida.
+    Las rutas de `rutas_sin_base` (estado, documentación, SSE) solo pasan por el
+    límite por cliente.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limites: dict,
+        max_concurrencia: int = 20,
+        max_cola: int = 50,
+        espera_maxima: float = 2.0,
+        rutas_sin_base: tuple = (),
+        claves_api: tuple = ()
+    ):
+        self.app = app
+        self._claves_api = {_digesto(clave) for clave in claves_api if clave}
+        self.reglas = []
+        for regla, limite in limites.items():
+            metodo, _, prefijo = regla.rpartition(" ")
+            self.reglas.append((metodo or None, prefijo, regla, limite))
+        # Primero los prefijos más largos y, a igual prefijo, las reglas con método
+        self.reglas.sort(key=lambda item: (len(item[1]), item[0] is not None), reverse=True)
+        self.max_concurrencia = max_concurrencia
+        self.max_cola = max_cola
+        self.espera_maxima = espera_maxima
+        self.rutas_sin_base = set(rutas_sin_base)
+        self._buckets = OrderedDict()  # (cliente, regla) -> (tokens, último instante)
+        self._en_curso = 0
+        self._cola = deque()
+
+    def regla(self, metodo: str, ruta: str):
+        for metodo_regla, prefijo, regla, limite in self.reglas:
+            if (metodo_regla is None or metodo_regla == metodo) and _coincide(ruta, prefijo):
+                return regla, limite
+        return None, None
+
+    def cliente(self, scope: Scope) -> str:
+        clave = Headers(scope=scope).get("x-api-key")
+        if clave:
+            digesto = _digesto(clave)
+            if digesto in self._claves_api:
+                return f"clave:{digesto}"
+        return f"ip:{(scope.get('client') or ('desconocido',))[0]}"
+
+    def consumir(self, cliente: str, regla: str, limite: Limite) -> float:
+        """Toma un token del bucket; devuelve 0 si alcanzó o los segundos hasta el próximo token."""
+        ahora = time.monotonic()
+        clave = (cliente, regla)
+        tokens, instante = self._buckets.pop(clave, (float(limite.rafaga), ahora))
+        tokens = min(float(limite.rafaga), tokens + (ahora - instante) * limite.por_segundo)
+        espera = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            espera = (1 - tokens) / limite.por_segundo
+        self._buckets[clave] = (tokens, ahora)
+        if len(self._buckets) > MAX_BUCKETS:
+            self._buckets.popitem(last=False)
+        return espera
+
+    async def entrar(self) -> bool:
+        if self._en_curso < self.max_concurrencia:
+            self._en_curso += 1
+            _metricas["en_curso"] = self._en_curso
+            return True
+        if len(self._cola) >= self.max_cola:
+            return False
+
+        turno = asyncio.get_running_loop().create_future()
+        self._cola.append(turno)
+        _metricas["encoladas"] += 1
+        _metricas["en_cola"] = len(self._cola)
+        inicio = time.monotonic()
+        try:
+            await asyncio.wait_for(turno, self.espera_maxima)
+            return True  # el lugar lo cedió `salir`, sin pasar por cero
+        except asyncio.TimeoutError:
+            # El lugar pudo cederse justo cuando vencía la espera
+            return turno.done() and not turno.cancelled()
+        finally:
+            if turno in self._cola:
+                self._cola.remove(turno)
+            _metricas["en_cola"] = len(self._cola)
+            espera_ms = (time.monotonic() - inicio) * 1000
+            _metricas["espera_max_ms"] = max(_metricas["espera_max_ms"], espera_ms)
+            _metricas["espera_total_ms"] += espera_ms
+
+    def salir(self):
+        while self._cola:
+            turno = self._cola.popleft()
+            if not turno.done():
+                turno.set_result(None)
+                _metricas["en_cola"] = len(self._cola)
+                return
+        self._en_curso -= 1
+        _metricas["en_curso"] = self._en_curso
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        ruta = scope["path"]
+        regla, limite = self.regla(scope["method"], ruta)
+        if limite is not None:
+            espera = self.consumir(self.cliente(scope), regla, limite)
+            if espera:
+                _metricas["rechazadas_limite"] += 1
+                respuesta = JSONResponse(
+                    status_code=429,
+                    content={"detail": "Demasiadas solicitudes, intente nuevamente en unos segundos"},
+                    headers={"Retry-After": str(math.ceil(espera))}
+                )
+                await respuesta(scope, receive, send)
+                return
+
+        if ruta in self.rutas_sin_base:
+            _metricas["admitidas"] += 1
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.entrar():
+            _metricas["rechazadas_saturacion"] += 1
+            respuesta = JSONResponse(
+                status_code=503,
+                content={"detail": "El servicio está saturado, intente nuevamente en unos segundos"},
+                headers={"Retry-After": "1"}
+            )
+            await respuesta(scope, receive, send)
+            return
+
+        _metricas["admitidas"] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.salir()
@@ -0,0 +1,45 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheTTL:
+    """Cache en memoria del proceso con expiración por entrada y desalojo LRU."""
+
+    def __init__(self, max_entradas: int = 1024, ttl_segundos: float = None):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, default=None):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return default
+            expira, valor = entrada
+            if expira is not None and expira <= time.monotonic():
+                del self._datos[clave]
+                return default
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor, ttl_segundos: float = None):
+        ttl = ttl_segundos if ttl_segundos is not None else self.ttl_segundos
+        expira = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._datos[clave] = (expira, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
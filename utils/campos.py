@@ -0,0 +1,32 @@
+from typing import Optional
+from pydantic import BaseModel
+from exception_handlers import ValidationError
+
+
+def campos_solicitados(fields: Optional[str], modelo: type[BaseModel]) -> tuple:
+    """
+    Interpreta el parámetro `fields` ("id,nombre") validándolo contra los campos del
+    modelo de respuesta. Sin `fields` devuelve todos los campos del modelo.
+    """
+    disponibles = tuple(modelo.model_fields)
+    if not fields:
+        return disponibles
+
+    campos = tuple(dict.fromkeys(campo.strip() for campo in fields.split(",") if campo.strip()))
+    invalidos = [campo for campo in campos if campo not in disponibles]
+    if invalidos or not campos:
+        raise ValidationError(
+            f"Campos no válidos: {', '.join(invalidos) or fields}. Campos disponibles: {', '.join(disponibles)}"
+        )
+    return campos
+
+
+def columnas_sql(campos: tuple, expresiones: dict) -> str:
+    """
+    Arma la lista del SELECT para los campos pedidos a partir de la expresión SQL de
+    cada uno. Los campos ya fueron validados contra el modelo, no vienen del cliente.
+    """
+    return ", ".join(
+        expresiones[campo] if expresiones[campo] == campo else f"{expresiones[campo]} AS {campo}"
+        for campo in campos
+    )
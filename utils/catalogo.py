@@ -0,0 +1,147 @@
+import hashlib
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Optional
+from psycopg2 import sql
+from utils.respuestas import proyectar, serializar_json
+
+
+def _etag(cuerpo: bytes) -> str:
+    return '"' + hashlib.sha256(cuerpo).hexdigest()[:32] + '"'
+
+
+def ultima_modificacion_tabla(db, tabla: str) -> datetime:
+    """
+    Último cambio de la tabla según la base (updated_at de sus filas y sus
+    eliminaciones), igual en todos los procesos. Hay que consultarlo antes que los
+    datos: así nunca es posterior a lo que se cargó.
+    """
+    cursor = db.cursor()
+    cursor.execute(
+        sql.SQL(
+            """
+            SELECT coalesce(
+                greatest(
+                    (SELECT max(updated_at) FROM {tabla}),
+                    (SELECT max(eliminado_en) FROM eliminaciones WHERE tabla = %s)
+                ),
+                to_timestamp(0)
+            );
+            """
+        ).format(tabla=sql.Identifier(tabla)),
+        (tabla,)
+    )
+    ultima_modificacion = cursor.fetchone()[0].astimezone(timezone.utc)
+    cursor.close()
+    return ultima_modificacion
+
+
+@dataclass(frozen=True)
+class EntradaCatalogo:
+    datos: list
+    cuerpo: bytes
+    etag: str
+    ultima_modificacion: datetime
+    _variantes: dict = field(default_factory=dict, compare=False, repr=False)
+
+    def variante(self, campos: Optional[tuple]) -> "EntradaCatalogo":
+        """El mismo catálogo reducido a `campos` (parámetro fields), serializado una sola vez."""
+        if not campos:
+            return self
+        variante = self._variantes.get(campos)
+        if variante is None:
+            datos = proyectar(self.datos, campos)
+            cuerpo = serializar_json(datos)
+            variante = EntradaCatalogo(datos, cuerpo, _etag(cuerpo), self.ultima_modificacion)
+            self._variantes[campos] = variante
+        return variante
+
+
+class CatalogoCache:
+    """
+    Catálogo (tabla chica que cambia poco) cacheado en memoria del proceso.
+    Se carga en el primer uso y se descarta con invalidar() después de cada escritura.
+    `cargar` devuelve (datos, última modificación de la tabla).
+    Mientras `sincronizado()` sea falso (no llegan los cambios de otros procesos) la
+    entrada además vence a los `ttl_respaldo` segundos.
+    """
+
+    def __init__(self, ttl_respaldo: float = None, sincronizado: Callable[[], bool] = lambda: False):
+        self.ttl_respaldo = ttl_respaldo
+        self.sincronizado = sincronizado
+        self._entrada = None
+        self._cargado_en = 0.0
+        self._generacion = 0
+        self._lock = threading.Lock()             # una sola carga a la vez
+        self._lock_generacion = threading.Lock()  # corto: invalidar no espera a la carga
+
+    def _vigente(self):
+        entrada = self._entrada
+        if entrada is None:
+            return None
+        if self.ttl_respaldo is None or self.sincronizado():
+            return entrada
+        if time.monotonic() - self._cargado_en < self.ttl_respaldo:
+            return entrada
+        return None
+
+    def obtener(self, cargar: Callable[[], tuple]) -> EntradaCatalogo:
+        entrada = self._vigente()
+        if entrada is not None:
+            return entrada
+
+        with self._lock:
+            entrada = self._vigente()
+            if entrada is not None:
+                return entrada
+            generacion = self._generacion
+            datos, ultima_modificacion = cargar()
+            cuerpo = serializar_json(datos)
+            entrada = EntradaCatalogo(
+                datos=datos,
+                cuerpo=cuerpo,
+                etag=_etag(cuerpo),
+                ultima_modificacion=ultima_modificacion,
+            )
+            # Si hubo una escritura mientras se cargaba, no se guarda lo leído
+            with self._lock_generacion:
+                if generacion == self._generacion:
+                    self._entrada = entrada
+                    self._cargado_en = time.monotonic()
+            return entrada
+
+    def invalidar(self):
+        with self._lock_generacion:
+            self._generacion += 1
+            self._entrada = None
+
+
+def headers_validadores(entrada: EntradaCatalogo) -> dict:
+    return {
+        "ETag": entrada.etag,
+        "Last-Modified": format_datetime(entrada.ultima_modificacion, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+
+
+def no_modificado(if_none_match: str, if_modified_since: str, entrada: EntradaCatalogo) -> bool:
+    """Evalúa los headers condicionales del request (If-None-Match tiene prioridad)."""
+    if if_none_match:
+        etags = [etag.strip().removeprefix("W/") for etag in if_none_match.split(",")]
+        return "*" in etags or entrada.etag in etags
+
+    if if_modified_since:
+        try:
+            fecha = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if fecha.tzinfo is None:
+            fecha = fecha.replace(tzinfo=timezone.utc)
+        # Se compara con la precisión completa: un cambio en el mismo segundo que
+        # el Last-Modified enviado no se toma como no modificado
+        return entrada.ultima_modificacion <= fecha
+
+    return False
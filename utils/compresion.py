@@ -0,0 +1,131 @@
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - sin brotli se negocia solo gzip
+    brotli = None
+
+TIPOS_COMPRIMIBLES = ("application/json", "application/x-ndjson", "text/csv", "text/plain", "text/html")
+
+
+def elegir_codificacion(accept_encoding: str) -> str:
+    """Elige br o gzip según el header Accept-Encoding (respetando q=0); None si ninguna."""
+    aceptadas = {}
+    for parte in accept_encoding.split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        calidad = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                calidad = float(parametros[2:])
+            except ValueError:
+                calidad = 0.0
+        if nombre:
+            aceptadas[nombre.strip().lower()] = calidad
+
+    for codificacion in ("br", "gzip"):
+        if codificacion == "br" and brotli is None:
+            continue
+        if aceptadas.get(codificacion, aceptadas.get("*", 0)) > 0:
+            return codificacion
+    return None
+
+
+class _Compresor:
+    def __init__(self, codificacion: str, nivel_gzip: int, calidad_brotli: int):
+        if codificacion == "br":
+            self._br = brotli.Compressor(quality=calidad_brotli)
+            self._gzip = None
+        else:
+            self._br = None
+            self._gzip = zlib.compressobj(nivel_gzip, zlib.DEFLATED, 31)
+
+    def comprimir(self, datos: bytes, final: bool) -> bytes:
+        if self._br is not None:
+            salida = self._br.process(datos)
+            return salida + (self._br.finish() if final else self._br.flush())
+        salida = self._gzip.compress(datos)
+        return salida + self._gzip.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompresionMiddleware:
+    """
+    Comprime con brotli o gzip (según Accept-Encoding) las respuestas JSON/CSV que
+    superan `tamano_minimo` bytes. Las respuestas en streaming (exportaciones) se
+    comprimen por bloque; los Server-Sent Events nunca se comprimen.
+    """
+
+    def __init__(self, app: ASGIApp, tamano_minimo: int = 1024, nivel_gzip: int = 6, calidad_brotli: int = 4):
+        self.app = app
+        self.tamano_minimo = tamano_minimo
+        self.nivel_gzip = nivel_gzip
+        self.calidad_brotli = calidad_brotli
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codificacion = elegir_codificacion(Headers(scope=scope).get("accept-encoding", ""))
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = None
+        compresor = None
+        pasar_directo = False
+
+        async def enviar(message: Message) -> None:
+            nonlocal inicio, compresor, pasar_directo
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                tipo = headers.get("content-type", "").split(";")[0].strip()
+                if "content-encoding" in headers or tipo not in TIPOS_COMPRIMIBLES:
+                    pasar_directo = True
+                    await send(message)
+                else:
+                    inicio = message  # se envía cuando se sabe si se comprime
+                return
+
+            if pasar_directo or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            cuerpo = message.get("body", b"")
+            hay_mas = message.get("more_body", False)
+
+            if compresor is None:
+                headers = MutableHeaders(raw=inicio["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                if not hay_mas and len(cuerpo) < self.tamano_minimo:
+                    pasar_directo = True
+                    await send(inicio)
+                    await send(message)
+                    return
+
+                compresor = _Compresor(codificacion, self.nivel_gzip, self.calidad_brotli)
+                headers["Content-Encoding"] = codificacion
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    # Otra codificación es otra representación: el ETag pasa a ser débil
+                    headers["ETag"] = "W/" + etag
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+                if not hay_mas:
+                    cuerpo = compresor.comprimir(cuerpo, final=True)
+                    headers["Content-Length"] = str(len(cuerpo))
+                    await send(inicio)
+                    await send({"type": "http.response.body", "body": cuerpo, "more_body": False})
+                    return
+                await send(inicio)
+
+            await send({
+                "type": "http.response.body",
+                "body": compresor.comprimir(cuerpo, final=not hay_mas),
+                "more_body": hay_mas,
+            })
+
+        await self.app(scope, receive, enviar)
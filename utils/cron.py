@@ -0,0 +1,57 @@
+from datetime import datetime
+from functools import lru_cache
+
+# minuto, hora, día del mes, mes, día de la semana (0 = domingo)
+RANGOS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+
+def _valores(campo: str, minimo: int, maximo: int) -> frozenset:
+    valores = set()
+    for parte in campo.split(","):
+        rango, _, paso = parte.partition("/")
+        paso = int(paso) if paso else 1
+        if rango == "*":
+            inicio, fin = minimo, maximo
+        elif "-" in rango:
+            inicio, fin = (int(valor) for valor in rango.split("-", 1))
+        else:
+            inicio = int(rango)
+            fin = maximo if paso > 1 else inicio
+        if not minimo <= inicio <= fin <= maximo or paso <= 0:
+            raise ValueError(f"Campo de cron fuera de rango: {campo}")
+        valores.update(range(inicio, fin + 1, paso))
+    return frozenset(valores)
+
+
+@lru_cache(maxsize=64)
+def interpretar(expresion: str) -> tuple:
+    """
+    Interpreta una expresión cron de 5 campos (*, listas, rangos y pasos). Devuelve
+    los valores de cada campo y si día del mes y día de la semana están restringidos
+    (no empiezan con *).
+    """
+    campos = expresion.split()
+    if len(campos) != 5:
+        raise ValueError(f"La expresión cron debe tener 5 campos: {expresion}")
+    valores = tuple(_valores(campo, *rango) for campo, rango in zip(campos, RANGOS))
+    return valores + (not campos[2].startswith("*"), not campos[4].startswith("*"))
+
+
+def coincide(expresion: str, momento: datetime) -> bool:
+    """
+    Indica si `momento` (al minuto) cae en la expresión. Como en cron, si día del
+    mes y día de la semana están restringidos los dos, alcanza con que coincida uno.
+    """
+    minutos, horas, dias, meses, dias_semana, restringe_dia, restringe_dia_semana = interpretar(expresion)
+    coincide_dia = momento.day in dias
+    coincide_dia_semana = momento.isoweekday() % 7 in dias_semana
+    if restringe_dia and restringe_dia_semana:
+        coincide_fecha = coincide_dia or coincide_dia_semana
+    else:
+        coincide_fecha = coincide_dia and coincide_dia_semana
+    return (
+        momento.minute in minutos
+        and momento.hour in horas
+        and momento.month in meses
+        and coincide_fecha
+    )
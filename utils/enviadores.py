@@ -0,0 +1,161 @@
+import importlib
+import json
+import os
+import smtplib
+import threading
+from abc import ABC, abstractmethod
+from email.message import EmailMessage
+from fastapi.encoders import jsonable_encoder
+
+ASUNTOS = {
+    "confirmacion": "Tu turno está confirmado",
+    "cancelacion": "Tu turno fue cancelado",
+    "modificacion": "Tu turno fue modificado",
+    "recordatorio": "Te esperamos mañana",
+}
+
+
+class NotificacionDescartada(Exception):
+    """La notificación no se puede enviar nunca (p. ej. el cliente no tiene email): no se reintenta."""
+
+
+def componer_mensaje(notificacion: dict) -> tuple:
+    """Devuelve (asunto, cuerpo) de la notificación."""
+    datos = notificacion["datos"]
+    detalle = f"{notificacion.get('servicio') or 'tu turno'} con {notificacion.get('nombre_empleado') or 'nuestro equipo'}"
+    cuando = f"el {datos['fecha']} a las {str(datos['hora'])[:5]}"
+    cuerpos = {
+        "confirmacion": f"Reservaste {detalle} {cuando}.",
+        "cancelacion": f"Se canceló {detalle} del {datos['fecha']} a las {str(datos['hora'])[:5]}.",
+        "modificacion": f"Tu turno ahora es {detalle} {cuando}.",
+        "recordatorio": f"Te recordamos {detalle} {cuando}.",
+    }
+    saludo = f"Hola {notificacion.get('nombre_usuario') or ''}".rstrip() + ","
+    return ASUNTOS[notificacion["tipo"]], f"{saludo}\n\n{cuerpos[notificacion['tipo']]}\n"
+
+
+class Enviador(ABC):
+    """
+    Interfaz de los enviadores. `enviar` lanza una excepción si falla (se reintenta)
+    o NotificacionDescartada si no tiene sentido reintentar; `enviar_lote` puede
+    redefinirse para reusar una conexión por lote.
+    """
+
+    @abstractmethod
+    def enviar(self, notificacion: dict):
+        ...
+
+    def enviar_lote(self, notificaciones: list) -> dict:
+        """Envía el lote; devuelve id -> excepción de las que fallaron."""
+        errores = {}
+        for notificacion in notificaciones:
+            try:
+                self.enviar(notificacion)
+            except Exception as e:
+                errores[notificacion["id"]] = e
+        return errores
+
+
+class EnviadorArchivo(Enviador):
+    """Escribe cada notificación como una línea JSON en un archivo; para desarrollo y pruebas."""
+
+    def __init__(self, ruta: str = None):
+        self.ruta = ruta or os.getenv("NOTIFICACIONES_ARCHIVO", "notificaciones.ndjson")
+        self._lock = threading.Lock()
+
+    def enviar(self, notificacion: dict):
+        asunto, cuerpo = componer_mensaje(notificacion)
+        linea = json.dumps(jsonable_encoder({
+            "id": notificacion["id"],
+            "tipo": notificacion["tipo"],
+            "para": notificacion.get("email") or notificacion.get("telefono"),
+            "asunto": asunto,
+            "cuerpo": cuerpo,
+        }), ensure_ascii=False)
+        with self._lock, open(self.ruta, "a", encoding="utf-8") as archivo:
+            archivo.write(linea + "\n")
+
+
+class EnviadorSMTP(Enviador):
+    """Envía por email con una conexión SMTP por lote (SMTP_HOST, SMTP_PORT, SMTP_USUARIO, SMTP_CLAVE, SMTP_REMITENTE)."""
+
+    def __init__(self):
+        self.host = os.getenv("SMTP_HOST", "localhost")
+        self.puerto = int(os.getenv("SMTP_PORT", "587"))
+        self.usuario = os.getenv("SMTP_USUARIO")
+        self.clave = os.getenv("SMTP_CLAVE")
+        self.remitente = os.getenv("SMTP_REMITENTE", "turnos@peluqueria.local")
+        self.tls = os.getenv("SMTP_TLS", "1") == "1"
+
+    def _mensaje(self, notificacion: dict) -> EmailMessage:
+        if not notificacion.get("email"):
+            raise NotificacionDescartada("El cliente no tiene email")
+        asunto, cuerpo = componer_mensaje(notificacion)
+        mensaje = EmailMessage()
+        mensaje["From"] = self.remitente
+        mensaje["To"] = notificacion["email"]
+        mensaje["Subject"] = asunto
+        mensaje.set_content(cuerpo)
+        return mensaje
+
+    def enviar(self, notificacion: dict):
+        errores = self.enviar_lote([notificacion])
+        if errores:
+            raise errores[notificacion["id"]]
+
+    def enviar_lote(self, notificaciones: list) -> dict:
+        errores = {}
+        mensajes = []
+        for notificacion in notificaciones:
+            try:
+                mensajes.append((notificacion["id"], self._mensaje(notificacion)))
+            except NotificacionDescartada as e:
+                errores[notificacion["id"]] = e
+        if not mensajes:
+            return errores
+
+        enviados = set()
+        try:
+            with smtplib.SMTP(self.host, self.puerto, timeout=30) as smtp:
+                if self.tls:
+                    smtp.starttls()
+                if self.usuario:
+                    smtp.login(self.usuario, self.clave)
+                for id, mensaje in mensajes:
+                    try:
+                        smtp.send_message(mensaje)
+                        enviados.add(id)
+                    except smtplib.SMTPRecipientsRefused as e:
+                        errores[id] = NotificacionDescartada(str(e))
+                    except smtplib.SMTPException as e:
+                        errores[id] = e
+        except (OSError, smtplib.SMTPException) as e:
+            # Sin conexión con el servidor falla todo el resto del lote
+            for id, _ in mensajes:
+                if id not in enviados:
+                    errores.setdefault(id, e)
+        return errores
+
+
+ENVIADORES = {
+    "archivo": EnviadorArchivo,
+    "smtp": EnviadorSMTP,
+}
+
+
+def obtener_enviador(nombre: str = None) -> Enviador:
+    """
+    Enviador configurado en ENVIADOR_NOTIFICACIONES: "archivo", "smtp" o la ruta
+    "modulo:Clase" de uno propio (SMS, WhatsApp, una cola...). No hay valor por
+    defecto: sin configurar falla en vez de dejar las notificaciones en un archivo
+    local y marcarlas como enviadas.
+    """
+    nombre = nombre or os.getenv("ENVIADOR_NOTIFICACIONES")
+    if not nombre:
+        raise RuntimeError("Falta ENVIADOR_NOTIFICACIONES (\"archivo\", \"smtp\" o \"modulo:Clase\")")
+    if nombre in ENVIADORES:
+        return ENVIADORES[nombre]()
+    modulo, _, clase = nombre.partition(":")
+    if not clase:
+        raise RuntimeError(f"ENVIADOR_NOTIFICACIONES inválido: {nombre}")
+    return getattr(importlib.import_module(modulo), clase)()
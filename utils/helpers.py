@@ -1,25 +1,72 @@
-def fetchall_to_dict(cursor):
+import re
+from collections import namedtuple
+from functools import lru_cache
+from itertools import repeat
 
-    if cursor.rowcount == 0:
-        return None
 
-    # Obtener los nombres de las columnas
-    column_names = [desc[0] for desc in cursor.description]
-    objects = cursor.fetchall()
-    
-    # Convertir cada tupla a un diccionario
-    resultado = []
-    for object in objects:
-        object_dict = dict(zip(column_names, object))
-        resultado.append(object_dict)
+@lru_cache(maxsize=256)
+def tipo_registro(nombres: tuple) -> type:
+    """Clase de registro liviano (namedtuple, sin __dict__) para un juego de columnas; se crea una sola vez."""
+    return namedtuple("Registro", nombres, rename=True)
 
-    return resultado
 
-def fetchone_to_dict(cursor):
+def nombres_columnas(cursor) -> tuple:
+    if cursor.description is None:
+        return ()
+    return tuple(desc[0] for desc in cursor.description)
+
+
+def fetchall_to_dict(cursor) -> list:
+    """Devuelve las filas como diccionarios; lista vacía si no hay resultados."""
+    nombres = nombres_columnas(cursor)
+    if not nombres:
+        return []
+    return list(map(dict, map(zip, repeat(nombres), cursor.fetchall())))
 
-    if cursor.rowcount == 0:
+
+def fetchone_to_dict(cursor):
+    """Devuelve la fila como diccionario o None si no hay resultado."""
+    nombres = nombres_columnas(cursor)
+    if not nombres:
+        return None
+    fila = cursor.fetchone()
+    if fila is None:
         return None
+    return dict(zip(nombres, fila))
+
+
+def fetchall_registros(cursor) -> list:
+    """
+    Devuelve las filas como registros de solo lectura con acceso por atributo
+    (registro.hora). Más rápido que los diccionarios para uso interno; para
+    respuestas JSON usar fetchall_to_dict o registro._asdict().
+    """
+    nombres = nombres_columnas(cursor)
+    if not nombres:
+        return []
+    return list(map(tipo_registro(nombres)._make, cursor.fetchall()))
+
+
+def fetchall_tuplas(cursor) -> tuple:
+    """Devuelve (nombres de columnas, filas como tuplas) sin convertir, para encoders y exportaciones."""
+    nombres = nombres_columnas(cursor)
+    if not nombres:
+        return (), []
+    return nombres, cursor.fetchall()
+
+
+def normalizar_telefono(telefono: str) -> str:
+    """
+    Deja solo el número nacional: sin símbolos, prefijo internacional (00, 54),
+    el 9 de celulares ni ceros iniciales. "+54 9 11 5555-1234" -> "1155551234".
+    Debe coincidir con la función normalizar_telefono de la base de datos.
+    """
+    digitos = re.sub(r"\D", "", telefono or "")
+    digitos = re.sub(r"^00", "", digitos)
+    digitos = re.sub(r"^549?(\d{10})$", r"\1", digitos)
+    return digitos.lstrip("0")
+
 
-    column_names = [desc[0] for desc in cursor.description]
-    object = cursor.fetchone()
-    return dict(zip(column_names, object))
+def normalizar_email(email: str) -> str:
+    """Sin espacios y en minúsculas, como lo guarda la importación CSV; None si queda vacío."""
+    return (email or "").strip().lower() or None
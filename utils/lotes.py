@@ -0,0 +1,40 @@
+from typing import Iterable, Optional
+from uuid import UUID
+from exception_handlers import ValidationError
+
+MAX_IDS_LOTE = 200
+
+
+def validar_ids_lote(ids: Optional[Iterable]) -> list:
+    """
+    Normaliza los ids pedidos en un lote (lista de UUID o texto "a,b,c"): quita
+    repetidos manteniendo el orden y controla el máximo por request.
+    """
+    if isinstance(ids, str):
+        ids = [id.strip() for id in ids.split(",") if id.strip()]
+    ids = list(ids or [])
+    if not ids:
+        raise ValidationError("Debe enviar al menos un id")
+
+    try:
+        ids = list(dict.fromkeys(id if isinstance(id, UUID) else UUID(str(id)) for id in ids))
+    except ValueError:
+        raise ValidationError("Los ids deben ser UUID válidos")
+
+    if len(ids) > MAX_IDS_LOTE:
+        raise ValidationError(f"Se pueden pedir como máximo {MAX_IDS_LOTE} ids por request")
+    return ids
+
+
+def ordenar_por_ids(filas: list, ids: list, campo_id: str = "id") -> dict:
+    """Devuelve las filas en el orden de `ids` y la lista de ids que no se encontraron."""
+    por_id = {str(fila[campo_id]): fila for fila in filas}
+    items = []
+    faltantes = []
+    for id in ids:
+        fila = por_id.get(str(id))
+        if fila is None:
+            faltantes.append(id)
+        else:
+            items.append(fila)
+    return {"items": items, "faltantes": faltantes}
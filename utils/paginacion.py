@@ -0,0 +1,52 @@
+import base64
+import json
+from datetime import date, time
+from typing import Optional
+from uuid import UUID
+from exception_handlers import ValidationError
+from utils.respuestas import RespuestaJSON, respuesta_confiable
+
+TAMANO_PAGINA_DEFECTO = 50
+TAMANO_PAGINA_MAX = 200
+
+
+def codificar_cursor(fecha: date, hora: time, id: UUID) -> str:
+    """Cursor opaco para paginar por (fecha, hora, id)."""
+    valor = json.dumps([fecha.isoformat(), hora.isoformat(), str(id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(valor.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: Optional[str]) -> Optional[tuple]:
+    if not cursor:
+        return None
+    try:
+        valor = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        fecha, hora, id = json.loads(valor)
+        return date.fromisoformat(fecha), time.fromisoformat(hora), UUID(id)
+    except (ValueError, TypeError):
+        raise ValidationError("El cursor de paginación no es válido")
+
+
+def validar_limite(limite: int):
+    if limite <= 0 or limite > TAMANO_PAGINA_MAX:
+        raise ValidationError(f"El tamaño de página debe estar entre 1 y {TAMANO_PAGINA_MAX}")
+
+
+def paginar(filas: Optional[list], limite: int, campo_id: str = "id") -> dict:
+    """
+    Recibe hasta limite + 1 filas ordenadas y arma la página con el cursor a la
+    siguiente (None si no hay más).
+    """
+    filas = filas or []
+    siguiente_cursor = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        siguiente_cursor = codificar_cursor(ultima["fecha"], ultima["hora"], ultima[campo_id])
+    return {"items": filas, "siguiente_cursor": siguiente_cursor}
+
+
+def responder_pagina(pagina: dict, campos=None) -> RespuestaJSON:
+    """Responde los items y deja el cursor de la siguiente página en el header X-Siguiente-Cursor."""
+    headers = {"X-Siguiente-Cursor": pagina["siguiente_cursor"]} if pagina["siguiente_cursor"] else None
+    return respuesta_confiable(pagina["items"], campos, headers)
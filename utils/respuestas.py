@@ -0,0 +1,55 @@
+import json
+from decimal import Decimal
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - se usa json de la librería estándar
+    orjson = None
+
+
+def _default(obj):
+    # Mismo formato que pydantic en modo JSON: los Decimal van como string ("10.50")
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if orjson is None and hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    if orjson is None:
+        return str(obj)  # UUID
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+
+def serializar_json(contenido) -> bytes:
+    """Serializa dicts/listas con UUID, date, time y Decimal directamente a JSON."""
+    if orjson is not None:
+        return orjson.dumps(contenido, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(contenido, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class RespuestaJSON(JSONResponse):
+    """Respuesta JSON de la app: usa orjson si está instalado."""
+
+    def render(self, content) -> bytes:
+        return serializar_json(content)
+
+
+def proyectar(filas: list, campos) -> list:
+    """
+    Deja en cada fila solo los campos pedidos (tupla de nombres o los del modelo de
+    respuesta), sin validarlas.
+    """
+    if isinstance(campos, type) and issubclass(campos, BaseModel):
+        campos = tuple(campos.model_fields)
+    return [{campo: fila[campo] for campo in campos if campo in fila} for fila in filas]
+
+
+def respuesta_confiable(datos, campos=None, headers: dict = None) -> RespuestaJSON:
+    """
+    Devuelve filas leídas de la base tal cual, sin pasar por la validación del
+    response_model ni por jsonable_encoder. Solo para datos que vienen de nuestras
+    consultas; lo que llega del cliente tiene que seguir validándose.
+    """
+    if campos is not None:
+        datos = proyectar(datos, campos)
+    return RespuestaJSON(content=datos, headers=headers)
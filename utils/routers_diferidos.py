@@ -0,0 +1,37 @@
+import importlib
+import threading
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class RoutersDiferidosMiddleware:
+    """
+    Incluye en la aplicación los routers de uso poco frecuente recién con la primera
+    petición a su prefijo, así su construcción no se paga en el arranque en frío.
+    Pedir el esquema OpenAPI (o /docs) los carga todos.
+    """
+
+    def __init__(self, app: ASGIApp, aplicacion, routers: dict):
+        self.app = app
+        self.aplicacion = aplicacion
+        self.pendientes = dict(routers)  # prefijo -> módulo con `router`
+        self._lock = threading.Lock()
+
+    def cargar(self, prefijo: str):
+        with self._lock:
+            modulo = self.pendientes.pop(prefijo, None)
+            if modulo is None:
+                return
+            self.aplicacion.include_router(importlib.import_module(modulo).router)
+            self.aplicacion.openapi_schema = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.pendientes and scope["type"] == "http":
+            ruta = scope["path"]
+            if ruta in (self.aplicacion.openapi_url, self.aplicacion.docs_url, self.aplicacion.redoc_url):
+                for prefijo in list(self.pendientes):
+                    self.cargar(prefijo)
+            else:
+                for prefijo in list(self.pendientes):
+                    if ruta == prefijo or ruta.startswith(prefijo + "/"):
+                        self.cargar(prefijo)
+        await self.app(scope, receive, send)
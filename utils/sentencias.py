@@ -0,0 +1,48 @@
+import hashlib
+import itertools
+import os
+import re
+from functools import lru_cache
+
+# Preparar las consultas frecuentes una vez por conexión. Apagado por defecto: la
+# mejora no está medida; activar (1) después de correr benchmarks/sentencias.py contra
+# la base real. No activar con PgBouncer en modo transacción: ahí la conexión del
+# servidor cambia entre transacciones.
+SENTENCIAS_PREPARADAS = os.getenv("SENTENCIAS_PREPARADAS", "0") == "1"
+
+# Límite de sentencias preparadas por conexión (las variantes de `fields` generan otras)
+MAX_SENTENCIAS_POR_CONEXION = 64
+
+_MARCADOR = re.compile(r"%s")
+
+
+@lru_cache(maxsize=256)
+def _sentencia(sql: str) -> tuple:
+    """Nombre, PREPARE (con $1, $2...) y EXECUTE (con %s) para el texto `sql`."""
+    nombre = "s_" + hashlib.md5(sql.encode("utf-8")).hexdigest()[:16]
+    numeros = itertools.count(1)
+    cuerpo = _MARCADOR.sub(lambda _: f"${next(numeros)}", sql.strip().rstrip(";"))
+    cantidad = next(numeros) - 1
+    argumentos = f" ({', '.join(['%s'] * cantidad)})" if cantidad else ""
+    return nombre, f"PREPARE {nombre} AS {cuerpo}", f"EXECUTE {nombre}{argumentos}"
+
+
+def ejecutar_preparada(cursor, sql: str, parametros: tuple = ()):
+    """
+    Como cursor.execute(sql, parametros), pero con SENTENCIAS_PREPARADAS la primera
+    vez prepara la sentencia en la conexión y después la ejecuta por nombre. Solo
+    para consultas cuyos parámetros tengan tipo deducible del contexto.
+    """
+    preparadas = getattr(cursor.connection, "sentencias_preparadas", None)
+    if not SENTENCIAS_PREPARADAS or preparadas is None:
+        cursor.execute(sql, parametros)
+        return
+
+    nombre, preparar, ejecutar = _sentencia(sql)
+    if nombre not in preparadas:
+        if len(preparadas) >= MAX_SENTENCIAS_POR_CONEXION:
+            cursor.execute(sql, parametros)
+            return
+        cursor.execute(preparar)
+        preparadas.add(nombre)
+    cursor.execute(ejecutar, parametros)